@@ -0,0 +1,295 @@
+"""Latency, throughput and SQL query counts for the API's hot endpoints.
+
+Runs each scenario against a seeded database (see seed.py; seeded on first
+use and reused afterwards) through the Flask test client, a multi-threaded
+HTTP load against a local server, or both. Results can be saved as a named
+baseline and later runs compared against it.
+
+    python -m src.benchmarks.api --scale small --mode both --save before
+    python -m src.benchmarks.api --scale small --mode both --compare before
+    python -m src.benchmarks.api --endpoint forum. --requests 500 --concurrency 16
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.benchmarks.seed import add_count_arguments, counts_from_args, create_bench_app, seed_file
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+SEARCH_TERMS = ('feeding', 'kangaroo care', 'oxygen', 'sleep', 'milk', 'discharge home', 'reflux', 'nurse')
+
+class Fixtures:
+    """Ids and names from the seeded database that scenarios pick from"""
+
+    def __init__(self, app):
+        from src.models.user import db
+        from src.models.blog import BlogPost, BlogTag
+        from src.models.forum import ForumCategory, ForumThread
+
+        with app.app_context():
+            self.blog_ids = [row.id for row in db.session.query(BlogPost.id).filter_by(published=True)]
+            self.tags = [row.name for row in db.session.query(BlogTag.name).filter(BlogTag.post_count > 0)]
+            self.category_ids = [row.id for row in db.session.query(ForumCategory.id)]
+            # Weighted towards busy threads, like real traffic
+            self.thread_ids = [row.id for row in db.session.query(ForumThread.id).filter_by(approved=True).order_by(
+                ForumThread.post_count.desc()
+            ).limit(500)]
+
+# name -> (method, path and body factory)
+SCENARIOS = {
+    'blog.posts': ('GET', lambda f, rng: ('/api/blog/posts', None)),
+    'blog.posts_summary': ('GET', lambda f, rng: ('/api/blog/posts?view=summary', None)),
+    'blog.posts_by_tag': ('GET', lambda f, rng: (f'/api/blog/posts?tag={quote(rng.choice(f.tags))}', None)),
+    'blog.post': ('GET', lambda f, rng: (f'/api/blog/posts/{rng.choice(f.blog_ids)}', None)),
+    'blog.tags': ('GET', lambda f, rng: ('/api/blog/tags', None)),
+    'forum.categories': ('GET', lambda f, rng: ('/api/forum/categories', None)),
+    'forum.threads': ('GET', lambda f, rng: ('/api/forum/threads', None)),
+    'forum.threads_by_category': ('GET', lambda f, rng: (f'/api/forum/threads?category_id={rng.choice(f.category_ids)}', None)),
+    'forum.thread': ('GET', lambda f, rng: (f'/api/forum/threads/{rng.choice(f.thread_ids)}', None)),
+    'analytics.dashboard': ('GET', lambda f, rng: ('/api/analytics/dashboard', None)),
+    'search': ('GET', lambda f, rng: (f'/api/search?q={quote(rng.choice(SEARCH_TERMS))}', None)),
+    'analytics.pageview': ('POST', lambda f, rng: ('/api/analytics/pageview', {'page_url': f'/blog/{rng.randint(1, 200)}', 'session_id': f'bench-{rng.randrange(1000)}'}))
+}
+
+# Scenarios that write; off by default so repeated runs see the same data
+WRITE_SCENARIOS = ('analytics.pageview',)
+
+class QueryCounter:
+    """Counts SQL statements sent by the app's engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._increment)
+
+    def _increment(self, *args):
+        with self._lock:
+            self.count += 1
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def summarize(latencies, elapsed, queries, errors):
+    return {
+        'requests': len(latencies),
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+        'queries_per_request': queries / len(latencies),
+        'errors': errors
+    }
+
+def run_client(app, counter, fixtures, name, requests, warmup, seed):
+    """Sequential requests through the test client; no network or threading noise"""
+    method, factory = SCENARIOS[name]
+    rng = random.Random(seed)
+    client = app.test_client()
+    for _ in range(warmup):
+        path, body = factory(fixtures, rng)
+        client.open(path, method=method, json=body)
+
+    latencies = []
+    errors = 0
+    queries_before = counter.count
+    started = time.perf_counter()
+    for _ in range(requests):
+        path, body = factory(fixtures, rng)
+        request_started = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        latencies.append(time.perf_counter() - request_started)
+        errors += response.status_code >= 400
+    return summarize(latencies, time.perf_counter() - started, counter.count - queries_before, errors)
+
+def run_http(port, counter, fixtures, name, requests, warmup, concurrency, seed):
+    """Keep-alive HTTP clients on concurrency threads against the threaded server"""
+    method, factory = SCENARIOS[name]
+    plan = []
+    rng = random.Random(seed)
+    for _ in range(warmup + requests):
+        plan.append(factory(fixtures, rng))
+    warm, measured = plan[:warmup], plan[warmup:]
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    position = [0]
+
+    def send(connection, path, body):
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload else {}
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def worker():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while True:
+            with lock:
+                if position[0] >= len(measured):
+                    break
+                path, body = measured[position[0]]
+                position[0] += 1
+            request_started = time.perf_counter()
+            try:
+                status = send(connection, path, body)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                status = 599
+            elapsed = time.perf_counter() - request_started
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += status >= 400
+        connection.close()
+
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    for path, body in warm:
+        send(connection, path, body)
+    connection.close()
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, time.perf_counter() - started, counter.count - queries_before, errors[0])
+
+def start_server(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results, baseline=None):
+    header = f"{'endpoint':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'queries':>9}{'errors':>8}"
+    for mode, endpoints in results.items():
+        print(f"\n[{mode}]")
+        print(header + ('   vs baseline (p50 / p95 / queries)' if baseline else ''))
+        for name, result in endpoints.items():
+            line = (f"{name:<28}{result['p50_ms']:9.2f}{result['p95_ms']:9.2f}{result['p99_ms']:9.2f}"
+                    f"{result['throughput_rps']:9.1f}{result['queries_per_request']:9.1f}{result['errors']:8d}")
+            before = (baseline or {}).get(mode, {}).get(name)
+            if before:
+                def change(key):
+                    return f"{(result[key] - before[key]) / before[key] * 100:+6.1f}%" if before[key] else '     -'
+                line += f"   {change('p50_ms')} / {change('p95_ms')} / {result['queries_per_request'] - before['queries_per_request']:+.1f}"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='seeded SQLite file (default: a per-scale file in the temp directory)')
+    parser.add_argument('--reseed', action='store_true', help='recreate the database even if it exists')
+    add_count_arguments(parser)
+    parser.add_argument('--mode', choices=('client', 'http', 'both'), default='client')
+    parser.add_argument('--endpoint', action='append', help='only scenarios starting with this name (repeatable)')
+    parser.add_argument('--include-writes', action='store_true', help='also run scenarios that write to the database')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads in http mode')
+    parser.add_argument('--profile', default='balanced', help='SQLITE_PROFILE for the app under test')
+    parser.add_argument('--response-cache', default='none', help='RESPONSE_CACHE_BACKEND for the app under test')
+    parser.add_argument('--save', metavar='NAME', help='save results as baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='compare with baselines/NAME.json')
+    args = parser.parse_args()
+
+    counts = counts_from_args(args)
+    database = args.database or os.path.join(
+        tempfile.gettempdir(), f"prematurebabys-bench-{args.seed}-{'-'.join(str(count) for count in counts.values())}.db"
+    )
+    if args.reseed or not os.path.exists(database):
+        seed_file(database, counts, args.seed, args.anchor, args.days)
+
+    app = create_bench_app(database, SQLITE_PROFILE=args.profile, RESPONSE_CACHE_BACKEND=args.response_cache)
+    with app.app_context():
+        from src.models.user import db
+        counter = QueryCounter(db.engine)
+    fixtures = Fixtures(app)
+
+    names = [name for name in SCENARIOS if args.include_writes or name not in WRITE_SCENARIOS]
+    if args.endpoint:
+        names = [name for name in names if name.startswith(tuple(args.endpoint))]
+
+    modes = ('client', 'http') if args.mode == 'both' else (args.mode,)
+    results = {}
+    server = start_server(app) if 'http' in modes else None
+    for mode in modes:
+        results[mode] = {}
+        for index, name in enumerate(names):
+            if mode == 'client':
+                result = run_client(app, counter, fixtures, name, args.requests, args.warmup, args.seed + index)
+            else:
+                result = run_http(server.server_port, counter, fixtures, name, args.requests, args.warmup, args.concurrency, args.seed + index)
+            results[mode][name] = result
+            print(f"  {mode:<6} {name:<28} p50 {result['p50_ms']:8.2f} ms", file=sys.stderr)
+    if server is not None:
+        server.shutdown()
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json')) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save}.json')
+        with open(path, 'w') as f:
+            json.dump({
+                'meta': {
+                    'created_at': datetime.utcnow().isoformat(),
+                    'git_revision': git_revision(),
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'scale': args.scale,
+                    'counts': counts,
+                    'seed': args.seed,
+                    'requests': args.requests,
+                    'concurrency': args.concurrency,
+                    'sqlite_profile': args.profile,
+                    'response_cache': args.response_cache
+                },
+                'results': results
+            }, f, indent=2)
+        print(f"\nSaved baseline to {path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark streamed blog generation against the offline fake LLM backend.
+
+Submits a number of concurrent generation jobs through the Flask test client
+and reports time-to-first-token, total time per job and overall throughput.
+
+    python -m src.benchmarks.blog_generation --jobs 16 --concurrency 4
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=4, help='BLOG_GENERATION_CONCURRENCY')
+    parser.add_argument('--tokens', type=int, default=300)
+    parser.add_argument('--token-delay', type=float, default=0.01)
+    parser.add_argument('--first-token-delay', type=float, default=0.5)
+    args = parser.parse_args()
+
+    os.environ.update({
+        'BLOG_LLM_BACKEND': 'fake',
+        'BLOG_GENERATION_CONCURRENCY': str(args.concurrency),
+        'BLOG_GENERATION_MAX_QUEUED': str(args.jobs),
+        'BLOG_FAKE_TOKENS': str(args.tokens),
+        'BLOG_FAKE_TOKEN_DELAY': str(args.token_delay),
+        'BLOG_FAKE_FIRST_TOKEN_DELAY': str(args.first_token_delay)
+    })
+
+    # Keep benchmark jobs out of the application database
+    scratch = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+
+    from src.main import create_app, init_database
+
+    app = create_app()
+    init_database(app)
+
+    first_token = []
+    totals = []
+    lock = threading.Lock()
+
+    def run_job():
+        client = app.test_client()
+        started = time.perf_counter()
+        job = client.post('/api/blog/generate/jobs', json={'topic': 'Kangaroo care'}).get_json()
+        response = client.get(job['stream_url'], buffered=False)
+        first = None
+        for chunk in response.response:
+            if first is None and b'event: token' in chunk:
+                first = time.perf_counter() - started
+        with lock:
+            first_token.append(first)
+            totals.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=run_job) for _ in range(args.jobs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    print(f"{args.jobs} jobs, concurrency {args.concurrency}, {args.tokens} tokens each")
+    print(f"time to first token  p50 {statistics.median(first_token) * 1000:8.1f} ms   p95 {percentile(first_token, 0.95) * 1000:8.1f} ms")
+    print(f"job duration         p50 {statistics.median(totals) * 1000:8.1f} ms   p95 {percentile(totals, 0.95) * 1000:8.1f} ms")
+    print(f"throughput           {args.jobs / elapsed:.2f} jobs/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""Seed a SQLite database with deterministic synthetic data for benchmarks.
+
+The same --seed and --anchor always produce the same rows. Timestamps are
+spread over the --days before the anchor, which defaults to today's UTC
+midnight so the dashboard's default 30-day window has data in it.
+
+    python -m src.benchmarks.seed --scale large --database /tmp/bench-large.db
+    python -m src.benchmarks.seed --scale small --pageviews 200000 --database /tmp/bench.db
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+SCALES = {
+    'tiny': {'users': 50, 'threads': 200, 'posts': 2000, 'blog_posts': 50, 'pageviews': 20000, 'shares': 500},
+    'small': {'users': 500, 'threads': 1000, 'posts': 20000, 'blog_posts': 200, 'pageviews': 200000, 'shares': 5000},
+    'medium': {'users': 2000, 'threads': 5000, 'posts': 100000, 'blog_posts': 500, 'pageviews': 1000000, 'shares': 20000},
+    'large': {'users': 5000, 'threads': 10000, 'posts': 500000, 'blog_posts': 2000, 'pageviews': 5000000, 'shares': 50000}
+}
+
+BATCH_SIZE = 10000
+
+WORDS = (
+    "baby nicu feeding weight grams nurse doctor kangaroo care milk bottle breast "
+    "oxygen monitor incubator discharge home week day night sleep growth milestone "
+    "parents family hope worry support question answer thank you today tomorrow "
+    "journey strong little fighter hospital team visit hold skin warm corrected age "
+    "reflux apnea jaundice ventilator cpap gavage tube pump latch ounce progress"
+).split()
+
+TAGS = [
+    'nicu', 'feeding', 'coming home', 'mental health', 'milestones', 'kangaroo care',
+    'breastfeeding', 'sleep', 'development', 'siblings', 'travel', 'equipment',
+    'preemie growth', 'parent stories', 'reflux', 'oxygen', 'follow-up care', 'self care'
+]
+
+PLATFORMS = ('facebook', 'instagram', 'tiktok')
+
+PAGES = ['/', '/blog', '/forum', '/resources', '/about'] + [f'/blog/{i}' for i in range(1, 201)] + [f'/forum/thread/{i}' for i in range(1, 301)]
+
+USER_AGENTS = (
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/124.0 Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 14) AppleWebKit/537.36 Chrome/124.0 Mobile Safari/537.36'
+)
+
+def sentence(rng, low, high):
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    return ' '.join(words).capitalize() + '.'
+
+def paragraph(rng, sentences):
+    return ' '.join(sentence(rng, 6, 16) for _ in range(sentences))
+
+def default_anchor():
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+def insert_batches(db, table, rows):
+    """executemany INSERT in BATCH_SIZE chunks from a row generator"""
+    # Core inserts on the table skip the ORM's per-row bookkeeping
+    table = getattr(table, '__table__', table)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(db.insert(table), batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        db.session.execute(db.insert(table), batch)
+        db.session.commit()
+
+def seed_database(app, counts, seed=42, anchor=None, days=90, search_index=True, log=print):
+    """Fill an empty database through app's models; returns seconds taken per table"""
+    from src.models.user import db, User
+    from src.models.blog import BlogPost, BlogTag, blog_post_tags, WORDS_PER_MINUTE
+    from src.models.forum import ForumCategory, ForumThread, ForumPost
+    from src.routes.analytics import PageView, ShareEvent, ReferralTracking
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    from src.models.analytics import ShareRollup, ReferralRollup
+    from src.services import rollups, uniques
+    from src.services.search import is_search_enabled, rebuild_search_index
+
+    rng = random.Random(seed)
+    anchor = anchor or default_anchor()
+    span = days * 86400
+    timings = {}
+
+    def moment():
+        return anchor - timedelta(seconds=rng.randrange(span))
+
+    def step(name, func):
+        started = time.perf_counter()
+        func()
+        timings[name] = time.perf_counter() - started
+        log(f"  {name:<14} {timings[name]:7.1f} s")
+
+    with app.app_context():
+        if db.session.query(ForumThread.id).first() is not None:
+            raise ValueError('Database already has data; seed into an empty one')
+
+        def users():
+            insert_batches(db, User, ({'username': f'parent{i}', 'email': f'parent{i}@example.com'} for i in range(1, counts['users'] + 1)))
+
+        def blog():
+            db.session.execute(db.insert(BlogTag), [{'name': name, 'post_count': 0} for name in TAGS])
+            def post():
+                content = '\n\n'.join(paragraph(rng, 5) for _ in range(rng.randint(4, 10)))
+                excerpt = sentence(rng, 12, 24)
+                return {
+                    'title': sentence(rng, 3, 8).rstrip('.'),
+                    'content': content,
+                    'excerpt': excerpt,
+                    'summary': excerpt,
+                    'reading_minutes': max(1, math.ceil(len(content.split()) / WORDS_PER_MINUTE)),
+                    'author': rng.choice(('Admin', 'Dr. Lee', 'Nurse Sam')),
+                    'created_at': moment(),
+                    'updated_at': anchor,
+                    'published': rng.random() < 0.9
+                }
+
+            insert_batches(db, BlogPost, (post() for _ in range(counts['blog_posts'])))
+            tag_ids = [tag_id for (tag_id,) in db.session.query(BlogTag.id)]
+            insert_batches(db, blog_post_tags, (
+                {'post_id': post_id, 'tag_id': tag_id}
+                for post_id in range(1, counts['blog_posts'] + 1)
+                for tag_id in rng.sample(tag_ids, rng.randint(1, 4))
+            ))
+            BlogTag.refresh_counts(tag_ids)
+            db.session.commit()
+
+        def forum():
+            categories = ['NICU Support', 'Coming Home', 'Feeding & Growth', 'Mental Health & Wellness', 'Celebrations & Milestones', 'Resources & Recommendations']
+            db.session.execute(db.insert(ForumCategory), [{'name': name, 'description': sentence(rng, 8, 14), 'created_at': anchor - timedelta(days=days)} for name in categories])
+            created = [moment() for _ in range(counts['threads'])]
+            approved = [rng.random() < 0.97 for _ in range(counts['threads'])]
+            insert_batches(db, ForumThread, ({
+                'title': sentence(rng, 4, 10).rstrip('.'),
+                'content': paragraph(rng, rng.randint(2, 6)),
+                'author_id': rng.randint(1, counts['users']),
+                'category_id': rng.randint(1, len(categories)),
+                'created_at': created[i],
+                'updated_at': created[i],
+                'pinned': rng.random() < 0.01,
+                'locked': False,
+                'approved': approved[i],
+                'moderation_status': 'approved' if approved[i] else 'needs_review',
+                'post_count': 0
+            } for i in range(counts['threads'])))
+
+            # A few busy threads and a long tail, like a real forum
+            cumulative = list(itertools.accumulate(1.0 / (rank + 1) ** 0.8 for rank in range(counts['threads'])))
+            post_count = [0] * counts['threads']
+            last_post = list(created)
+
+            def posts():
+                for _ in range(counts['posts']):
+                    index = rng.choices(range(counts['threads']), cum_weights=cumulative)[0]
+                    posted = created[index] + timedelta(seconds=rng.randrange(max(1, int((anchor - created[index]).total_seconds()))))
+                    visible = rng.random() < 0.98
+                    if visible:
+                        post_count[index] += 1
+                        last_post[index] = max(last_post[index], posted)
+                    yield {
+                        'content': paragraph(rng, rng.randint(1, 4)),
+                        'author_id': rng.randint(1, counts['users']),
+                        'thread_id': index + 1,
+                        'created_at': posted,
+                        'updated_at': posted,
+                        'approved': visible,
+                        'moderation_status': 'approved' if visible else 'needs_review'
+                    }
+
+            insert_batches(db, ForumPost, posts())
+
+            threads = ForumThread.__table__
+            db.session.execute(threads.update().where(threads.c.id == db.bindparam('thread_id')).values(
+                post_count=db.bindparam('count'),
+                last_post_at=db.bindparam('last'),
+                updated_at=db.bindparam('last')
+            ), [
+                {'thread_id': index + 1, 'count': post_count[index], 'last': last_post[index]}
+                for index in range(counts['threads'])
+            ])
+            db.session.commit()
+
+        def analytics():
+            insert_batches(db, PageView, ({
+                'page_url': rng.choice(PAGES),
+                'user_agent': rng.choice(USER_AGENTS),
+                'ip_address': f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}',
+                'referrer': rng.choice((None, 'https://www.facebook.com/', 'https://www.google.com/')),
+                'timestamp': moment(),
+                'session_id': f'session-{rng.randrange(counts["pageviews"] // 5 + 1)}'
+            } for _ in range(counts['pageviews'])))
+            uniques.backfill()
+
+            codes = [f'{value:08x}' for value in rng.sample(range(16 ** 8), counts['shares'])]
+            shared = [(code, rng.choice(PLATFORMS), moment(), int(rng.paretovariate(1.5)) - 1) for code in codes]
+            insert_batches(db, ShareEvent, ({
+                'content_type': 'blog',
+                'content_id': rng.randint(1, max(1, counts['blog_posts'])),
+                'platform': platform,
+                'share_url': f'https://example.com/blog/{rng.randint(1, 200)}',
+                'referral_code': code,
+                'timestamp': at,
+                'clicks': clicks
+            } for code, platform, at, clicks in shared))
+            insert_batches(db, ReferralTracking, ({
+                'referral_code': code,
+                'original_url': f'https://example.com/blog/{rng.randint(1, 200)}',
+                'clicks': clicks,
+                'conversions': 0,
+                'created_at': at
+            } for code, _, at, clicks in shared))
+            rollups.refresh_rollups()
+
+            # Clicks land an hour after the share and count towards the share's
+            # platform bucket; aggregated here rather than calling
+            # rollups.record_clicks() once per referral
+            referral_clicks = {}
+            platform_clicks = {}
+            for code, platform, at, clicks in shared:
+                if clicks:
+                    for granularity, bucket in rollups.bucket_starts(at + timedelta(hours=1)):
+                        referral_clicks[(granularity, bucket, code)] = clicks
+                    for granularity, bucket in rollups.bucket_starts(at):
+                        key = (granularity, bucket, platform)
+                        platform_clicks[key] = platform_clicks.get(key, 0) + clicks
+            insert_batches(db, ReferralRollup, (
+                {'granularity': granularity, 'bucket': bucket, 'referral_code': code, 'clicks': clicks}
+                for (granularity, bucket, code), clicks in referral_clicks.items()
+            ))
+            share_rollup = ShareRollup.__table__
+            upsert = sqlite_insert(share_rollup).values(
+                granularity=db.bindparam('granularity'), bucket=db.bindparam('bucket'), platform=db.bindparam('platform'),
+                shares=0, clicks=db.bindparam('clicks')
+            )
+            upsert = upsert.on_conflict_do_update(
+                index_elements=['granularity', 'bucket', 'platform'],
+                set_={'clicks': share_rollup.c.clicks + upsert.excluded.clicks}
+            )
+            if platform_clicks:
+                db.session.execute(upsert, [
+                    {'granularity': granularity, 'bucket': bucket, 'platform': platform, 'clicks': clicks}
+                    for (granularity, bucket, platform), clicks in platform_clicks.items()
+                ])
+            db.session.commit()
+
+        def search():
+            if is_search_enabled():
+                rebuild_search_index()
+                db.session.commit()
+
+        step('users', users)
+        step('blog', blog)
+        step('forum', forum)
+        step('analytics', analytics)
+        if search_index:
+            step('search index', search)
+    return timings
+
+def create_bench_app(database, **config):
+    """App bound to the benchmark database, without background threads"""
+    from src.main import create_app
+
+    return create_app(dict({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(database)}',
+        'BACKGROUND_SERVICES': False,
+        'MODERATION_WORKERS': 0
+    }, **config))
+
+def seed_file(database, counts, seed=42, anchor=None, days=90, search_index=True, log=print):
+    """Create and seed database (a file path) from scratch"""
+    from src.main import init_database
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(database + suffix):
+            os.remove(database + suffix)
+    # No fsync while loading reproducible data
+    app = create_bench_app(database, SQLITE_PROFILE='bulk')
+    init_database(app)
+    log(f"Seeding {database}: " + ', '.join(f'{count} {name}' for name, count in counts.items()))
+    return seed_database(app, counts, seed, anchor, days, search_index, log)
+
+def add_count_arguments(parser):
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    for name in SCALES['small']:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name, help=f'override the scale\'s {name} count')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--anchor', type=datetime.fromisoformat, help='latest timestamp to generate (default: today 00:00 UTC)')
+    parser.add_argument('--days', type=int, default=90, help='days of history before the anchor')
+
+def counts_from_args(args):
+    counts = dict(SCALES[args.scale])
+    for name in counts:
+        if getattr(args, name) is not None:
+            counts[name] = getattr(args, name)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True, help='SQLite file to (re)create')
+    parser.add_argument('--no-search-index', action='store_true', help='skip building the FTS index')
+    add_count_arguments(parser)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed_file(args.database, counts_from_args(args), args.seed, args.anchor, args.days, not args.no_search_index)
+    print(f"Done in {time.perf_counter() - started:.1f} s")
+
+if __name__ == '__main__':
+    main()
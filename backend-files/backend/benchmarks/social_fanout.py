@@ -0,0 +1,97 @@
+"""Benchmark /social-media/post fan-out against a local stub Graph API.
+
+Starts a threaded HTTP server that answers every POST after a fixed delay,
+points the Facebook and Instagram integrations at it, and compares calling
+the platforms one after another with the pooled parallel fan-out.
+
+    python -m src.benchmarks.social_fanout --latency 0.2 --rounds 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+class StubGraphHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+    disable_nagle_algorithm = True  # avoid delayed-ACK stalls between header and body writes
+    latency = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+        body = json.dumps({'id': f'stub-{time.monotonic_ns()}'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server(latency):
+    StubGraphHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubGraphHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def configure_environment(base_url):
+    os.environ.update({
+        'FACEBOOK_API_BASE': base_url,
+        'INSTAGRAM_API_BASE': base_url,
+        'FACEBOOK_ACCESS_TOKEN': 'stub',
+        'FACEBOOK_PAGE_ID': 'page',
+        'INSTAGRAM_ACCESS_TOKEN': 'stub',
+        'INSTAGRAM_USER_ID': 'user'
+    })
+
+def summarize(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<12} mean {statistics.mean(samples) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.2, help='stub response delay in seconds')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.latency)
+    configure_environment(f'http://127.0.0.1:{server.server_address[1]}')
+
+    # Imported after the environment is set so the stub base URLs are picked up
+    from src.routes import social_media
+
+    platforms = ['facebook', 'instagram', 'tiktok']
+    media_url = 'https://prematurebabys.com/static/share.jpg'
+
+    sequential = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        social_media.post_to_facebook('benchmark', media_url)
+        social_media.post_to_instagram('benchmark', media_url)
+        social_media.post_to_tiktok('benchmark', media_url)
+        sequential.append(time.perf_counter() - started)
+
+    parallel = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        results = social_media.publish_to_platforms('benchmark', platforms, media_url)
+        parallel.append(time.perf_counter() - started)
+
+    print(f"stub latency {args.latency * 1000:.0f} ms, {args.rounds} rounds")
+    summarize('sequential', sequential)
+    summarize('fan-out', parallel)
+    print('last fan-out results:', json.dumps(results))
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark worker cold start: import time, app creation and first request.
+
+Each run is a fresh interpreter, like a newly forked or restarted worker. It
+times `import src.main`, `create_app()` and the first request to each path,
+and reports which heavy client libraries ended up loaded.
+
+    python -m src.benchmarks.startup --runs 10 --path /api/blog/posts --path /
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT = os.path.dirname(BACKEND)
+sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ('openai', 'requests', 'urllib3')
+
+# Runs in the child interpreter; prints one JSON line of timings in seconds
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+app = src.main.create_app({{'BACKGROUND_SERVICES': False}})
+created = time.perf_counter()
+client = app.test_client()
+first_requests = {{}}
+for path in {paths!r}:
+    before = time.perf_counter()
+    client.get(path)
+    first_requests[path] = time.perf_counter() - before
+print(json.dumps({{
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_requests': first_requests,
+    'heavy_modules': [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+def run_once(paths, env):
+    code = CHILD.format(root=ROOT, paths=paths, heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - started
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', action='append', dest='paths', help='request path to time (repeatable)')
+    args = parser.parse_args()
+    paths = args.paths or ['/api/blog/posts', '/api/forum/categories', '/']
+
+    # Keep benchmark runs out of the application database
+    scratch = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'bench.db')}")
+    subprocess.run([sys.executable, os.path.join(BACKEND, 'main.py'), 'init-db'], env=env, check=True)
+
+    runs = [run_once(paths, env) for _ in range(args.runs)]
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    def report(label, samples):
+        print(f"{label:<32} p50 {statistics.median(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms")
+
+    print(f"{args.runs} cold starts")
+    report('import src.main', [run['import'] for run in runs])
+    report('create_app()', [run['create_app'] for run in runs])
+    for path in paths:
+        report(f"first GET {path}", [run['first_requests'][path] for run in runs])
+    report('whole process', [run['process'] for run in runs])
+    loaded = sorted({name for run in runs for name in run['heavy_modules']})
+    print(f"heavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
+
+if __name__ == '__main__':
+    main()
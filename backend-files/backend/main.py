@@ -3,52 +3,128 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
 from flask_cors import CORS
-from src.models.user import db
-from src.models.blog import BlogPost
-from src.models.forum import ForumCategory, ForumThread, ForumPost
-from src.routes.user import user_bp
-from src.routes.webhooks import webhook_bp
-from src.routes.blog import blog_bp
-from src.routes.forum import forum_bp
-from src.routes.analytics import analytics_bp
-from src.routes.social_media import social_media_bp
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-CORS(app)  # Enable CORS for all routes
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-app.register_blueprint(user_bp, url_prefix="/api")
-app.register_blueprint(webhook_bp, url_prefix="/api")
-app.register_blueprint(blog_bp, url_prefix="/api")
-app.register_blueprint(forum_bp, url_prefix="/api")
-app.register_blueprint(analytics_bp, url_prefix="/api")
-app.register_blueprint(social_media_bp, url_prefix="/api")
-
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+
+def create_app(config=None):
+    """Build and configure the application.
+
+    Blueprints, models and services are imported here rather than at module
+    import, and SDK clients (openai, requests) are only imported on first use,
+    so a worker that serves static files or page views never loads them.
+    The schema is not touched; run init-db once per database.
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    CORS(app)  # Enable CORS for all routes
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config or {})
+    app.config.setdefault('BACKGROUND_SERVICES', os.getenv('BACKGROUND_SERVICES', '1') == '1')
+
+    from src.models.user import db
+    from src.services.database import configure_database
+    from src.services.metrics import metrics
+
+    db.init_app(app)
+    configure_database(app)
+    metrics.init_app(app)
+
+    from src.routes.user import user_bp
+    from src.routes.webhooks import webhook_bp
+    from src.routes.blog import blog_bp
+    from src.routes.forum import forum_bp
+    from src.routes.analytics import analytics_bp, pageview_buffer, referral_clicks
+    from src.routes.social_media import social_media_bp, post_scheduler
+    from src.routes.search import search_bp
+    from src.routes.system import system_bp
+    from src.services.moderation import moderation
+    from src.services.rollups import rollup_refresher
+    from src.services.blog_generation import blog_generator
+    from src.services.static_assets import static_assets, build_static_command
+    from src.services.response_cache import response_cache
+    from src.services.export import export_analytics_command
+    from src.services.uniques import backfill_uniques_command
+    from src.services.webhooks import webhook_queue
+    from src.services.forum_events import forum_events
+
+    app.register_blueprint(user_bp, url_prefix="/api")
+    app.register_blueprint(webhook_bp, url_prefix="/api")
+    app.register_blueprint(blog_bp, url_prefix="/api")
+    app.register_blueprint(forum_bp, url_prefix="/api")
+    app.register_blueprint(analytics_bp, url_prefix="/api")
+    app.register_blueprint(social_media_bp, url_prefix="/api")
+    app.register_blueprint(search_bp, url_prefix="/api")
+    app.register_blueprint(system_bp, url_prefix="/api")
+
+    moderation.init_app(app)
+    pageview_buffer.init_app(app)
+    referral_clicks.init_app(app)
+    rollup_refresher.init_app(app)
+    post_scheduler.init_app(app)
+    blog_generator.init_app(app)
+    static_assets.init_app(app)
+    response_cache.init_app(app)
+    webhook_queue.init_app(app)
+    forum_events.init_app(app)
+    if app.config['BACKGROUND_SERVICES']:
+        moderation.start()
+        rollup_refresher.start()
+        post_scheduler.start()
+        webhook_queue.start()
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(export_analytics_command)
+    app.cli.add_command(backfill_uniques_command)
+    app.cli.add_command(build_static_command)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        return static_assets.serve(path)
+
+    return app
+
+def init_database(app):
+    """Create missing tables and the search index; safe to run repeatedly"""
+    from src.models.user import db
+    from src.services.search import ensure_search_index
+
+    with app.app_context():
+        db.create_all()
+        # create_all skips tables that already exist, so indexes added to them later are created here
+        db.session.execute(db.text(
+            "CREATE INDEX IF NOT EXISTS ix_share_event_referral_code ON share_event (referral_code)"
+        ))
+        db.session.commit()
+        ensure_search_index()
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the database schema and search index."""
+    init_database(current_app)
+    click.echo('Database initialised.')
+
+_app = None
+
+def __getattr__(name):
+    # `src.main:app` keeps working for WSGI servers, but the app is only built
+    # when something asks for it, not whenever this module is imported
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if sys.argv[1:] == ['init-db']:
+        init_database(create_app({'BACKGROUND_SERVICES': False}))
+    else:
+        app = create_app()
+        init_database(app)
+        app.run(host='0.0.0.0', port=5000, debug=True)
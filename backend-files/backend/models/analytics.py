@@ -0,0 +1,38 @@
+from src.models.user import db
+
+# Pre-aggregated analytics, one row per (granularity, bucket, key).
+# granularity is 'hour' or 'day'; bucket is the start of the hour or day (UTC).
+
+class PageViewRollup(db.Model):
+    granularity = db.Column(db.String(4), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    page_url = db.Column(db.String(500), primary_key=True)
+    views = db.Column(db.Integer, default=0, nullable=False)
+
+class ShareRollup(db.Model):
+    granularity = db.Column(db.String(4), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    platform = db.Column(db.String(50), primary_key=True)
+    shares = db.Column(db.Integer, default=0, nullable=False)
+    clicks = db.Column(db.Integer, default=0, nullable=False)
+
+class ReferralRollup(db.Model):
+    granularity = db.Column(db.String(4), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    referral_code = db.Column(db.String(100), primary_key=True)
+    clicks = db.Column(db.Integer, default=0, nullable=False)
+
+class RollupWatermark(db.Model):
+    """Highest source row id already folded into the rollups, per source table"""
+    source = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, default=0, nullable=False)
+
+class UniqueSketch(db.Model):
+    """HyperLogLog registers (zlib-compressed) for distinct sessions or visitors in one UTC day.
+
+    page_url is '' for the site-wide sketch.
+    """
+    metric = db.Column(db.String(10), primary_key=True)  # 'sessions' or 'visitors'
+    day = db.Column(db.DateTime, primary_key=True)
+    page_url = db.Column(db.String(500), primary_key=True)
+    registers = db.Column(db.LargeBinary, nullable=False)
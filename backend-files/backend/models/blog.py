@@ -1,7 +1,73 @@
-from flask_sqlalchemy import SQLAlchemy
+import math
+import re
 from datetime import datetime
+from src.models.user import db
 
-db = SQLAlchemy()
+# Many-to-many link between posts and tags; the (tag_id, post_id) index
+# serves tag-filtered listings without touching other posts
+blog_post_tags = db.Table(
+    'blog_post_tags',
+    db.Column('post_id', db.Integer, db.ForeignKey('blog_post.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('blog_tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_blog_post_tags_tag', 'tag_id', 'post_id')
+)
+
+SUMMARY_LENGTH = 200
+WORDS_PER_MINUTE = 200
+
+# Markdown punctuation stripped before a summary is cut from the content
+MARKUP = re.compile(r'[#*_>`]+|!?\[([^\]]*)\]\([^)]*\)')
+
+class BlogTag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    post_count = db.Column(db.Integer, default=0, nullable=False)  # Published posts with this tag
+    
+    @staticmethod
+    def normalize_names(tags):
+        """Clean a list (or comma-separated string) of tag names, dropping blanks and duplicates"""
+        if isinstance(tags, str):
+            tags = tags.split(',')
+        names = []
+        for tag in tags or []:
+            name = ' '.join(str(tag).split()).lower()[:100]
+            if name and name not in names:
+                names.append(name)
+        return names
+    
+    @classmethod
+    def get_or_create(cls, names):
+        """Tag rows for the given normalized names, creating any that are missing"""
+        if not names:
+            return []
+        existing = {tag.name: tag for tag in cls.query.filter(cls.name.in_(names))}
+        for name in names:
+            if name not in existing:
+                existing[name] = cls(name=name)
+                db.session.add(existing[name])
+        return [existing[name] for name in names]
+    
+    @classmethod
+    def refresh_counts(cls, tag_ids):
+        """Recount published posts for just these tags, via the (tag_id, post_id) index"""
+        if not tag_ids:
+            return
+        db.session.flush()
+        published_count = db.select(db.func.count()).select_from(blog_post_tags).join(
+            BlogPost, BlogPost.id == blog_post_tags.c.post_id
+        ).where(
+            blog_post_tags.c.tag_id == cls.id,
+            BlogPost.published == True
+        ).scalar_subquery()
+        cls.query.filter(cls.id.in_(tag_ids)).update(
+            {cls.post_count: published_count}, synchronize_session=False
+        )
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'count': self.post_count
+        }
 
 class BlogPost(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -13,7 +79,27 @@ class BlogPost(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     published = db.Column(db.Boolean, default=False)
     featured_image = db.Column(db.String(500))
-    tags = db.Column(db.String(500))
+    # Listing fields derived from content on every save, so listings never read the body
+    summary = db.Column(db.Text)
+    reading_minutes = db.Column(db.Integer, default=1, nullable=False)
+    
+    tags = db.relationship('BlogTag', secondary=blog_post_tags, lazy='selectin', order_by='BlogTag.name')
+    
+    # Published listing order, newest first
+    __table_args__ = (
+        db.Index('ix_blog_post_listing', 'published', 'created_at', 'id'),
+    )
+    
+    def refresh_summary(self):
+        """Recompute summary (the author's excerpt, else the opening of the content) and reading time"""
+        text = ' '.join(MARKUP.sub(lambda match: match.group(1) or ' ', self.content or '').split())
+        self.reading_minutes = max(1, math.ceil(len(text.split()) / WORDS_PER_MINUTE))
+        if self.excerpt:
+            self.summary = self.excerpt
+        elif len(text) <= SUMMARY_LENGTH:
+            self.summary = text
+        else:
+            self.summary = text[:SUMMARY_LENGTH].rsplit(' ', 1)[0] + '...'
     
     def to_dict(self):
         return {
@@ -26,6 +112,27 @@ class BlogPost(db.Model):
             'updated_at': self.updated_at.isoformat(),
             'published': self.published,
             'featured_image': self.featured_image,
-            'tags': self.tags.split(',') if self.tags else []
+            'reading_minutes': self.reading_minutes,
+            'tags': [tag.name for tag in self.tags]
         }
 
+class BlogGenerationJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    topic = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, done, failed
+    content = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'topic': self.topic,
+            'status': self.status,
+            'content': self.content or '',
+            'excerpt': (self.content or '')[:200] + '...' if self.content else '',
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.user import db
+
+class CollectionVersion(db.Model):
+    """Change counter for a collection, bumped in the same transaction as each write to it.
+
+    Gives collection endpoints a validator that costs one primary-key lookup,
+    where no single row's updated_at covers the whole response.
+    """
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    @classmethod
+    def bump(cls, name):
+        """Advance a collection's version; the caller commits"""
+        now = datetime.utcnow()
+        db.session.execute(
+            sqlite_insert(cls).values(name=name, version=1, updated_at=now).on_conflict_do_update(
+                index_elements=['name'],
+                set_={'version': cls.version + 1, 'updated_at': now}
+            )
+        )
+    
+    @classmethod
+    def current(cls, name):
+        """(version, updated_at) for a collection; (0, None) if it has never changed"""
+        row = db.session.query(cls.version, cls.updated_at).filter_by(name=name).first()
+        return (row.version, row.updated_at) if row else (0, None)
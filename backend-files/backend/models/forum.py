@@ -1,7 +1,13 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from src.models.user import db
 
-db = SQLAlchemy()
+# Inlined rather than bound: SQLite only uses a partial index when the query
+# repeats the index's WHERE clause with the same literal values
+IN_REVIEW = "moderation_status IN ('pending', 'needs_review')"
+
+def in_review(model):
+    """Filter for content waiting on a moderator, matching the partial review indexes"""
+    return db.text(f'{model.__tablename__}.{IN_REVIEW}')
 
 class ForumCategory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -32,9 +38,40 @@ class ForumThread(db.Model):
     pinned = db.Column(db.Boolean, default=False)
     locked = db.Column(db.Boolean, default=False)
     approved = db.Column(db.Boolean, default=True)  # For moderation
+    moderation_status = db.Column(db.String(20), default='approved')  # pending, approved, needs_review, rejected
+    moderation_reason = db.Column(db.String(500))  # why the AI held it or a moderator rejected it
+    # Denormalized counters, kept current by create_post/approve_content
+    post_count = db.Column(db.Integer, default=0, nullable=False)
+    last_post_at = db.Column(db.DateTime)
     
     # Relationships
     posts = db.relationship('ForumPost', backref='thread', lazy=True, cascade='all, delete-orphan')
+    author = db.relationship('User', lazy=True)
+    
+    # Matches the listing order so each page is a single index range scan
+    __table_args__ = (
+        db.Index('ix_forum_thread_listing', 'approved', 'pinned', 'updated_at', 'id'),
+        # Moderation queue, oldest first, over just the rows awaiting review
+        db.Index('ix_forum_thread_review', 'created_at', 'id', sqlite_where=db.text(IN_REVIEW)),
+        # Category live streams replay new threads by (created_at, id)
+        db.Index('ix_forum_thread_category', 'category_id', 'created_at', 'id'),
+    )
+    
+    @classmethod
+    def record_activity(cls, thread_id, posted_at, count_post=True, posts=1):
+        """Atomically refresh a thread's updated_at and denormalized post counters.
+
+        posted_at is the newest of the `posts` newly visible posts being counted.
+        """
+        # SQLite's two-argument max() keeps timestamps from moving backwards when
+        # an older post is approved after newer activity
+        values = {cls.updated_at: db.func.max(cls.updated_at, posted_at)}
+        if count_post:
+            values[cls.post_count] = cls.post_count + posts
+            values[cls.last_post_at] = db.func.max(
+                db.func.coalesce(cls.last_post_at, posted_at), posted_at
+            )
+        cls.query.filter_by(id=thread_id).update(values, synchronize_session=False)
     
     def to_dict(self):
         return {
@@ -50,8 +87,10 @@ class ForumThread(db.Model):
             'pinned': self.pinned,
             'locked': self.locked,
             'approved': self.approved,
-            'post_count': len(self.posts),
-            'last_post_at': max([post.created_at for post in self.posts], default=self.created_at).isoformat() if self.posts else self.created_at.isoformat()
+            'moderation_status': self.moderation_status,
+            'moderation_reason': self.moderation_reason,
+            'post_count': self.post_count or 0,
+            'last_post_at': (self.last_post_at or self.created_at).isoformat()
         }
 
 class ForumPost(db.Model):
@@ -62,6 +101,16 @@ class ForumPost(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     approved = db.Column(db.Boolean, default=True)  # For moderation
+    moderation_status = db.Column(db.String(20), default='approved')  # pending, approved, needs_review, rejected
+    moderation_reason = db.Column(db.String(500))
+    
+    author = db.relationship('User', lazy=True)
+    
+    # Serves the thread view's (created_at, id) keyset pages
+    __table_args__ = (
+        db.Index('ix_forum_post_thread', 'thread_id', 'approved', 'created_at', 'id'),
+        db.Index('ix_forum_post_review', 'created_at', 'id', sqlite_where=db.text(IN_REVIEW)),
+    )
     
     def to_dict(self):
         return {
@@ -72,6 +121,8 @@ class ForumPost(db.Model):
             'thread_id': self.thread_id,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'approved': self.approved
+            'approved': self.approved,
+            'moderation_status': self.moderation_status,
+            'moderation_reason': self.moderation_reason
         }
 
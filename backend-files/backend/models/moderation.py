@@ -0,0 +1,39 @@
+from datetime import datetime
+from src.models.user import db
+
+class ModerationJob(db.Model):
+    """Durable queue entry for content awaiting AI moderation"""
+    id = db.Column(db.Integer, primary_key=True)
+    content_type = db.Column(db.String(20), nullable=False)  # 'thread' or 'post'
+    content_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, processing, done
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    result = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_moderation_job_status', 'status', 'id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'content_type': self.content_type,
+            'content_id': self.content_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'result': self.result,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class ModerationVerdict(db.Model):
+    """Cached moderator verdict, keyed by a hash of the normalized content"""
+    content_hash = db.Column(db.String(64), primary_key=True)
+    approved = db.Column(db.Boolean, nullable=False)
+    result = db.Column(db.Text)
+    hits = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
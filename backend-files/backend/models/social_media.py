@@ -0,0 +1,51 @@
+import json
+from datetime import datetime
+from src.models.user import db
+
+class ScheduledPost(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    content = db.Column(db.Text, nullable=False)
+    media_url = db.Column(db.String(500))
+    platforms = db.Column(db.String(200), nullable=False)  # JSON list
+    due_at = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), default='scheduled', nullable=False)  # scheduled, claimed, publishing, published, partial, failed, unknown, cancelled
+    claimed_at = db.Column(db.DateTime)
+    claim_token = db.Column(db.String(32))
+    completed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    outcomes = db.relationship('ScheduledPostOutcome', backref='scheduled_post', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_scheduled_post_due', 'status', 'due_at'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'content': self.content,
+            'media_url': self.media_url,
+            'platforms': json.loads(self.platforms),
+            'schedule_time': self.due_at.isoformat(),
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'outcomes': {outcome.platform: outcome.to_dict() for outcome in self.outcomes}
+        }
+
+class ScheduledPostOutcome(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    scheduled_post_id = db.Column(db.Integer, db.ForeignKey('scheduled_post.id'), nullable=False, index=True)
+    platform = db.Column(db.String(50), nullable=False)
+    success = db.Column(db.Boolean, nullable=False)
+    platform_post_id = db.Column(db.String(200))
+    error = db.Column(db.Text)
+    attempted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'success': self.success,
+            'post_id': self.platform_post_id,
+            'error': self.error,
+            'attempted_at': self.attempted_at.isoformat()
+        }
@@ -0,0 +1,41 @@
+import json
+from datetime import datetime
+from src.models.user import db
+
+class WebhookEvent(db.Model):
+    """Durable queue entry for a received webhook delivery"""
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(50), nullable=False)
+    idempotency_key = db.Column(db.String(200), nullable=False)
+    event_type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # raw JSON body
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, processing, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+    claim_token = db.Column(db.String(32))
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # pushed back after a failed attempt
+    claimed_at = db.Column(db.DateTime)
+    processed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.UniqueConstraint('source', 'idempotency_key', name='uq_webhook_event_key'),
+        db.Index('ix_webhook_event_status', 'status', 'id'),
+    )
+    
+    @property
+    def data(self):
+        return json.loads(self.payload)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'source': self.source,
+            'idempotency_key': self.idempotency_key,
+            'event_type': self.event_type,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'received_at': self.received_at.isoformat(),
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None
+        }
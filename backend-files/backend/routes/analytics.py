@@ -1,6 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
 from src.models.user import db
+from src.services.ingest import WriteBehindBuffer
+from src.services import rollups
+from src.services.referrals import ReferralClickCounter
+from src.services import export
+from src.services import uniques
 from datetime import datetime, timedelta
+import hmac
+import os
 import uuid
 
 analytics_bp = Blueprint("analytics_bp", __name__)
@@ -21,7 +28,7 @@ class ShareEvent(db.Model):
     content_id = db.Column(db.Integer)
     platform = db.Column(db.String(50), nullable=False)  # 'facebook', 'instagram', 'tiktok'
     share_url = db.Column(db.String(500))
-    referral_code = db.Column(db.String(100))
+    referral_code = db.Column(db.String(100), index=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     clicks = db.Column(db.Integer, default=0)
 
@@ -33,23 +40,107 @@ class ReferralTracking(db.Model):
     conversions = db.Column(db.Integer, default=0)  # Could track sign-ups, forum posts, etc.
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+# Page views are written behind the request in bulk batches, and folded
+# into the unique session/visitor sketches in the same transaction
+pageview_buffer = WriteBehindBuffer(PageView, 'PAGEVIEW')
+pageview_buffer.flush_hooks.append(uniques.fold_pageviews)
+
+# Referral redirects resolve from memory and flush click counts periodically
+referral_clicks = ReferralClickCounter(ReferralTracking, ShareEvent)
+
+MAX_PAGEVIEWS_PER_BATCH = 500
+
+def build_pageview_row(data, received_at):
+    """Column values for one PageView, stamped with when the request arrived"""
+    return {
+        'page_url': data.get('page_url'),
+        'user_agent': request.headers.get('User-Agent'),
+        'ip_address': request.remote_addr,
+        'referrer': data.get('referrer'),
+        'session_id': data.get('session_id'),
+        'timestamp': received_at
+    }
+
 # Track page views
 @analytics_bp.route("/analytics/pageview", methods=["POST"])
 def track_pageview():
     data = request.json
     
-    pageview = PageView(
-        page_url=data.get('page_url'),
-        user_agent=request.headers.get('User-Agent'),
-        ip_address=request.remote_addr,
-        referrer=data.get('referrer'),
-        session_id=data.get('session_id')
-    )
+    if not data or not data.get('page_url'):
+        return jsonify({'error': 'page_url is required'}), 400
     
-    db.session.add(pageview)
-    db.session.commit()
+    accepted = pageview_buffer.add(build_pageview_row(data, datetime.utcnow()))
+    
+    return jsonify({'status': 'success' if accepted else 'dropped'}), 202
+
+@analytics_bp.route("/analytics/pageviews", methods=["POST"])
+def track_pageviews_batch():
+    """Accept many page views in one request, e.g. flushed from the frontend on unload"""
+    data = request.json
+    pageviews = data.get('pageviews') if isinstance(data, dict) else data
+    
+    if not isinstance(pageviews, list) or not pageviews:
+        return jsonify({'error': 'pageviews must be a non-empty list'}), 400
+    
+    if len(pageviews) > MAX_PAGEVIEWS_PER_BATCH:
+        return jsonify({'error': f'At most {MAX_PAGEVIEWS_PER_BATCH} page views per request'}), 413
+    
+    received_at = datetime.utcnow()
+    accepted = 0
+    rejected = 0
+    for item in pageviews:
+        if not isinstance(item, dict) or not item.get('page_url'):
+            rejected += 1
+        elif pageview_buffer.add(build_pageview_row(item, received_at)):
+            accepted += 1
+    
+    return jsonify({
+        'status': 'success',
+        'accepted': accepted,
+        'rejected': rejected,
+        'dropped': len(pageviews) - accepted - rejected
+    }), 202
+
+@analytics_bp.route("/analytics/ingest-status", methods=["GET"])
+def get_ingest_status():
+    """Buffer depth and flush counters for page view ingestion in this worker"""
+    return jsonify(pageview_buffer.stats())
+
+@analytics_bp.route("/analytics/export/<dataset>", methods=["GET"])
+def export_analytics(dataset):
+    """Stream raw rows as NDJSON or CSV without loading the table into memory.
+
+    Filters: ?since= and ?until= (ISO 8601), ?after_id= to resume after the
+    last row received, ?limit= to cap the rows sent. Requires
+    ANALYTICS_EXPORT_TOKEN as a bearer token; disabled when it is not set.
+    """
+    token = current_app.config.get('ANALYTICS_EXPORT_TOKEN', os.getenv('ANALYTICS_EXPORT_TOKEN'))
+    if not token:
+        return jsonify({'error': 'Export is disabled on this server'}), 403
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Invalid export token'}), 401
+    
+    if dataset not in export.EXPORT_DATASETS:
+        return jsonify({'error': f'Unknown dataset: {dataset}'}), 404
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in export.EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(export.EXPORT_FORMATS)}'}), 400
     
-    return jsonify({'status': 'success'})
+    try:
+        since = export.parse_time(request.args.get('since'))
+        until = export.parse_time(request.args.get('until'))
+        after_id = int(request.args.get('after_id', 0))
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    rows = export.iter_rows(dataset, since, until, after_id, limit)
+    chunks = export.format_rows(rows, export_format, export.export_columns(dataset))
+    extension = 'jsonl' if export_format == 'ndjson' else 'csv'
+    return Response(stream_with_context(chunks), mimetype=export.EXPORT_FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename="{dataset}.{extension}"',
+        'X-Accel-Buffering': 'no'
+    })
 
 # Create viral sharing link
 @analytics_bp.route("/analytics/create-share-link", methods=["POST"])
@@ -77,6 +168,7 @@ def create_share_link():
     db.session.add(share_event)
     db.session.add(referral)
     db.session.commit()
+    referral_clicks.remember(referral_code, (referral.original_url, share_event.platform, share_event.timestamp))
     
     # Create viral sharing URL
     share_url = f"https://prematurebabys.com/share/{referral_code}"
@@ -106,71 +198,102 @@ def generate_platform_share_url(platform, url, title):
 # Track referral clicks
 @analytics_bp.route("/share/<referral_code>", methods=["GET"])
 def track_referral_click(referral_code):
-    referral = ReferralTracking.query.filter_by(referral_code=referral_code).first()
+    referral = referral_clicks.lookup(referral_code)
     
     if referral:
-        referral.clicks += 1
-        
-        # Also update the share event
-        share_event = ShareEvent.query.filter_by(referral_code=referral_code).first()
-        if share_event:
-            share_event.clicks += 1
-        
-        db.session.commit()
+        original_url, platform, shared_at = referral
+        referral_clicks.record_click(referral_code, platform, datetime.utcnow(), shared_at)
         
         # Redirect to original URL
         return jsonify({
-            'redirect_url': referral.original_url,
+            'redirect_url': original_url,
             'message': 'Welcome to our supportive community!'
         })
     else:
         return jsonify({'error': 'Invalid referral code'}), 404
 
+@analytics_bp.route("/analytics/referral-status", methods=["GET"])
+def get_referral_status():
+    """Code cache and pending click counters for this worker"""
+    return jsonify(referral_clicks.stats())
+
 # Analytics dashboard data
 @analytics_bp.route("/analytics/dashboard", methods=["GET"])
 def get_dashboard_data():
+    """Dashboard totals served from the hourly/daily rollups.
+
+    Only raw events newer than the rollup watermark are scanned, so the cost no
+    longer grows with the size of the window. Windows are hour-aligned.
+    """
     # Get date range (default to last 30 days)
     days = int(request.args.get('days', 30))
     start_date = datetime.utcnow() - timedelta(days=days)
+    tail_start, _ = rollups.rollup_window(start_date)
     
-    # Page views
-    total_pageviews = PageView.query.filter(PageView.timestamp >= start_date).count()
-    
-    # Top pages
-    top_pages = db.session.query(
-        PageView.page_url, 
-        db.func.count(PageView.id).label('views')
+    # Page views: rollups plus the not-yet-rolled tail
+    page_views = rollups.pageview_totals(start_date)
+    tail_pages = db.session.query(
+        PageView.page_url,
+        db.func.count(PageView.id)
     ).filter(
-        PageView.timestamp >= start_date
-    ).group_by(PageView.page_url).order_by(db.desc('views')).limit(10).all()
+        PageView.id > rollups.get_watermark('page_view'),
+        PageView.timestamp >= tail_start
+    ).group_by(PageView.page_url).all()
+    for url, views in tail_pages:
+        page_views[url] = page_views.get(url, 0) + views
     
-    # Share events
-    total_shares = ShareEvent.query.filter(ShareEvent.timestamp >= start_date).count()
+    total_pageviews = sum(page_views.values())
+    top_pages = sorted(page_views.items(), key=lambda page: page[1], reverse=True)[:10]
     
-    # Platform breakdown
-    platform_shares = db.session.query(
+    # Share events and platform breakdown; clicks are those of the shares made in the window
+    platform_totals = rollups.share_totals(start_date)
+    tail_shares = db.session.query(
         ShareEvent.platform,
-        db.func.count(ShareEvent.id).label('shares'),
-        db.func.sum(ShareEvent.clicks).label('clicks')
+        db.func.count(ShareEvent.id)
     ).filter(
-        ShareEvent.timestamp >= start_date
+        ShareEvent.id > rollups.get_watermark('share_event'),
+        ShareEvent.timestamp >= tail_start
     ).group_by(ShareEvent.platform).all()
+    for platform, shares in tail_shares:
+        rolled_shares, clicks = platform_totals.get(platform, (0, 0))
+        platform_totals[platform] = (rolled_shares + shares, clicks)
+    
+    total_shares = sum(shares for shares, _ in platform_totals.values())
     
-    # Referral performance
+    # Distinct sessions and visitors, merged from daily sketches over whole UTC days
+    unique = uniques.unique_counts(start_date, datetime.utcnow(), [uniques.SITE_WIDE] + [url for url, _ in top_pages])
+    
+    # Referral performance: links created in the window by all-time clicks,
+    # and links by the clicks they got within the window
     top_referrals = ReferralTracking.query.filter(
         ReferralTracking.created_at >= start_date
     ).order_by(ReferralTracking.clicks.desc()).limit(10).all()
+    trending_codes = rollups.top_referral_clicks(start_date, limit=10)
+    trending = {
+        ref.referral_code: ref for ref in ReferralTracking.query.filter(
+            ReferralTracking.referral_code.in_([code for code, _ in trending_codes])
+        )
+    }
     
     return jsonify({
         'total_pageviews': total_pageviews,
         'total_shares': total_shares,
-        'top_pages': [{'url': page[0], 'views': page[1]} for page in top_pages],
+        'unique_sessions': unique[uniques.SITE_WIDE]['sessions'],
+        'unique_visitors': unique[uniques.SITE_WIDE]['visitors'],
+        'top_pages': [
+            {
+                'url': page[0],
+                'views': page[1],
+                'unique_sessions': unique[page[0]]['sessions'],
+                'unique_visitors': unique[page[0]]['visitors']
+            } for page in top_pages
+        ],
         'platform_breakdown': [
             {
-                'platform': platform[0], 
-                'shares': platform[1], 
-                'clicks': platform[2] or 0
-            } for platform in platform_shares
+                'platform': platform, 
+                'shares': totals[0], 
+                'clicks': totals[1] or 0
+            } for platform, totals in platform_totals.items()
         ],
         'top_referrals': [
             {
@@ -179,9 +302,41 @@ def get_dashboard_data():
                 'clicks': ref.clicks,
                 'conversions': ref.conversions
             } for ref in top_referrals
+        ],
+        'trending_referrals': [
+            {
+                'code': code,
+                'url': trending[code].original_url,
+                'clicks_in_window': clicks,
+                'conversions': trending[code].conversions
+            } for code, clicks in trending_codes if code in trending
         ]
     })
 
+@analytics_bp.route("/analytics/uniques", methods=["GET"])
+def get_unique_counts():
+    """Estimated distinct sessions and visitors over whole UTC days.
+
+    ?start= and ?end= are ISO dates (default: the last 30 days through today);
+    repeat ?page_url= for per-page counts, otherwise the whole site is counted.
+    Estimates come from HyperLogLog sketches, within about 2%.
+    """
+    try:
+        end = export.parse_time(request.args.get('end')) or datetime.utcnow()
+        start = export.parse_time(request.args.get('start')) or end - timedelta(days=29)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+    
+    page_urls = request.args.getlist('page_url')[:50] or [uniques.SITE_WIDE]
+    counts = uniques.unique_counts(start, end, page_urls)
+    return jsonify({
+        'start': uniques.day_start(start).date().isoformat(),
+        'end': uniques.day_start(end).date().isoformat(),
+        'pages': [{'url': url or None, **counts[url]} for url in page_urls]
+    })
+
 # Auto-posting to social media (placeholder - requires actual API integration)
 @analytics_bp.route("/analytics/auto-post", methods=["POST"])
 def auto_post_to_social():
@@ -239,6 +394,7 @@ def create_share_link_internal(content_type, content_id, platform, url, title):
     db.session.add(share_event)
     db.session.add(referral)
     db.session.commit()
+    referral_clicks.remember(referral_code, (referral.original_url, share_event.platform, share_event.timestamp))
     
     return {
         'share_url': f"https://prematurebabys.com/share/{referral_code}",
@@ -1,16 +1,129 @@
-from flask import Blueprint, request, jsonify
-from src.models.blog import BlogPost, db
-import openai
-import os
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from src.models.blog import BlogPost, BlogTag, BlogGenerationJob, blog_post_tags, db
+from src.services.blog_generation import blog_generator, QueueFull
+from src.services.search import index_blog_post, remove_document
+from src.services.response_cache import response_cache
+from src.utils.pagination import encode_cursor, decode_cursor, get_page_size, paginated_response
+from src.utils.conditional import conditional, make_etag
+from datetime import datetime
+import json
+import time
 
 blog_bp = Blueprint("blog_bp", __name__)
 
+# Listing fields selectable with ?fields=; 'excerpt' is the stored summary
+BLOG_LIST_COLUMNS = {
+    'id': BlogPost.id,
+    'title': BlogPost.title,
+    'excerpt': BlogPost.summary,
+    'author': BlogPost.author,
+    'created_at': BlogPost.created_at,
+    'updated_at': BlogPost.updated_at,
+    'published': BlogPost.published,
+    'featured_image': BlogPost.featured_image,
+    'reading_minutes': BlogPost.reading_minutes,
+    'content': BlogPost.content
+}
+BLOG_SUMMARY_FIELDS = ('id', 'title', 'excerpt', 'author', 'created_at', 'featured_image', 'reading_minutes', 'tags')
+BLOG_CURSOR_TYPES = (datetime, int)
+
+# How often a stream re-reads a job that is running in another worker
+JOB_POLL_SECONDS = 2.0
+
 @blog_bp.route("/blog/posts", methods=["GET"])
+@response_cache.cached(tags=('blog:list',))
 def get_blog_posts():
-    posts = BlogPost.query.filter_by(published=True).order_by(BlogPost.created_at.desc()).all()
-    return jsonify([post.to_dict() for post in posts])
+    """List published posts, newest first, one keyset page at a time.
+
+    ?view=summary returns only the listing fields and ?fields=a,b,... picks
+    any of BLOG_LIST_COLUMNS plus tags; both select just those columns, so
+    post bodies are never read unless asked for, and come back in pages.
+    Without either, posts come back in full and, unless ?limit= or ?cursor=
+    is given, all at once as before. Pass the X-Next-Cursor header as
+    ?cursor= to continue.
+    """
+    fields = None
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in BLOG_LIST_COLUMNS and field != 'tags']
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    elif request.args.get('view') == 'summary':
+        fields = list(BLOG_SUMMARY_FIELDS)
+    
+    paged = fields is not None or 'limit' in request.args or 'cursor' in request.args
+    limit = get_page_size(request.args)
+    if fields is None:
+        query = BlogPost.query
+    else:
+        # id and created_at are always selected for the cursor and tag lookup
+        columns = [BLOG_LIST_COLUMNS[field] for field in fields if field not in ('id', 'created_at', 'tags')]
+        query = db.session.query(BlogPost.id, BlogPost.created_at, *columns)
+    query = query.filter(BlogPost.published == True)
+    
+    tag = request.args.get('tag')
+    if tag:
+        names = BlogTag.normalize_names([tag])
+        query = query.join(blog_post_tags, blog_post_tags.c.post_id == BlogPost.id).join(
+            BlogTag, BlogTag.id == blog_post_tags.c.tag_id
+        ).filter(BlogTag.name == (names[0] if names else ''))
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor, BLOG_CURSOR_TYPES)
+        if position is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.tuple_(BlogPost.created_at, BlogPost.id) < position)
+    
+    query = query.order_by(BlogPost.created_at.desc(), BlogPost.id.desc())
+    posts = query.limit(limit + 1).all() if paged else query.all()
+    
+    next_cursor = None
+    if paged and len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor([posts[-1].created_at, posts[-1].id])
+    
+    if fields is None:
+        return paginated_response(jsonify([post.to_dict() for post in posts]), next_cursor)
+    
+    tags = {}
+    if 'tags' in fields and posts:
+        tag_rows = db.session.query(blog_post_tags.c.post_id, BlogTag.name).join(
+            BlogTag, BlogTag.id == blog_post_tags.c.tag_id
+        ).filter(blog_post_tags.c.post_id.in_([post.id for post in posts])).order_by(BlogTag.name)
+        for post_id, name in tag_rows:
+            tags.setdefault(post_id, []).append(name)
+    
+    def project(post):
+        row = post._asdict()
+        values = {}
+        for field in fields:
+            if field == 'tags':
+                values[field] = tags.get(post.id, [])
+            else:
+                value = row[BLOG_LIST_COLUMNS[field].key]
+                values[field] = value.isoformat() if isinstance(value, datetime) else value
+        return values
+    
+    return paginated_response(jsonify([project(post) for post in posts]), next_cursor)
+
+@blog_bp.route("/blog/tags", methods=["GET"])
+def get_blog_tags():
+    """Tags with their published post counts, most used first"""
+    tags = BlogTag.query.filter(BlogTag.post_count > 0).order_by(
+        BlogTag.post_count.desc(), BlogTag.name.asc()
+    ).all()
+    return jsonify([tag.to_dict() for tag in tags])
+
+def blog_post_validators(post_id):
+    updated_at = db.session.query(BlogPost.updated_at).filter_by(id=post_id).scalar()
+    if updated_at is None:
+        return None
+    return make_etag('blog:post', post_id, updated_at), updated_at
 
 @blog_bp.route("/blog/posts/<int:post_id>", methods=["GET"])
+@conditional(blog_post_validators)
+@response_cache.cached(tags=('blog:post:{post_id}',))
 def get_blog_post(post_id):
     post = BlogPost.query.get_or_404(post_id)
     return jsonify(post.to_dict())
@@ -26,16 +139,28 @@ def create_blog_post():
         author=data.get('author', 'Admin'),
         published=data.get('published', False),
         featured_image=data.get('featured_image'),
-        tags=','.join(data.get('tags', []))
+        tags=BlogTag.get_or_create(BlogTag.normalize_names(data.get('tags', [])))
     )
+    post.refresh_summary()
     
     db.session.add(post)
+    db.session.flush()
+    BlogTag.refresh_counts([tag.id for tag in post.tags])
+    index_blog_post(post)
     db.session.commit()
+    response_cache.invalidate(tags=['blog:list'])
     
     return jsonify(post.to_dict()), 201
 
 @blog_bp.route("/blog/generate", methods=["POST"])
 def generate_blog_content():
+    """Generate a post and wait for the whole result.
+
+    Kept for existing clients; new clients should submit a job to
+    /blog/generate/jobs and stream it. Generation still goes through the
+    capped job pool, so a burst of requests is rejected rather than tying up
+    every worker.
+    """
     data = request.json
     topic = data.get('topic')
     
@@ -43,27 +168,107 @@ def generate_blog_content():
         return jsonify({'error': 'Topic is required'}), 400
     
     try:
-        # Use OpenAI to generate blog content
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a compassionate expert writer specializing in premature baby health and support. Your writing should be deeply empathetic, understanding that parents reading this are likely experiencing fear, uncertainty, and overwhelming emotions. Write with warmth, hope, and genuine care. Provide practical advice while acknowledging the emotional journey. Always include reassurance and remind parents that they are not alone in this experience."},
-                {"role": "user", "content": f"Write a detailed, compassionate blog post about: {topic}. Address both the practical and emotional aspects. Include expert insights, but deliver them with warmth and understanding. Make it around 1000-1500 words, and ensure it provides both information and emotional support for NICU families."}
-            ],
-            max_tokens=2000
-        )
-        
-        generated_content = response.choices[0].message.content
-        
+        live = blog_generator.submit(topic)
+    except QueueFull:
+        return jsonify({'error': 'Too many posts are being generated, please try again shortly'}), 429
+    
+    generated_content = ''.join(chunk for index, chunk in live.follow() if chunk is not None)
+    
+    if live.status == 'failed':
+        return jsonify({'error': live.error}), 500
+    
+    return jsonify({
+        'title': topic,
+        'content': generated_content,
+        'excerpt': generated_content[:200] + '...'
+    })
+
+@blog_bp.route("/blog/generate/jobs", methods=["POST"])
+def submit_blog_generation():
+    """Start generating a post in the background and return its job id"""
+    data = request.json
+    topic = data.get('topic')
+    
+    if not topic:
+        return jsonify({'error': 'Topic is required'}), 400
+    
+    try:
+        live = blog_generator.submit(topic)
+    except QueueFull:
+        return jsonify({'error': 'Too many posts are being generated, please try again shortly'}), 429
+    
+    return jsonify({
+        'job_id': live.id,
+        'status': live.status,
+        'status_url': f'/api/blog/generate/jobs/{live.id}',
+        'stream_url': f'/api/blog/generate/jobs/{live.id}/stream'
+    }), 202
+
+@blog_bp.route("/blog/generate/jobs/<job_id>", methods=["GET"])
+def get_blog_generation(job_id):
+    """Job status plus whatever content has been generated so far"""
+    live = blog_generator.get_live(job_id)
+    if live is not None and live.status in ('queued', 'running'):
+        content = ''.join(live.chunks)
         return jsonify({
-            'title': topic,
-            'content': generated_content,
-            'excerpt': generated_content[:200] + '...'
+            'id': live.id,
+            'topic': live.topic,
+            'status': live.status,
+            'content': content,
+            'excerpt': '',
+            'error': None
         })
+    
+    job = BlogGenerationJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+@blog_bp.route("/blog/generate/jobs/<job_id>/stream", methods=["GET"])
+def stream_blog_generation(job_id):
+    """Stream generated text as server-sent events.
+
+    Each `token` event carries a JSON-encoded chunk and its index as the event
+    id, so a reconnecting client can send Last-Event-ID and pick up where it
+    left off. A final `done` or `error` event closes the stream.
+    
+    A job running in another worker has no live stream here; the table is
+    polled until it finishes and its content is then sent as one token.
+    """
+    live = blog_generator.get_live(job_id)
+    job = None
+    if live is None:
+        job = BlogGenerationJob.query.get_or_404(job_id)
+    
+    try:
+        resume_after = int(request.headers.get('Last-Event-ID', -1))
+    except ValueError:
+        resume_after = -1
+    
+    def events():
+        if live is None:
+            yield "retry: 2000\n\n"
+            while job.status in ('queued', 'running'):
+                yield ": keep-alive\n\n"
+                time.sleep(JOB_POLL_SECONDS)
+                db.session.refresh(job)
+            if job.content and resume_after < 0:
+                yield f"id: 0\nevent: token\ndata: {json.dumps(job.content)}\n\n"
+            yield f"event: {'error' if job.status == 'failed' else 'done'}\ndata: {json.dumps(job.to_dict())}\n\n"
+            return
         
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        yield "retry: 2000\n\n"
+        for index, chunk in live.follow():
+            if chunk is None:
+                yield ": keep-alive\n\n"
+            elif index > resume_after:
+                yield f"id: {index}\nevent: token\ndata: {json.dumps(chunk)}\n\n"
+        
+        final = {'status': live.status, 'error': live.error}
+        yield f"event: {'error' if live.status == 'failed' else 'done'}\ndata: {json.dumps(final)}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @blog_bp.route("/blog/posts/<int:post_id>", methods=["PUT"])
 def update_blog_post(post_id):
@@ -75,17 +280,29 @@ def update_blog_post(post_id):
     post.excerpt = data.get('excerpt', post.excerpt)
     post.published = data.get('published', post.published)
     post.featured_image = data.get('featured_image', post.featured_image)
-    post.tags = ','.join(data.get('tags', [])) if data.get('tags') else post.tags
+    previous_tag_ids = {tag.id for tag in post.tags}
+    if data.get('tags'):
+        post.tags = BlogTag.get_or_create(BlogTag.normalize_names(data.get('tags')))
+    post.refresh_summary()
+    post.updated_at = datetime.utcnow()  # also covers tag-only edits, which leave the row untouched
     
+    db.session.flush()
+    BlogTag.refresh_counts(previous_tag_ids | {tag.id for tag in post.tags})
+    index_blog_post(post)
     db.session.commit()
+    response_cache.invalidate(tags=['blog:list', f'blog:post:{post_id}'])
     
     return jsonify(post.to_dict())
 
 @blog_bp.route("/blog/posts/<int:post_id>", methods=["DELETE"])
 def delete_blog_post(post_id):
     post = BlogPost.query.get_or_404(post_id)
+    tag_ids = [tag.id for tag in post.tags]
     db.session.delete(post)
+    BlogTag.refresh_counts(tag_ids)
+    remove_document('blog', post_id)
     db.session.commit()
+    response_cache.invalidate(tags=['blog:list', f'blog:post:{post_id}'])
     
     return jsonify({'message': 'Post deleted successfully'})
 
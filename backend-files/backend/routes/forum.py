@@ -1,33 +1,28 @@
-from flask import Blueprint, request, jsonify
-from src.models.forum import ForumCategory, ForumThread, ForumPost, db
+from flask import Blueprint, request, jsonify, Response, current_app
+from collections import deque
+from datetime import datetime
+import json
+import time
+from sqlalchemy.orm import joinedload
+from src.models.forum import ForumCategory, ForumThread, ForumPost, in_review, db
 from src.models.user import User
-import openai
+from src.services.moderation import moderation, apply_verdict, bulk_review
+from src.services.response_cache import response_cache
+from src.services.forum_events import forum_events, TooManySubscribers, latest_position, items_after
+from src.models.collection_version import CollectionVersion
+from src.utils.pagination import encode_cursor, decode_cursor, get_page_size, paginated_response
+from src.utils.conditional import conditional, make_etag
 
 forum_bp = Blueprint("forum_bp", __name__)
 
-# Content moderation using AI
-def moderate_content(content):
-    """Use AI to check if content is appropriate and supportive"""
-    try:
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a compassionate content moderator for a support forum for families with premature babies. Your role is to ensure all content is supportive, appropriate, and maintains a safe space for vulnerable families. Check if the content is: 1) Supportive and kind, 2) Appropriate for families in crisis, 3) Free from harmful advice, 4) Respectful of different experiences. Respond with 'APPROVED' if the content is appropriate, or 'NEEDS_REVIEW: [reason]' if it needs human review."},
-                {"role": "user", "content": f"Please review this forum post content: {content}"}
-            ],
-            max_tokens=100
-        )
-        
-        result = response.choices[0].message.content.strip()
-        return result.startswith('APPROVED'), result
-        
-    except Exception as e:
-        # If AI moderation fails, default to human review
-        return False, f"NEEDS_REVIEW: AI moderation unavailable - {str(e)}"
-
 # Forum Categories
+def category_list_validators():
+    version, updated_at = CollectionVersion.current('forum:categories')
+    return make_etag('forum:categories', version), updated_at
+
 @forum_bp.route("/forum/categories", methods=["GET"])
+@conditional(category_list_validators)
+@response_cache.cached(tags=('forum:categories',))
 def get_categories():
     categories = ForumCategory.query.all()
     return jsonify([cat.to_dict() for cat in categories])
@@ -40,52 +35,128 @@ def create_category():
         description=data.get('description')
     )
     db.session.add(category)
+    CollectionVersion.bump('forum:categories')
     db.session.commit()
+    response_cache.invalidate(tags=['forum:categories'])
     return jsonify(category.to_dict()), 201
 
 # Forum Threads
+THREAD_CURSOR_TYPES = (bool, datetime, int)
+
 @forum_bp.route("/forum/threads", methods=["GET"])
+@response_cache.cached(tags=('forum:threads',))
 def get_threads():
+    """List approved threads, one keyset page at a time.
+
+    Pages are ordered by (pinned, updated_at, id) descending. Pass the
+    X-Next-Cursor header from the previous response as ?cursor= to continue.
+    """
     category_id = request.args.get('category_id')
-    query = ForumThread.query.filter_by(approved=True)
+    limit = get_page_size(request.args)
+    query = ForumThread.query.filter_by(approved=True).options(
+        joinedload(ForumThread.author),
+        joinedload(ForumThread.category)
+    )
     
     if category_id:
         query = query.filter_by(category_id=category_id)
     
-    threads = query.order_by(ForumThread.pinned.desc(), ForumThread.updated_at.desc()).all()
-    return jsonify([thread.to_dict() for thread in threads])
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor, THREAD_CURSOR_TYPES)
+        if position is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(
+            db.tuple_(ForumThread.pinned, ForumThread.updated_at, ForumThread.id) < position
+        )
+    
+    threads = query.order_by(
+        ForumThread.pinned.desc(),
+        ForumThread.updated_at.desc(),
+        ForumThread.id.desc()
+    ).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(threads) > limit:
+        threads = threads[:limit]
+        last = threads[-1]
+        next_cursor = encode_cursor([bool(last.pinned), last.updated_at, last.id])
+    
+    return paginated_response(jsonify([thread.to_dict() for thread in threads]), next_cursor)
+
+POST_CURSOR_TYPES = (datetime, int)
+
+def thread_validators(thread_id):
+    # Post approvals move updated_at forward or, for older posts, post_count.
+    # Each page is its own representation, so the page's cursor and limit are part of the tag.
+    row = db.session.query(ForumThread.updated_at, ForumThread.post_count).filter_by(id=thread_id).first()
+    if row is None:
+        return None
+    page = (request.args.get('cursor'), request.args.get('limit'))
+    return make_etag('forum:thread', thread_id, row.updated_at, row.post_count, page), row.updated_at
 
 @forum_bp.route("/forum/threads/<int:thread_id>", methods=["GET"])
+@conditional(thread_validators)
 def get_thread(thread_id):
-    thread = ForumThread.query.get_or_404(thread_id)
-    posts = ForumPost.query.filter_by(thread_id=thread_id, approved=True).order_by(ForumPost.created_at.asc()).all()
+    """A thread and one keyset page of its approved posts, oldest first.
+
+    The header's counts come from the thread's stored counters and authors
+    are joined into the page query, so any page costs the same two queries.
+    Pass the X-Next-Cursor header from the previous response as ?cursor=.
+    """
+    thread = ForumThread.query.options(
+        joinedload(ForumThread.author),
+        joinedload(ForumThread.category)
+    ).filter_by(id=thread_id).first_or_404()
+    limit = get_page_size(request.args)
+    query = ForumPost.query.filter_by(thread_id=thread_id, approved=True).options(
+        joinedload(ForumPost.author)
+    )
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor, POST_CURSOR_TYPES)
+        if position is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.tuple_(ForumPost.created_at, ForumPost.id) > position)
+    
+    posts = query.order_by(ForumPost.created_at.asc(), ForumPost.id.asc()).limit(limit + 1).all()
     
-    return jsonify({
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        last = posts[-1]
+        next_cursor = encode_cursor([last.created_at, last.id])
+    
+    return paginated_response(jsonify({
         'thread': thread.to_dict(),
         'posts': [post.to_dict() for post in posts]
-    })
+    }), next_cursor)
 
 @forum_bp.route("/forum/threads", methods=["POST"])
 def create_thread():
     data = request.json
     
-    # Moderate content with compassion
-    approved, moderation_result = moderate_content(data.get('content', ''))
-    
     thread = ForumThread(
         title=data.get('title'),
         content=data.get('content'),
         author_id=data.get('author_id', 1),  # Default to admin for now
-        category_id=data.get('category_id'),
-        approved=approved
+        category_id=data.get('category_id')
     )
     
     db.session.add(thread)
+    db.session.flush()
+    
+    # Moderate content with compassion, off the request path
+    moderation.enqueue('thread', thread)
+    CollectionVersion.bump('forum:categories')  # thread_count
     db.session.commit()
+    moderation.notify()
+    response_cache.invalidate(tags=['forum:categories'])
+    forum_events.publish_approved('thread', [thread])
     
     response_data = thread.to_dict()
-    if not approved:
-        response_data['moderation_note'] = 'Your post is being reviewed to ensure it provides the best support for our community.'
+    response_data['moderation_note'] = 'Your post is being reviewed to ensure it provides the best support for our community.'
     
     return jsonify(response_data), 201
 
@@ -94,41 +165,118 @@ def create_thread():
 def create_post():
     data = request.json
     
-    # Moderate content with compassion
-    approved, moderation_result = moderate_content(data.get('content', ''))
-    
     post = ForumPost(
         content=data.get('content'),
         author_id=data.get('author_id', 1),  # Default to admin for now
-        thread_id=data.get('thread_id'),
-        approved=approved
+        thread_id=data.get('thread_id')
     )
     
     db.session.add(post)
+    db.session.flush()
     
-    # Update thread's updated_at timestamp
-    thread = ForumThread.query.get(data.get('thread_id'))
-    if thread:
-        thread.updated_at = db.func.now()
+    # Moderate content with compassion, off the request path
+    moderation.enqueue('post', post)
+    
+    # Update thread's updated_at timestamp; counters follow once the post is approved
+    ForumThread.record_activity(post.thread_id, post.created_at, count_post=False)
     
     db.session.commit()
+    moderation.notify()
+    response_cache.invalidate(tags=['forum:threads'])
+    forum_events.publish_approved('post', [post])
     
     response_data = post.to_dict()
-    if not approved:
-        response_data['moderation_note'] = 'Your message is being reviewed to ensure it provides the best support for our community.'
+    response_data['moderation_note'] = 'Your message is being reviewed to ensure it provides the best support for our community.'
     
     return jsonify(response_data), 201
 
 # Moderation endpoints
+REVIEW_CURSOR_TYPES = (datetime, int)
+MAX_BULK_REVIEW = 500
+
+def review_page(model, *options):
+    """One page of content awaiting review, oldest first, via the partial review index"""
+    limit = get_page_size(request.args)
+    query = model.query.filter(in_review(model)).options(*options)
+    
+    status = request.args.get('status')
+    if status:
+        query = query.filter(model.moderation_status == status)
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor, REVIEW_CURSOR_TYPES)
+        if position is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.tuple_(model.created_at, model.id) > position)
+    
+    items = query.order_by(model.created_at.asc(), model.id.asc()).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([items[-1].created_at, items[-1].id])
+    
+    return paginated_response(jsonify([item.to_dict() for item in items]), next_cursor)
+
 @forum_bp.route("/forum/moderation/threads", methods=["GET"])
 def get_threads_for_moderation():
-    threads = ForumThread.query.filter_by(approved=False).all()
-    return jsonify([thread.to_dict() for thread in threads])
+    """Threads awaiting review (?status=pending or needs_review to narrow), one keyset page at a time"""
+    return review_page(ForumThread, joinedload(ForumThread.author), joinedload(ForumThread.category))
 
 @forum_bp.route("/forum/moderation/posts", methods=["GET"])
 def get_posts_for_moderation():
-    posts = ForumPost.query.filter_by(approved=False).all()
-    return jsonify([post.to_dict() for post in posts])
+    """Posts awaiting review (?status=pending or needs_review to narrow), one keyset page at a time"""
+    return review_page(ForumPost, joinedload(ForumPost.author))
+
+@forum_bp.route("/forum/moderation/bulk", methods=["POST"])
+def bulk_moderate():
+    """Approve or reject many threads and posts in one transaction.
+
+    Body: {"action": "approve" | "reject", "threads": [ids], "posts": [ids],
+    "reason": "..."}. Only content still awaiting review is changed; the
+    response lists the ids that were.
+    """
+    data = request.json or {}
+    action = data.get('action')
+    if action not in ('approve', 'reject'):
+        return jsonify({'error': "action must be 'approve' or 'reject'"}), 400
+    
+    try:
+        thread_ids = [int(i) for i in data.get('threads') or []]
+        post_ids = [int(i) for i in data.get('posts') or []]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'threads and posts must be lists of ids'}), 400
+    if len(thread_ids) + len(post_ids) > MAX_BULK_REVIEW:
+        return jsonify({'error': f'At most {MAX_BULK_REVIEW} items per request'}), 400
+    
+    reason = (data.get('reason') or '').strip()[:500] or None
+    changed = bulk_review(action, thread_ids, post_ids, reason)
+    db.session.commit()
+    if action == 'approve' and (changed['thread'] or changed['post']):
+        response_cache.invalidate(tags=['forum:threads'])
+        if forum_events.has_subscribers():
+            threads = ForumThread.query.filter(ForumThread.id.in_(changed['thread'])).options(
+                joinedload(ForumThread.author),
+                joinedload(ForumThread.category)
+            ).order_by(ForumThread.created_at, ForumThread.id).all()
+            posts = ForumPost.query.filter(ForumPost.id.in_(changed['post'])).options(
+                joinedload(ForumPost.author)
+            ).order_by(ForumPost.created_at, ForumPost.id).all()
+            forum_events.publish_approved('thread', threads)
+            forum_events.publish_approved('post', posts)
+    
+    return jsonify({'action': action, 'threads': changed['thread'], 'posts': changed['post']})
+
+@forum_bp.route("/forum/moderation/queue", methods=["GET"])
+def get_moderation_queue_status():
+    """Report how much content is still waiting for AI moderation"""
+    return jsonify({'pending_jobs': moderation.queue_depth()})
+
+@forum_bp.route("/forum/moderation/stats", methods=["GET"])
+def get_moderation_stats():
+    """Rule-stage, verdict-cache and model-call counters for this worker"""
+    return jsonify(moderation.stats())
 
 @forum_bp.route("/forum/moderation/approve/<string:content_type>/<int:content_id>", methods=["POST"])
 def approve_content(content_type, content_id):
@@ -139,11 +287,106 @@ def approve_content(content_type, content_id):
     else:
         return jsonify({'error': 'Invalid content type'}), 400
     
-    content.approved = True
+    apply_verdict(content_type, content, True)
     db.session.commit()
+    response_cache.invalidate(tags=['forum:threads'])
+    forum_events.publish_approved(content_type, [content])
     
     return jsonify({'message': 'Content approved successfully'})
 
+# Live activity
+LIVE_CURSOR_TYPES = (datetime, int)
+
+def live_stream(channel, event_name):
+    """Server-sent events for a channel: replay after Last-Event-ID, then live items and heartbeats.
+
+    Each item's event id is its (created_at, id) cursor, so a reconnecting
+    client is replayed from the table by whichever worker it lands on.
+    """
+    app = current_app._get_current_object()
+    heartbeat = app.config['LIVE_HEARTBEAT_SECONDS']
+    catch_up_every = app.config['LIVE_CATCH_UP_SECONDS']
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    position = None
+    if last_event_id:
+        position = decode_cursor(last_event_id, LIVE_CURSOR_TYPES)
+        if position is None:
+            return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    
+    try:
+        # Subscribe before reading the table so nothing published in between is missed
+        subscription = forum_events.subscribe(channel)
+    except TooManySubscribers:
+        return jsonify({'error': 'Too many live connections, please try again shortly'}), 503, {'Retry-After': '30'}
+    
+    try:
+        if last_event_id:
+            replay = [((item.created_at, item.id), json.dumps(item.to_dict())) for item in items_after(channel, position)]
+        else:
+            replay = []
+            position = latest_position(channel)
+    except Exception:
+        subscription.close()
+        raise
+    
+    def events():
+        recent = deque(maxlen=1000)
+        
+        def format_event(item_position, payload):
+            nonlocal position
+            if item_position[1] in recent:
+                return ''
+            recent.append(item_position[1])
+            lines = ''
+            # Late approvals of older items are sent without moving the resume point back
+            if position is None or item_position > position:
+                position = item_position
+                lines = f"id: {encode_cursor(list(item_position))}\n"
+            return lines + f"event: {event_name}\ndata: {payload}\n\n"
+        
+        try:
+            yield "retry: 2000\n\n" + ''.join(format_event(*item) for item in replay)
+            next_catch_up = time.monotonic() + catch_up_every
+            while True:
+                chunks = [format_event(item_position, payload) for event, item_position, payload in subscription.wait(heartbeat)]
+                if catch_up_every and time.monotonic() >= next_catch_up:
+                    # Items approved by other worker processes never reach this process's hub
+                    next_catch_up = time.monotonic() + catch_up_every
+                    with app.app_context():
+                        chunks += [
+                            format_event((item.created_at, item.id), json.dumps(item.to_dict()))
+                            for item in items_after(channel, position)
+                        ]
+                body = ''.join(chunks)
+                yield body or ": keep-alive\n\n"
+        finally:
+            subscription.close()
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@forum_bp.route("/forum/threads/<int:thread_id>/live", methods=["GET"])
+def stream_thread_activity(thread_id):
+    """Stream posts in a thread as they are approved, as server-sent `post` events"""
+    if db.session.get(ForumThread, thread_id) is None:
+        return jsonify({'error': 'Thread not found'}), 404
+    return live_stream(('thread', thread_id), 'post')
+
+@forum_bp.route("/forum/categories/<int:category_id>/live", methods=["GET"])
+def stream_category_activity(category_id):
+    """Stream new threads in a category as they are approved, as server-sent `thread` events"""
+    if db.session.get(ForumCategory, category_id) is None:
+        return jsonify({'error': 'Category not found'}), 404
+    return live_stream(('category', category_id), 'thread')
+
+@forum_bp.route("/forum/live/stats", methods=["GET"])
+def get_live_stats():
+    """Open live streams and channels in this worker"""
+    return jsonify(forum_events.stats())
+
 # Initialize default categories
 @forum_bp.route("/forum/init", methods=["POST"])
 def initialize_forum():
@@ -181,6 +424,8 @@ def initialize_forum():
             category = ForumCategory(**cat_data)
             db.session.add(category)
     
+    CollectionVersion.bump('forum:categories')
     db.session.commit()
+    response_cache.invalidate(tags=['forum:categories'])
     return jsonify({'message': 'Forum initialized successfully'})
 
@@ -0,0 +1,35 @@
+from flask import Blueprint, request, jsonify
+from src.services import search as search_index
+from src.utils.pagination import get_page_size
+
+search_bp = Blueprint("search_bp", __name__)
+
+@search_bp.route("/search", methods=["GET"])
+def search():
+    """Full-text search across published blog posts and approved forum content"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    
+    if not search_index.is_search_enabled():
+        return jsonify({'error': 'Search is not available on this server'}), 503
+    
+    doc_types = [t for t in request.args.get('type', '').split(',') if t]
+    unknown = [t for t in doc_types if t not in search_index.DOC_TYPES]
+    if unknown:
+        return jsonify({'error': f"Unknown type: {', '.join(unknown)}"}), 400
+    
+    limit = get_page_size(request.args)
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        offset = 0
+    
+    # Fetch one extra row to know whether another page exists
+    results = search_index.search(query, doc_types, limit=limit + 1, offset=offset)
+    
+    return jsonify({
+        'query': query,
+        'results': results[:limit],
+        'next_offset': offset + limit if len(results) > limit else None
+    })
@@ -1,27 +1,100 @@
 from flask import Blueprint, request, jsonify
 import os
-import requests
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
 import json
+from src.models.user import db
+from src.models.social_media import ScheduledPost
+from src.services.scheduler import PostScheduler
+from src.services.metrics import metrics
 
 social_media_bp = Blueprint("social_media_bp", __name__)
 
-# Configuration for different social media platforms
+# Configuration for different social media platforms.
+# api_base can be overridden (e.g. FACEBOOK_API_BASE) to point at a local stub server.
+# timeout is (connect, read) seconds for each HTTP call to the platform.
 SOCIAL_MEDIA_CONFIG = {
     'facebook': {
-        'api_base': 'https://graph.facebook.com/v18.0',
-        'required_env_vars': ['FACEBOOK_ACCESS_TOKEN', 'FACEBOOK_PAGE_ID']
+        'api_base': os.getenv('FACEBOOK_API_BASE', 'https://graph.facebook.com/v18.0'),
+        'required_env_vars': ['FACEBOOK_ACCESS_TOKEN', 'FACEBOOK_PAGE_ID'],
+        'timeout': (3.05, 10)
     },
     'instagram': {
-        'api_base': 'https://graph.instagram.com/v18.0',
-        'required_env_vars': ['INSTAGRAM_ACCESS_TOKEN', 'INSTAGRAM_USER_ID']
+        'api_base': os.getenv('INSTAGRAM_API_BASE', 'https://graph.instagram.com/v18.0'),
+        'required_env_vars': ['INSTAGRAM_ACCESS_TOKEN', 'INSTAGRAM_USER_ID'],
+        'timeout': (3.05, 15)
     },
     'tiktok': {
-        'api_base': 'https://open-api.tiktok.com',
-        'required_env_vars': ['TIKTOK_CLIENT_KEY', 'TIKTOK_CLIENT_SECRET', 'TIKTOK_ACCESS_TOKEN']
+        'api_base': os.getenv('TIKTOK_API_BASE', 'https://open-api.tiktok.com'),
+        'required_env_vars': ['TIKTOK_CLIENT_KEY', 'TIKTOK_CLIENT_SECRET', 'TIKTOK_ACCESS_TOKEN'],
+        'timeout': (3.05, 15)
     }
 }
 
+# Total time /social-media/post waits for all platforms together
+POST_DEADLINE_SECONDS = float(os.getenv('SOCIAL_MEDIA_POST_DEADLINE', '20'))
+
+# Platform calls run on a shared bounded pool rather than one after another
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('SOCIAL_MEDIA_MAX_WORKERS', '8')),
+    thread_name_prefix='social-media'
+)
+
+# Longest sleep between two retries of one call, well inside POST_DEADLINE_SECONDS
+RETRY_BACKOFF_MAX = 2.0
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+class TimedAdapter:
+    """Wraps a transport adapter so each platform call, retries included, is timed"""
+
+    def __init__(self, adapter, platform):
+        self.adapter = adapter
+        self.platform = platform
+
+    def send(self, request, **kwargs):
+        with metrics.external_call(self.platform):
+            return self.adapter.send(request, **kwargs)
+
+    def close(self):
+        self.adapter.close()
+
+def get_session(platform):
+    """Keep-alive session for a platform, shared across requests and threads.
+
+    Connection failures are retried for any method, since the platform never
+    saw the request. 429 and 503 are only retried for idempotent methods, so
+    a POST is never sent twice. Backoff is capped and Retry-After is not
+    honoured, so retries can't outlast the publish deadline.
+    """
+    # requests is imported on first use so workers that never post don't pay for it
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    with _sessions_lock:
+        session = _sessions.get(platform)
+        if session is None:
+            retry = Retry(
+                total=2,
+                connect=2,
+                read=0,
+                status=2,
+                status_forcelist=(429, 503),
+                backoff_factor=0.5,
+                backoff_max=RETRY_BACKOFF_MAX,
+                respect_retry_after_header=False,
+                raise_on_status=False
+            )
+            adapter = TimedAdapter(HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry), platform)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[platform] = session
+        return session
+
 def check_platform_credentials(platform):
     """Check if required environment variables are set for a platform"""
     if platform not in SOCIAL_MEDIA_CONFIG:
@@ -69,31 +142,14 @@ def post_to_social_media():
     if not platforms:
         return jsonify({'error': 'At least one platform must be specified'}), 400
     
-    results = {}
-    
-    for platform in platforms:
-        try:
-            if platform == 'facebook':
-                result = post_to_facebook(content, media_url)
-            elif platform == 'instagram':
-                result = post_to_instagram(content, media_url)
-            elif platform == 'tiktok':
-                result = post_to_tiktok(content, media_url)
-            else:
-                result = {'success': False, 'error': f'Unknown platform: {platform}'}
-            
-            results[platform] = result
-            
-        except Exception as e:
-            results[platform] = {
-                'success': False,
-                'error': str(e)
-            }
+    results = publish_to_platforms(content, platforms, media_url)
     
     return jsonify(results)
 
 def post_to_facebook(content, media_url=None):
     """Post content to Facebook page"""
+    import requests
+
     is_configured, message = check_platform_credentials('facebook')
     if not is_configured:
         return {'success': False, 'error': message}
@@ -112,7 +168,7 @@ def post_to_facebook(content, media_url=None):
         payload['link'] = media_url
     
     try:
-        response = requests.post(url, data=payload)
+        response = get_session('facebook').post(url, data=payload, timeout=SOCIAL_MEDIA_CONFIG['facebook']['timeout'])
         response.raise_for_status()
         
         result = response.json()
@@ -130,6 +186,8 @@ def post_to_facebook(content, media_url=None):
 
 def post_to_instagram(content, media_url=None):
     """Post content to Instagram"""
+    import requests
+
     is_configured, message = check_platform_credentials('instagram')
     if not is_configured:
         return {'success': False, 'error': message}
@@ -153,7 +211,9 @@ def post_to_instagram(content, media_url=None):
             'access_token': access_token
         }
         
-        container_response = requests.post(container_url, data=container_payload)
+        session = get_session('instagram')
+        timeout = SOCIAL_MEDIA_CONFIG['instagram']['timeout']
+        container_response = session.post(container_url, data=container_payload, timeout=timeout)
         container_response.raise_for_status()
         container_id = container_response.json()['id']
         
@@ -164,7 +224,7 @@ def post_to_instagram(content, media_url=None):
             'access_token': access_token
         }
         
-        publish_response = requests.post(publish_url, data=publish_payload)
+        publish_response = session.post(publish_url, data=publish_payload, timeout=timeout)
         publish_response.raise_for_status()
         
         result = publish_response.json()
@@ -193,6 +253,69 @@ def post_to_tiktok(content, media_url=None):
         'error': 'TikTok posting requires video upload implementation - coming soon!'
     }
 
+def publish_to_platforms(content, platforms, media_url=None, deadline=POST_DEADLINE_SECONDS, executor=None):
+    """Publish to several platforms in parallel, waiting at most deadline seconds.
+
+    A platform still queued at the deadline is cancelled and reported with
+    status 'not_attempted', so it is safe to retry. One already running can't
+    be stopped and is reported as 'unknown': the post may still appear.
+    """
+    executor = executor or _executor
+    publishers = {
+        'facebook': post_to_facebook,
+        'instagram': post_to_instagram,
+        'tiktok': post_to_tiktok
+    }
+    
+    results = {}
+    futures = {}
+    
+    for platform in platforms:
+        if platform in publishers:
+            futures[platform] = executor.submit(metrics.wrap(publishers[platform]), content, media_url)
+        else:
+            results[platform] = {'success': False, 'error': f'Unknown platform: {platform}'}
+    
+    wait(futures.values(), timeout=deadline)
+    
+    for platform, future in futures.items():
+        if future.cancel():
+            results[platform] = {
+                'success': False,
+                'status': 'not_attempted',
+                'error': f'Not started within {deadline:g}s; nothing was posted'
+            }
+            continue
+        if not future.done():
+            results[platform] = {
+                'success': False,
+                'status': 'unknown',
+                'error': f'Still running after {deadline:g}s; the post may still appear'
+            }
+            continue
+        try:
+            results[platform] = future.result()
+        except Exception as e:
+            results[platform] = {
+                'success': False,
+                'error': str(e)
+            }
+    
+    return results
+
+# Scheduled posts are stored and published by a background dispatcher
+post_scheduler = PostScheduler(publish_to_platforms, max_platforms=len(SOCIAL_MEDIA_CONFIG))
+
+def parse_schedule_time(value):
+    """Parse an ISO 8601 datetime into naive UTC, or return None if invalid"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
 @social_media_bp.route("/social-media/schedule", methods=["POST"])
 def schedule_social_media_post():
     """Schedule a post for future publishing"""
@@ -206,28 +329,63 @@ def schedule_social_media_post():
     if not content or not platforms or not schedule_time:
         return jsonify({'error': 'Content, platforms, and schedule_time are required'}), 400
     
-    # In a real implementation, you would store this in a database
-    # and have a background job processor to handle scheduled posts
-    
-    scheduled_post = {
-        'id': f"scheduled_{datetime.utcnow().timestamp()}",
-        'content': content,
-        'platforms': platforms,
-        'media_url': media_url,
-        'schedule_time': schedule_time,
-        'status': 'scheduled',
-        'created_at': datetime.utcnow().isoformat()
-    }
+    unknown = [platform for platform in platforms if platform not in SOCIAL_MEDIA_CONFIG]
+    if unknown:
+        return jsonify({'error': f"Unknown platform: {', '.join(unknown)}"}), 400
+    
+    due_at = parse_schedule_time(schedule_time)
+    if due_at is None:
+        return jsonify({'error': 'schedule_time must be an ISO 8601 datetime'}), 400
+    
+    scheduled_post = ScheduledPost(
+        content=content,
+        media_url=media_url,
+        platforms=json.dumps(platforms),
+        due_at=due_at
+    )
+    db.session.add(scheduled_post)
+    db.session.commit()
+    post_scheduler.schedule(scheduled_post)
     
     return jsonify({
         'success': True,
-        'scheduled_post': scheduled_post,
+        'scheduled_post': scheduled_post.to_dict(),
         'message': 'Post scheduled successfully'
-    })
+    }), 201
+
+@social_media_bp.route("/social-media/scheduled", methods=["GET"])
+def get_scheduled_posts():
+    """List scheduled posts, soonest first, optionally filtered by status"""
+    query = ScheduledPost.query
+    status = request.args.get('status')
+    if status:
+        query = query.filter_by(status=status)
+    
+    posts = query.order_by(ScheduledPost.due_at.asc()).limit(100).all()
+    return jsonify([post.to_dict() for post in posts])
+
+@social_media_bp.route("/social-media/scheduled/<int:post_id>", methods=["GET"])
+def get_scheduled_post(post_id):
+    post = ScheduledPost.query.get_or_404(post_id)
+    return jsonify(post.to_dict())
+
+@social_media_bp.route("/social-media/scheduled/<int:post_id>", methods=["DELETE"])
+def cancel_scheduled_post(post_id):
+    cancelled = ScheduledPost.query.filter_by(id=post_id, status='scheduled').update(
+        {ScheduledPost.status: 'cancelled'}, synchronize_session=False
+    )
+    db.session.commit()
+    
+    if not cancelled:
+        return jsonify({'error': 'Post is not scheduled or has already been published'}), 409
+    
+    return jsonify({'message': 'Scheduled post cancelled'})
 
 @social_media_bp.route("/social-media/test-connection/<platform>", methods=["GET"])
 def test_platform_connection(platform):
     """Test connection to a specific social media platform"""
+    import requests
+
     is_configured, message = check_platform_credentials(platform)
     if not is_configured:
         return jsonify({'success': False, 'error': message}), 400
@@ -236,13 +394,13 @@ def test_platform_connection(platform):
         if platform == 'facebook':
             access_token = os.getenv('FACEBOOK_ACCESS_TOKEN')
             url = f"{SOCIAL_MEDIA_CONFIG['facebook']['api_base']}/me"
-            response = requests.get(url, params={'access_token': access_token})
+            response = get_session('facebook').get(url, params={'access_token': access_token}, timeout=SOCIAL_MEDIA_CONFIG['facebook']['timeout'])
             
         elif platform == 'instagram':
             access_token = os.getenv('INSTAGRAM_ACCESS_TOKEN')
             user_id = os.getenv('INSTAGRAM_USER_ID')
             url = f"{SOCIAL_MEDIA_CONFIG['instagram']['api_base']}/{user_id}"
-            response = requests.get(url, params={'access_token': access_token})
+            response = get_session('instagram').get(url, params={'access_token': access_token}, timeout=SOCIAL_MEDIA_CONFIG['instagram']['timeout'])
             
         elif platform == 'tiktok':
             # TikTok connection test would be more complex
@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify, Response
+from src.services.database import database_status
+from src.services.response_cache import response_cache
+from src.services.metrics import metrics
+
+system_bp = Blueprint("system_bp", __name__)
+
+@system_bp.route("/system/database", methods=["GET"])
+def get_database_status():
+    """Active SQLite profile, effective pragmas and write-lock wait statistics"""
+    return jsonify(database_status())
+
+@system_bp.route("/system/cache", methods=["GET"])
+def get_cache_status():
+    """Response cache hit, miss, eviction and invalidation counters for this worker"""
+    return jsonify(response_cache.stats())
+
+@system_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Request, SQL and external-call metrics for this worker, in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
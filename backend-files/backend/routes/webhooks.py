@@ -1,12 +1,28 @@
+import json
 from flask import Blueprint, request, jsonify
+from src.services.webhooks import webhook_queue, delivery_key, delivery_type
 
 webhook_bp = Blueprint("webhook_bp", __name__)
 
-@webhook_bp.route("/webhook", methods=["POST"])
-def handle_webhook():
-    data = request.json
-    # Process the webhook data here
-    print(f"Received webhook data: {data}")
-    return jsonify({"status": "success"}), 200
-
+@webhook_bp.route("/webhook", methods=["POST"], defaults={'source': 'default'})
+@webhook_bp.route("/webhook/<string:source>", methods=["POST"])
+def handle_webhook(source):
+    """Queue the delivery and acknowledge it; handlers run on the webhook consumer"""
+    body = request.get_data()
+    data = request.get_json(silent=True)
+    if data is None:
+        return jsonify({'error': 'Body must be JSON'}), 400
+    
+    event_id, duplicate = webhook_queue.enqueue(
+        source[:50],
+        delivery_key(request.headers, body, data),
+        delivery_type(request.headers, data),
+        # JSON may be UTF-8, -16 or -32; store it as the text the sender meant
+        body.decode(json.detect_encoding(body))
+    )
+    return jsonify({"status": "success", "id": event_id, "duplicate": duplicate}), 200
 
+@webhook_bp.route("/webhook/queue", methods=["GET"])
+def get_webhook_queue_status():
+    """Webhook queue depth, processing lag and consumer counters"""
+    return jsonify(webhook_queue.stats())
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from src.models.blog import BlogGenerationJob, db
+from src.services.metrics import metrics
+
+BLOG_SYSTEM_PROMPT = "You are a compassionate expert writer specializing in premature baby health and support. Your writing should be deeply empathetic, understanding that parents reading this are likely experiencing fear, uncertainty, and overwhelming emotions. Write with warmth, hope, and genuine care. Provide practical advice while acknowledging the emotional journey. Always include reassurance and remind parents that they are not alone in this experience."
+
+def blog_prompt(topic):
+    return f"Write a detailed, compassionate blog post about: {topic}. Address both the practical and emotional aspects. Include expert insights, but deliver them with warmth and understanding. Make it around 1000-1500 words, and ensure it provides both information and emotional support for NICU families."
+
+# LLM backends: callables yielding text chunks as they are produced
+def openai_backend(topic):
+    import openai
+
+    client = openai.OpenAI()
+    # Timed over the whole stream, from request to last token
+    with metrics.external_call('openai'):
+        stream = client.chat.completions.create(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": BLOG_SYSTEM_PROMPT},
+                {"role": "user", "content": blog_prompt(topic)}
+            ],
+            max_tokens=2000,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+FAKE_PARAGRAPH = (
+    "Every family's NICU journey is different, and it is completely normal to feel "
+    "overwhelmed, hopeful and exhausted all at once. Ask the care team the questions "
+    "on your mind, lean on the people around you, and celebrate each small milestone. "
+)
+
+def fake_backend(topic):
+    """Deterministic offline stand-in for the model, for tests and benchmarks.
+
+    BLOG_FAKE_TOKENS sets the output length in words, BLOG_FAKE_FIRST_TOKEN_DELAY
+    and BLOG_FAKE_TOKEN_DELAY (seconds) simulate time-to-first-token and
+    per-token latency.
+    """
+    tokens = int(os.getenv('BLOG_FAKE_TOKENS', '300'))
+    first_delay = float(os.getenv('BLOG_FAKE_FIRST_TOKEN_DELAY', '0.5'))
+    token_delay = float(os.getenv('BLOG_FAKE_TOKEN_DELAY', '0.01'))
+
+    words = f"# {topic}\n\n".split(' ') + (FAKE_PARAGRAPH.split(' ') * (tokens // 40 + 1))
+    time.sleep(first_delay)
+    for i, word in enumerate(words[:tokens]):
+        if i:
+            time.sleep(token_delay)
+        yield word + ' '
+
+LLM_BACKENDS = {
+    'openai': openai_backend,
+    'fake': fake_backend
+}
+
+class QueueFull(Exception):
+    pass
+
+class LiveJob:
+    """In-memory view of a running job that stream readers can follow"""
+
+    def __init__(self, job_id, topic):
+        self.id = job_id
+        self.topic = topic
+        self.status = 'queued'
+        self.chunks = []
+        self.error = None
+        self.finished_at = None
+        self.changed = threading.Condition()
+
+    def append(self, chunk):
+        with self.changed:
+            self.chunks.append(chunk)
+            self.changed.notify_all()
+
+    def finish(self, status, error=None):
+        with self.changed:
+            self.status = status
+            self.error = error
+            self.finished_at = time.monotonic()
+            self.changed.notify_all()
+
+    def follow(self, heartbeat=15.0):
+        """Yield (chunk_index, chunk) as they arrive, or (None, None) as a keep-alive"""
+        sent = 0
+        while True:
+            with self.changed:
+                if sent >= len(self.chunks) and self.status in ('queued', 'running'):
+                    self.changed.wait(heartbeat)
+                pending = self.chunks[sent:]
+                done = self.status not in ('queued', 'running')
+            if pending:
+                for chunk in pending:
+                    yield sent, chunk
+                    sent += 1
+            elif done:
+                return
+            else:
+                yield None, None
+
+class BlogGenerator:
+    """Runs blog generation jobs on a capped pool and streams their output.
+
+    Jobs are recorded in the blog_generation_job table so their status and
+    final content are visible from any worker; the live token stream is
+    served by the worker process that runs the job.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = openai_backend
+        self._executor = None
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._active = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BLOG_LLM_BACKEND', os.getenv('BLOG_LLM_BACKEND', 'openai'))
+        app.config.setdefault('BLOG_GENERATION_CONCURRENCY', int(os.getenv('BLOG_GENERATION_CONCURRENCY', '4')))
+        app.config.setdefault('BLOG_GENERATION_MAX_QUEUED', int(os.getenv('BLOG_GENERATION_MAX_QUEUED', '16')))
+        app.config.setdefault('BLOG_GENERATION_RETENTION', float(os.getenv('BLOG_GENERATION_RETENTION', '600')))
+
+        backend = app.config['BLOG_LLM_BACKEND']
+        self.backend = backend if callable(backend) else LLM_BACKENDS[backend]
+        self.app = app
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config['BLOG_GENERATION_CONCURRENCY'],
+            thread_name_prefix='blog-generation'
+        )
+        app.extensions['blog_generator'] = self
+
+    def submit(self, topic):
+        """Queue a generation job, raising QueueFull when too many are waiting"""
+        limit = self.app.config['BLOG_GENERATION_CONCURRENCY'] + self.app.config['BLOG_GENERATION_MAX_QUEUED']
+        with self._jobs_lock:
+            self._prune()
+            if self._active >= limit:
+                raise QueueFull()
+            self._active += 1
+            live = LiveJob(uuid.uuid4().hex, topic)
+            self._jobs[live.id] = live
+
+        db.session.add(BlogGenerationJob(id=live.id, topic=topic))
+        db.session.commit()
+        self._executor.submit(self._run, live)
+        return live
+
+    def get_live(self, job_id):
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, live):
+        live.status = 'running'
+        with self.app.app_context():
+            try:
+                self._record(live.id, status='running')
+                for chunk in self.backend(live.topic):
+                    live.append(chunk)
+                self._record(live.id, status='done', content=''.join(live.chunks), finished_at=datetime.utcnow())
+                live.finish('done')
+            except Exception as e:
+                db.session.rollback()
+                # Release the followers first: recording can fail for the same reason the job did
+                live.finish('failed', str(e))
+                try:
+                    self._record(live.id, status='failed', error=str(e), finished_at=datetime.utcnow())
+                except Exception as record_error:
+                    db.session.rollback()
+                    self.app.logger.exception('Recording blog generation job %s as failed failed: %s', live.id, record_error)
+            finally:
+                if live.finished_at is None:
+                    live.finish('failed', 'Generation stopped unexpectedly')
+                db.session.remove()
+                with self._jobs_lock:
+                    self._active -= 1
+
+    def _record(self, job_id, **values):
+        BlogGenerationJob.query.filter_by(id=job_id).update(values, synchronize_session=False)
+        db.session.commit()
+
+    def _prune(self):
+        # Finished jobs stay followable for a while, then only the table has them
+        cutoff = time.monotonic() - self.app.config['BLOG_GENERATION_RETENTION']
+        for job_id in [job_id for job_id, live in self._jobs.items() if live.finished_at and live.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+blog_generator = BlogGenerator()
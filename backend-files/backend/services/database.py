@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event
+from src.models.user import db
+
+# Pragmas applied to every new SQLite connection, per profile.
+# cache_size is negative KiB; mmap_size is bytes.
+SQLITE_PROFILES = {
+    # SQLite defaults: rollback journal, no busy timeout beyond the driver's
+    'default': {},
+    # WAL lets readers run alongside the writer; NORMAL sync is crash-safe in WAL
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -32000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY'
+    },
+    # Full fsync on every commit, for hosts where losing the last commits is unacceptable
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 10000,
+        'cache_size': -32000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY'
+    },
+    # No fsync at all; only for benchmarks and bulk loads of reproducible data
+    'bulk': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'busy_timeout': 30000,
+        'cache_size': -262144,
+        'mmap_size': 1073741824,
+        'temp_store': 'MEMORY'
+    }
+}
+
+WRITE_VERBS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+
+class WriteCoordinator:
+    """Lets one connection at a time hold a write transaction in this process.
+
+    A connection takes the lock before its first write statement and gives
+    it back on commit, rollback, a failed statement that ended the
+    transaction, or check-in. Writers queue on a Python lock instead of
+    spinning in SQLite's busy handler, and reads never take the lock, so
+    under WAL they keep running in parallel. Time spent waiting is recorded
+    so contention can be measured.
+
+    This is narrower than a dedicated writer connection. It only orders the
+    threads of one process; separate worker processes still meet at SQLite's
+    own lock and busy_timeout. Code that raises between a write and its
+    commit holds the lock until its session is rolled back, which for a
+    request happens at teardown.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'acquisitions': 0, 'contended': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+
+    def acquire(self, info):
+        if info.get('holds_write_lock'):
+            return
+        started = time.perf_counter()
+        contended = not self._lock.acquire(blocking=False)
+        if contended:
+            self._lock.acquire()
+        waited = time.perf_counter() - started
+        info['holds_write_lock'] = True
+        with self._stats_lock:
+            self._stats['acquisitions'] += 1
+            self._stats['contended'] += int(contended)
+            self._stats['wait_seconds'] += waited
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], waited)
+
+    def release(self, info):
+        if info.pop('holds_write_lock', False):
+            self._lock.release()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['average_wait_seconds'] = stats['wait_seconds'] / stats['acquisitions'] if stats['acquisitions'] else 0.0
+        return stats
+
+write_coordinator = None
+
+def configure_database(app):
+    """Apply the SQLITE_PROFILE pragmas and, if enabled, the single-writer coordinator.
+
+    Call after db.init_app(app) and before the first query.
+    """
+    global write_coordinator
+    app.config.setdefault('SQLITE_PROFILE', os.getenv('SQLITE_PROFILE', 'balanced'))
+    app.config.setdefault('SQLITE_SINGLE_WRITER', os.getenv('SQLITE_SINGLE_WRITER', '0') == '1')
+
+    write_coordinator = None
+    pragmas = SQLITE_PROFILES[app.config['SQLITE_PROFILE']]
+    if app.config['SQLITE_SINGLE_WRITER'] and pragmas.get('journal_mode') != 'WAL':
+        # Without WAL a reader's shared lock blocks the coordinated writer's commit
+        raise ValueError('SQLITE_SINGLE_WRITER requires a WAL SQLITE_PROFILE')
+
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    if not app.config['SQLITE_SINGLE_WRITER']:
+        return
+
+    # Listeners hold their own reference, so a later app in the same process can't swap it out
+    coordinator = write_coordinator = WriteCoordinator()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def take_write_lock(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip()[:7].upper().startswith(WRITE_VERBS):
+            coordinator.acquire(conn.info)
+
+    @event.listens_for(engine, 'commit')
+    @event.listens_for(engine, 'rollback')
+    def release_write_lock(conn):
+        coordinator.release(conn.info)
+
+    @event.listens_for(engine, 'handle_error')
+    def release_after_error(context):
+        # A failed write that left no transaction open has nothing left to protect
+        conn = context.connection
+        if conn is not None and not conn.connection.dbapi_connection.in_transaction:
+            coordinator.release(conn.info)
+
+    @event.listens_for(engine.pool, 'checkin')
+    def release_on_checkin(dbapi_connection, connection_record):
+        if connection_record is not None:
+            coordinator.release(connection_record.info)
+
+def database_status():
+    """Profile, effective pragmas and writer-lock statistics for this process"""
+    status = {
+        'dialect': db.engine.dialect.name,
+        'profile': None,
+        'pragmas': {},
+        'single_writer': write_coordinator is not None,
+        'write_lock': write_coordinator.stats() if write_coordinator else None
+    }
+    if db.engine.dialect.name == 'sqlite':
+        status['profile'] = current_app.config.get('SQLITE_PROFILE')
+        for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store'):
+            status['pragmas'][name] = db.session.execute(db.text(f"PRAGMA {name}")).scalar()
+    return status
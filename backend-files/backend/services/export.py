@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+import click
+from flask.cli import with_appcontext
+from src.models.user import db
+
+EXPORT_DATASETS = ('pageviews', 'shares', 'referrals')
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+DEFAULT_BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+def export_datasets():
+    """Exportable tables: name -> (model, timestamp column used for since/until)"""
+    from src.routes.analytics import PageView, ShareEvent, ReferralTracking
+
+    return {
+        'pageviews': (PageView, PageView.timestamp),
+        'shares': (ShareEvent, ShareEvent.timestamp),
+        'referrals': (ReferralTracking, ReferralTracking.created_at)
+    }
+
+def parse_time(value):
+    """ISO 8601 time as naive UTC, matching how timestamps are stored; None if blank"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def iter_rows(dataset, since=None, until=None, after_id=None, limit=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield rows as dicts in id order, fetching batch_size at a time.
+
+    Each batch is its own keyset query (id > last id), so memory stays flat
+    and no read transaction is held open while the client consumes a batch.
+    The id of the last row received is the resume cursor (after_id).
+    """
+    model, time_column = export_datasets()[dataset]
+    columns = list(model.__table__.columns)
+    query = db.select(*columns).order_by(model.id)
+    if since is not None:
+        query = query.where(time_column >= since)
+    if until is not None:
+        query = query.where(time_column < until)
+
+    last_id = after_id or 0
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        rows = db.session.execute(query.where(model.id > last_id).limit(size)).all()
+        db.session.rollback()
+        if not rows:
+            return
+        for row in rows:
+            yield row._asdict()
+        last_id = rows[-1].id
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
+            return
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def format_rows(rows, export_format, columns):
+    """Encode rows as NDJSON lines or CSV with a header, in chunks of about CHUNK_SIZE characters"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == 'csv' else None
+    if writer is not None:
+        writer.writerow(columns)
+    for row in rows:
+        if writer is not None:
+            writer.writerow([_json_value(row[column]) for column in columns])
+        else:
+            buffer.write(json.dumps({key: _json_value(value) for key, value in row.items()}) + '\n')
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_columns(dataset):
+    model, _ = export_datasets()[dataset]
+    return [column.name for column in model.__table__.columns]
+
+@click.command('export-analytics')
+@click.argument('dataset', type=click.Choice(EXPORT_DATASETS))
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson')
+@click.option('--since', help='ISO 8601 start time (inclusive)')
+@click.option('--until', help='ISO 8601 end time (exclusive)')
+@click.option('--after-id', type=int, help='resume after this row id')
+@click.option('--limit', type=int, help='stop after this many rows')
+@click.option('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, show_default=True)
+@click.option('--output', type=click.File('w'), default='-', help='file to write, default stdout')
+@with_appcontext
+def export_analytics_command(dataset, export_format, since, until, after_id, limit, batch_size, output):
+    """Stream raw analytics rows as NDJSON or CSV."""
+    try:
+        since, until = parse_time(since), parse_time(until)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    progress = {'rows': 0, 'last_id': None}
+
+    def counted(rows):
+        for row in rows:
+            progress['rows'] += 1
+            progress['last_id'] = row['id']
+            yield row
+
+    rows = counted(iter_rows(dataset, since, until, after_id, limit, batch_size))
+    for chunk in format_rows(rows, export_format, export_columns(dataset)):
+        output.write(chunk)
+    resume = f", resume with --after-id {progress['last_id']}" if progress['last_id'] else ''
+    click.echo(f"Exported {progress['rows']} rows{resume}", err=True)
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+from collections import deque
+from sqlalchemy.orm import joinedload
+from src.models.forum import ForumThread, ForumPost, db
+
+# Events kept per channel for subscribers that are between waits
+CHANNEL_BUFFER = 256
+
+class TooManySubscribers(Exception):
+    pass
+
+class Subscription:
+    """One stream's place in a channel; wait() returns what was published since the last call"""
+
+    def __init__(self, hub, channel, state):
+        self.hub = hub
+        self.channel = channel
+        self.state = state
+        self.last_seq = hub._seq
+
+    def wait(self, timeout):
+        """[(event, position, payload json)] published since the last call, [] after timeout"""
+        with self.hub._lock:
+            if not self._pending():
+                self.state['changed'].wait(timeout)
+            events = self._pending()
+            if events:
+                self.last_seq = events[-1][0]
+        return [event[1:] for event in events]
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+    def _pending(self):
+        return [event for event in self.state['events'] if event[0] > self.last_seq]
+
+class ForumEventHub:
+    """In-process pub/sub for newly visible forum content, followed over SSE.
+
+    Channels are ('thread', id), carrying approved posts, and ('category', id),
+    carrying approved threads. Publishers hand over content after their
+    commit and it is serialized once, whatever the number of subscribers.
+    Each channel has its own condition, so an event only wakes that
+    channel's streams, and channels without subscribers buffer nothing.
+    An idle stream is a single blocked wait: run the app under a cooperative
+    server (e.g. gunicorn -k gevent) to hold thousands of them open.
+
+    Content approved in another worker process is picked up by each stream's
+    catch-up query every LIVE_CATCH_UP_SECONDS, which is also how a stream
+    reconnecting with Last-Event-ID is replayed.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._seq = 0
+        self._subscribers = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LIVE_HEARTBEAT_SECONDS', float(os.getenv('LIVE_HEARTBEAT_SECONDS', '15')))
+        app.config.setdefault('LIVE_CATCH_UP_SECONDS', float(os.getenv('LIVE_CATCH_UP_SECONDS', '30')))
+        app.config.setdefault('LIVE_MAX_SUBSCRIBERS', int(os.getenv('LIVE_MAX_SUBSCRIBERS', '5000')))
+        self.app = app
+        app.extensions['forum_events'] = self
+
+    def subscribe(self, channel):
+        with self._lock:
+            if self._subscribers >= self.app.config['LIVE_MAX_SUBSCRIBERS']:
+                raise TooManySubscribers()
+            state = self._channels.get(channel)
+            if state is None:
+                state = self._channels[channel] = {
+                    'events': deque(maxlen=CHANNEL_BUFFER),
+                    'changed': threading.Condition(self._lock),
+                    'subscribers': 0
+                }
+            state['subscribers'] += 1
+            self._subscribers += 1
+            return Subscription(self, channel, state)
+
+    def publish(self, channel, event, position, data):
+        """Send data to a channel's subscribers; position is the item's (created_at, id)"""
+        with self._lock:
+            state = self._channels.get(channel)
+            if state is None:
+                return
+            self._seq += 1
+            state['events'].append((self._seq, event, position, json.dumps(data)))
+            state['changed'].notify_all()
+
+    def has_subscribers(self):
+        return self._subscribers > 0
+
+    def publish_approved(self, content_type, items):
+        """Publish threads or posts that just became visible; call after the commit"""
+        if not self.has_subscribers():
+            return
+        for item in items:
+            if not item.approved:
+                continue
+            if content_type == 'thread':
+                self.publish(('category', item.category_id), 'thread', (item.created_at, item.id), item.to_dict())
+            else:
+                self.publish(('thread', item.thread_id), 'post', (item.created_at, item.id), item.to_dict())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': self._subscribers,
+                'channels': len(self._channels),
+                'published': self._seq
+            }
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            state = subscription.state
+            state['subscribers'] -= 1
+            self._subscribers -= 1
+            if state['subscribers'] == 0 and self._channels.get(subscription.channel) is state:
+                del self._channels[subscription.channel]
+
+def channel_query(channel):
+    """Approved items on a channel, in (created_at, id) order"""
+    kind, channel_id = channel
+    if kind == 'thread':
+        return ForumPost.query.filter_by(thread_id=channel_id, approved=True).options(
+            joinedload(ForumPost.author)
+        ), ForumPost
+    return ForumThread.query.filter_by(category_id=channel_id, approved=True).options(
+        joinedload(ForumThread.author),
+        joinedload(ForumThread.category)
+    ), ForumThread
+
+def latest_position(channel):
+    """(created_at, id) of the newest item on a channel, or None if it is empty"""
+    query, model = channel_query(channel)
+    row = query.with_entities(model.created_at, model.id).order_by(
+        model.created_at.desc(), model.id.desc()
+    ).first()
+    return (row.created_at, row.id) if row else None
+
+def items_after(channel, position, limit=100):
+    """Approved items on a channel after position, for replay and catch-up"""
+    query, model = channel_query(channel)
+    if position is not None:
+        query = query.filter(db.tuple_(model.created_at, model.id) > position)
+    return query.order_by(model.created_at.asc(), model.id.asc()).limit(limit).all()
+
+forum_events = ForumEventHub()
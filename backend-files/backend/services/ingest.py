@@ -0,0 +1,149 @@
+import atexit
+import os
+import queue
+import threading
+from src.models.user import db
+
+class WriteBehindBuffer:
+    """Bounded in-process buffer that bulk-inserts rows for a model.
+
+    Requests hand rows to add() and return immediately; a flusher thread writes
+    them with a single executemany INSERT per batch once BATCH_SIZE rows are
+    waiting or FLUSH_INTERVAL seconds have passed. Anything still buffered is
+    flushed at interpreter exit.
+
+    When the buffer is full the overflow policy decides what happens:
+    'drop' discards the new row and counts it, 'sync' makes the caller flush
+    the backlog itself before queueing (back-pressure instead of loss).
+    """
+
+    def __init__(self, model, config_prefix, app=None):
+        self.model = model
+        self.config_prefix = config_prefix
+        self.app = None
+        self.flush_hooks = []
+        self._queue = None
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._flusher = None
+        self._flusher_pid = None
+        self._stopping = threading.Event()
+        self._batch_ready = threading.Event()
+        self._stats = {'accepted': 0, 'dropped': 0, 'flushed': 0, 'batches': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+        self._exit_hook = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        prefix = self.config_prefix
+        app.config.setdefault(f'{prefix}_BUFFER_SIZE', int(os.getenv(f'{prefix}_BUFFER_SIZE', '10000')))
+        app.config.setdefault(f'{prefix}_BATCH_SIZE', int(os.getenv(f'{prefix}_BATCH_SIZE', '500')))
+        app.config.setdefault(f'{prefix}_FLUSH_INTERVAL', float(os.getenv(f'{prefix}_FLUSH_INTERVAL', '1.0')))
+        app.config.setdefault(f'{prefix}_OVERFLOW', os.getenv(f'{prefix}_OVERFLOW', 'drop'))
+
+        self.app = app
+        self.buffer_size = app.config[f'{prefix}_BUFFER_SIZE']
+        self.batch_size = app.config[f'{prefix}_BATCH_SIZE']
+        self.flush_interval = app.config[f'{prefix}_FLUSH_INTERVAL']
+        self.overflow = app.config[f'{prefix}_OVERFLOW']
+        self._queue = queue.Queue(maxsize=self.buffer_size)
+        app.extensions[f'{prefix.lower()}_buffer'] = self
+        if not self._exit_hook:
+            # Once per buffer, not per app: it flushes into whichever app was initialised last
+            atexit.register(self.shutdown)
+            self._exit_hook = True
+
+    def add(self, row):
+        """Queue one row (a dict of column values); returns False if it was dropped"""
+        self._ensure_flusher()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            if self.overflow != 'sync':
+                self._count('dropped')
+                return False
+            self.flush()
+            self._queue.put(row)
+        self._count('accepted')
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    def flush(self):
+        """Write everything currently buffered; safe to call from any thread"""
+        total = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    return total
+                self._write(batch)
+                total += len(batch)
+
+    def shutdown(self):
+        self._stopping.set()
+        self._batch_ready.set()
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            self._flusher.join(self.flush_interval + 5)
+        if self._queue is not None and self.app is not None:
+            self.flush()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['buffered'] = self._queue.qsize() if self._queue is not None else 0
+        stats['capacity'] = self.buffer_size if self._queue is not None else 0
+        return stats
+
+    def _ensure_flusher(self):
+        # Threads do not survive fork, so each worker process starts its own flusher
+        if self._flusher_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher = threading.Thread(
+                target=self._run, name=f'{self.config_prefix.lower()}-flusher', daemon=True
+            )
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            # Sleep until a full batch is waiting or the flush interval elapses
+            self._batch_ready.wait(self.flush_interval)
+            self._batch_ready.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.app.logger.exception('Flushing %s buffer failed: %s', self.model.__tablename__, e)
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                db.session.execute(db.insert(self.model), batch)
+                for hook in self.flush_hooks:
+                    hook(batch)
+                db.session.commit()
+                self._count('flushed', len(batch))
+                self._count('batches')
+            except Exception:
+                db.session.rollback()
+                self._count('failed', len(batch))
+                raise
+            finally:
+                db.session.remove()
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
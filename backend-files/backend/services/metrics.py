@@ -0,0 +1,216 @@
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import request
+from sqlalchemy import event
+from src.models.user import db
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+slow_log = logging.getLogger('src.metrics.slow')
+
+class Histogram:
+    """Prometheus-style histogram: per-bucket counts, sum and count"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class RequestStats:
+    """Time spent in SQL and external calls during one request"""
+
+    __slots__ = ('queries', 'query_seconds', 'external_calls', 'external_seconds', 'lock')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.external_calls = 0
+        self.external_seconds = 0.0
+        self.lock = threading.Lock()
+
+# The current request's stats; copied into pool threads that work for it
+_request_stats = contextvars.ContextVar('request_stats', default=None)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Metrics:
+    """Request, SQL and external-call instrumentation in Prometheus text format.
+
+    Request hooks time every request per blueprint and route; SQLAlchemy
+    engine events count statements and their time against the request that
+    ran them (or 'background' for worker threads); external_call() times
+    OpenAI and social platform calls separately. Requests slower than
+    SLOW_REQUEST_MS and statements slower than SLOW_QUERY_MS are logged to
+    the src.metrics.slow logger. Metrics are per worker process.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._request_durations = {}
+        self._request_totals = {}
+        self._request_queries = {}
+        self._request_query_seconds = {}
+        self._request_external_seconds = {}
+        self._query_durations = {}
+        self._external_durations = {}
+        self._slow = {'requests': 0, 'queries': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', os.getenv('METRICS_ENABLED', '1') == '1')
+        app.config.setdefault('SLOW_REQUEST_MS', float(os.getenv('SLOW_REQUEST_MS', '1000')))
+        app.config.setdefault('SLOW_QUERY_MS', float(os.getenv('SLOW_QUERY_MS', '250')))
+        self.app = app
+        app.extensions['metrics'] = self
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        with app.app_context():
+            engine = db.engine
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_query(conn, cursor, statement, parameters, context, executemany):
+            conn.info['query_started'] = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def finish_query(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.pop('query_started', None)
+            if started is not None:
+                self._record_query(statement, time.perf_counter() - started)
+
+    @contextmanager
+    def external_call(self, service):
+        """Time a call to an outside service, attributing it to the current request"""
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            yield
+        except BaseException:
+            outcome = 'error'
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats = _request_stats.get()
+            if stats is not None:
+                with stats.lock:
+                    stats.external_calls += 1
+                    stats.external_seconds += elapsed
+            with self._lock:
+                self._observe(self._external_durations, (service, outcome), elapsed)
+
+    def wrap(self, func):
+        """Bind func to the current request's stats, for work handed to a thread pool"""
+        context = contextvars.copy_context()
+        return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+    def _before_request(self):
+        request.metrics_started = time.perf_counter()
+        request.metrics_token = _request_stats.set(RequestStats())
+
+    def _after_request(self, response):
+        started = getattr(request, 'metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        stats = _request_stats.get() or RequestStats()
+        _request_stats.reset(request.metrics_token)
+
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        key = (request.blueprint or 'app', route, request.method)
+        with self._lock:
+            self._observe(self._request_durations, key, elapsed)
+            totals_key = key + (str(response.status_code),)
+            self._request_totals[totals_key] = self._request_totals.get(totals_key, 0) + 1
+            self._request_queries[key] = self._request_queries.get(key, 0) + stats.queries
+            self._request_query_seconds[key] = self._request_query_seconds.get(key, 0.0) + stats.query_seconds
+            self._request_external_seconds[key] = self._request_external_seconds.get(key, 0.0) + stats.external_seconds
+
+        if elapsed * 1000 >= self.app.config['SLOW_REQUEST_MS']:
+            with self._lock:
+                self._slow['requests'] += 1
+            slow_log.warning(
+                'Slow request %s %s (%s) took %.1f ms: %d queries in %.1f ms, %d external calls in %.1f ms',
+                request.method, request.full_path.rstrip('?'), route, elapsed * 1000,
+                stats.queries, stats.query_seconds * 1000, stats.external_calls, stats.external_seconds * 1000
+            )
+        return response
+
+    def _record_query(self, statement, elapsed):
+        stats = _request_stats.get()
+        if stats is not None:
+            with stats.lock:
+                stats.queries += 1
+                stats.query_seconds += elapsed
+        context = 'request' if stats is not None else 'background'
+        with self._lock:
+            self._observe(self._query_durations, (context,), elapsed)
+
+        if elapsed * 1000 >= self.app.config['SLOW_QUERY_MS']:
+            with self._lock:
+                self._slow['queries'] += 1
+            slow_log.warning('Slow query took %.1f ms (%s): %s', elapsed * 1000, context, ' '.join(statement.split())[:500])
+
+    def _observe(self, histograms, key, value):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            route_labels = ('blueprint', 'route', 'method')
+            self._render_histogram(lines, 'http_request_duration_seconds', 'Request latency by blueprint and route', route_labels, self._request_durations)
+            self._render_counter(lines, 'http_requests_total', 'Requests by blueprint, route and status', route_labels + ('status',), self._request_totals)
+            self._render_counter(lines, 'http_request_db_queries_total', 'SQL statements run by requests, per route', route_labels, self._request_queries)
+            self._render_counter(lines, 'http_request_db_seconds_total', 'Time spent in SQL by requests, per route', route_labels, self._request_query_seconds)
+            self._render_counter(lines, 'http_request_external_seconds_total', 'Time spent in external calls by requests, per route', route_labels, self._request_external_seconds)
+            self._render_histogram(lines, 'db_query_duration_seconds', 'SQL statement latency, from requests or background workers', ('context',), self._query_durations)
+            self._render_histogram(lines, 'external_call_duration_seconds', 'Calls to OpenAI and social platforms', ('service', 'outcome'), self._external_durations)
+            self._render_counter(lines, 'slow_events_total', 'Requests and queries over the slow-log thresholds', ('kind',), {(kind,): count for kind, count in self._slow.items()})
+        return '\n'.join(lines) + '\n'
+
+    def _render_counter(self, lines, name, help_text, label_names, values):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for key, value in sorted(values.items()):
+            lines.append(f'{name}{_labels(label_names, key)} {value}')
+
+    def _render_histogram(self, lines, name, help_text, label_names, histograms):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                le_label = f'le="{le}"'
+                lines.append(f'{name}_bucket{_labels(label_names, key, le_label)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(label_names, key)} {histogram.sum}')
+            lines.append(f'{name}_count{_labels(label_names, key)} {histogram.count}')
+
+metrics = Metrics()
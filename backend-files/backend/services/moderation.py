@@ -0,0 +1,416 @@
+import atexit
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from src.models.forum import ForumThread, ForumPost, in_review, db
+from src.models.moderation import ModerationJob, ModerationVerdict
+from src.services.search import index_forum_thread, index_forum_post
+from src.services.response_cache import response_cache
+from src.services.metrics import metrics
+from src.services.forum_events import forum_events
+
+MODERATION_SYSTEM_PROMPT = "You are a compassionate content moderator for a support forum for families with premature babies. Your role is to ensure all content is supportive, appropriate, and maintains a safe space for vulnerable families. Check if the content is: 1) Supportive and kind, 2) Appropriate for families in crisis, 3) Free from harmful advice, 4) Respectful of different experiences. Respond with 'APPROVED' if the content is appropriate, or 'NEEDS_REVIEW: [reason]' if it needs human review."
+
+# Jobs claimed by a worker that died are handed out again after this long
+LEASE_SECONDS = 300
+
+# Verdicts starting with this are transient failures and are never cached
+MODERATION_UNAVAILABLE = 'NEEDS_REVIEW: AI moderation unavailable'
+
+# Local fast path: short messages made only of these words are approved without
+# asking the model ("sending hugs", "praying for you", "congratulations!")
+BENIGN_WORDS = frozenset('''
+    a all and are baby babies beautiful best big blessings brave congrats congratulations
+    day for glad god great happy heart here hope hoping hug hugs is little love lots
+    lovely many miss much news of on one prayers praying proud sending so strength
+    strong such thank thanks thinking this to too update updates very warrior we wishing
+    with wonderful you your yours xx xxx
+'''.split())
+BENIGN_MAX_WORDS = 12
+
+# ...and messages matching these are sent straight to human review
+FLAGGED_PATTERNS = [re.compile(p) for p in (
+    r'https?://',
+    r'\bwww\.',
+    r'\b(buy|order) now\b',
+    r'\bmiracle cure\b',
+    r'\bstop (the )?treatment\b',
+    r'\bdiscount code\b',
+)]
+
+# Moderator backends
+def openai_moderator(content):
+    """Use AI to check if content is appropriate and supportive"""
+    import openai
+
+    try:
+        client = openai.OpenAI()
+        with metrics.external_call('openai'):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": MODERATION_SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Please review this forum post content: {content}"}
+                ],
+                max_tokens=100
+            )
+
+        result = response.choices[0].message.content.strip()
+        return result.startswith('APPROVED'), result
+
+    except Exception as e:
+        # If AI moderation fails, default to human review
+        return False, f"{MODERATION_UNAVAILABLE} - {str(e)}"
+
+STUB_FLAGGED_TERMS = ('stop treatment', 'miracle cure', 'buy now', 'http://', 'https://')
+
+def stub_moderator(content):
+    """Deterministic local moderator for tests and benchmarks.
+
+    Flags a fixed list of terms and approves everything else. Set
+    MODERATION_STUB_LATENCY (seconds) to simulate a model round-trip.
+    """
+    latency = float(os.getenv('MODERATION_STUB_LATENCY', '0'))
+    if latency:
+        time.sleep(latency)
+
+    lowered = (content or '').lower()
+    for term in STUB_FLAGGED_TERMS:
+        if term in lowered:
+            return False, f"NEEDS_REVIEW: contains '{term}'"
+    return True, 'APPROVED'
+
+MODERATOR_BACKENDS = {
+    'openai': openai_moderator,
+    'stub': stub_moderator
+}
+
+class ModerationPipeline:
+    """Background moderation of forum content.
+
+    Writes enqueue a ModerationJob row in the same transaction as the content,
+    so the queue survives restarts. A fixed pool of worker threads claims jobs
+    from the table, runs the configured moderator and flips `approved`.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.moderator = openai_moderator
+        self._stats = {
+            'rule_approved': 0,
+            'rule_flagged': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'model_calls': 0,
+            'model_seconds': 0.0
+        }
+        self._stats_lock = threading.Lock()
+        self._cache_inserts = 0
+        self._wakeup = threading.Condition()
+        self._pending_signals = 0
+        self._stopping = False
+        self._workers = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MODERATION_BACKEND', os.getenv('MODERATION_BACKEND', 'openai'))
+        app.config.setdefault('MODERATION_WORKERS', int(os.getenv('MODERATION_WORKERS', '2')))
+        app.config.setdefault('MODERATION_POLL_INTERVAL', 5.0)
+        app.config.setdefault('MODERATION_CACHE_SIZE', int(os.getenv('MODERATION_CACHE_SIZE', '10000')))
+
+        backend = app.config['MODERATION_BACKEND']
+        self.moderator = backend if callable(backend) else MODERATOR_BACKENDS[backend]
+        self.app = app
+        app.extensions['moderation'] = self
+
+    def start(self):
+        """Start the worker pool; jobs left over from a previous run are picked up"""
+        if self._workers or not self.app.config['MODERATION_WORKERS']:
+            return
+        self._stopping = False
+        for i in range(self.app.config['MODERATION_WORKERS']):
+            worker = threading.Thread(target=self._run, name=f'moderation-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5.0):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def enqueue(self, content_type, content):
+        """Mark content as pending and queue it; the caller commits the session"""
+        content.approved = False
+        content.moderation_status = 'pending'
+        job = ModerationJob(content_type=content_type, content_id=content.id)
+        db.session.add(job)
+        return job
+
+    def notify(self):
+        """Wake a worker after the enqueuing transaction has committed"""
+        with self._wakeup:
+            self._pending_signals += 1
+            self._wakeup.notify()
+
+    def process_pending(self, limit=None):
+        """Claim and moderate queued jobs in the current app context; returns the count processed"""
+        processed = 0
+        while limit is None or processed < limit:
+            job = self._claim_next()
+            if job is None:
+                break
+            self._process(job)
+            processed += 1
+        return processed
+
+    def queue_depth(self):
+        return ModerationJob.query.filter(ModerationJob.status != 'done').count()
+
+    def moderate(self, content):
+        """Moderate text through the rule stage and verdict cache before calling the model"""
+        local_verdict = classify_locally(content)
+        if local_verdict is not None:
+            self._count('rule_approved' if local_verdict[0] else 'rule_flagged')
+            return local_verdict
+
+        content_hash = hashlib.sha256(normalize_content(content).encode()).hexdigest()
+        cached = db.session.get(ModerationVerdict, content_hash)
+        if cached is not None:
+            self._count('cache_hits')
+            cached.hits += 1
+            cached.last_used_at = datetime.utcnow()
+            return cached.approved, cached.result
+
+        self._count('cache_misses')
+        started = time.perf_counter()
+        approved, result = self.moderator(content)
+        self._count('model_calls', model_seconds=time.perf_counter() - started)
+
+        if not result.startswith(MODERATION_UNAVAILABLE):
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ModerationVerdict(content_hash=content_hash, approved=approved, result=result))
+            except IntegrityError:
+                pass  # Another worker cached the same content first
+            self._cache_inserts += 1
+            if self._cache_inserts % 100 == 0:
+                self.evict_verdicts()
+        return approved, result
+
+    def evict_verdicts(self):
+        """Trim the verdict cache to MODERATION_CACHE_SIZE, dropping the least recently used"""
+        excess = ModerationVerdict.query.count() - self.app.config['MODERATION_CACHE_SIZE']
+        if excess <= 0:
+            return 0
+        stale = db.session.query(ModerationVerdict.content_hash).order_by(
+            ModerationVerdict.last_used_at.asc()
+        ).limit(excess)
+        return ModerationVerdict.query.filter(
+            ModerationVerdict.content_hash.in_(stale.scalar_subquery())
+        ).delete(synchronize_session=False)
+
+    def stats(self):
+        """Counters for the rule stage, verdict cache and model calls since startup"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['cache_hits'] + stats['cache_misses']
+        skipped = stats['rule_approved'] + stats['rule_flagged'] + stats['cache_hits']
+        average_call = stats['model_seconds'] / stats['model_calls'] if stats['model_calls'] else 0.0
+        stats.update({
+            'cache_hit_rate': stats['cache_hits'] / lookups if lookups else 0.0,
+            'model_calls_skipped': skipped,
+            'estimated_seconds_saved': skipped * average_call,
+            'cache_size': ModerationVerdict.query.count()
+        })
+        return stats
+
+    def _count(self, key, model_seconds=0.0):
+        with self._stats_lock:
+            self._stats[key] += 1
+            self._stats['model_seconds'] += model_seconds
+
+    def _run(self):
+        poll_interval = self.app.config['MODERATION_POLL_INTERVAL']
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+                if not self._pending_signals:
+                    # Timed wait also picks up jobs from other processes and expired leases
+                    self._wakeup.wait(poll_interval)
+                if self._stopping:
+                    return
+                self._pending_signals = max(0, self._pending_signals - 1)
+
+            with self.app.app_context():
+                try:
+                    self.process_pending()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.exception('Moderation worker failed: %s', e)
+                finally:
+                    db.session.remove()
+
+    def _claim_next(self):
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=LEASE_SECONDS)
+        claimable = db.or_(
+            ModerationJob.status == 'pending',
+            db.and_(ModerationJob.status == 'processing', ModerationJob.claimed_at < lease_expired)
+        )
+
+        while True:
+            candidate = db.session.query(ModerationJob.id).filter(claimable).order_by(ModerationJob.id).first()
+            if candidate is None:
+                return None
+
+            # Conditional update so two workers never take the same job
+            claimed = ModerationJob.query.filter(ModerationJob.id == candidate.id, claimable).update({
+                ModerationJob.status: 'processing',
+                ModerationJob.claimed_at: now,
+                ModerationJob.attempts: ModerationJob.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return db.session.get(ModerationJob, candidate.id)
+
+    def _process(self, job):
+        model = ForumThread if job.content_type == 'thread' else ForumPost
+        content = db.session.get(model, job.content_id)
+
+        published = False
+        if content is not None and content.moderation_status == 'pending':
+            approved, result = self.moderate(content.content or '')
+            published = apply_pending_verdict(job.content_type, job.content_id, approved, review_reason(result))
+            job.result = result
+
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        if published:
+            response_cache.invalidate(tags=['forum:threads'])
+            forum_events.publish_approved(job.content_type, [db.session.get(model, job.content_id)])
+
+def normalize_content(content):
+    """Fold case, punctuation and whitespace so near-identical messages share a verdict"""
+    text = unicodedata.normalize('NFKC', content or '').casefold()
+    return ' '.join(re.findall(r'\w+', text))
+
+def classify_locally(content):
+    """Cheap rule stage; returns a verdict for obvious cases or None to defer to the model"""
+    text = unicodedata.normalize('NFKC', content or '').casefold()
+    for pattern in FLAGGED_PATTERNS:
+        if pattern.search(text):
+            return False, f'NEEDS_REVIEW: matched local rule {pattern.pattern}'
+
+    words = re.findall(r'\w+', text)
+    if words and len(words) <= BENIGN_MAX_WORDS and all(word in BENIGN_WORDS for word in words):
+        return True, 'APPROVED: local allow-list'
+    return None
+
+def review_reason(result):
+    """The reason part of a NEEDS_REVIEW verdict, as stored on the content"""
+    if result and result.startswith('NEEDS_REVIEW'):
+        return result.split(':', 1)[-1].strip()[:500] or None
+    return None
+
+def apply_pending_verdict(content_type, content_id, approved, reason=None):
+    """Record the AI verdict only if the content is still pending; the caller commits.
+
+    The model call can take seconds, and a moderator may approve or reject the
+    content meanwhile, so the verdict is a conditional UPDATE rather than a
+    write to the row loaded before the call. Returns whether it was approved here.
+    """
+    model = ForumThread if content_type == 'thread' else ForumPost
+    values = {
+        'approved': approved,
+        'moderation_status': 'approved' if approved else 'needs_review',
+        'moderation_reason': None if approved else reason
+    }
+    returning = [model.id, model.approved, model.content]
+    if model is ForumPost:
+        returning += [ForumPost.thread_id, ForumPost.created_at]
+    else:
+        returning += [ForumThread.title]
+    row = db.session.execute(
+        db.update(model).where(model.id == content_id, model.moderation_status == 'pending').values(values).returning(*returning)
+    ).first()
+    if row is None or not approved:
+        return False
+
+    if model is ForumPost:
+        ForumThread.record_activity(row.thread_id, row.created_at)
+        index_forum_post(row)
+    else:
+        index_forum_thread(row)
+    return True
+
+def apply_verdict(content_type, content, approved, reason=None):
+    """Record a moderation outcome on a thread or post, keeping thread counters current"""
+    if approved and not content.approved and content_type == 'post':
+        ForumThread.record_activity(content.thread_id, content.created_at)
+
+    content.approved = content.approved or approved
+    content.moderation_status = 'approved' if content.approved else 'needs_review'
+    content.moderation_reason = None if content.approved else reason
+
+    if content.approved:
+        if content_type == 'thread':
+            index_forum_thread(content)
+        else:
+            index_forum_post(content)
+
+def bulk_review(action, thread_ids=(), post_ids=(), reason=None):
+    """Approve or reject queued threads and posts, one UPDATE per table; the caller commits.
+
+    Only content still awaiting review changes, so repeats and races with the
+    AI workers are harmless. Returns the ids that actually changed, by type.
+    """
+    approve = action == 'approve'
+    values = {
+        'approved': approve,
+        'moderation_status': 'approved' if approve else 'rejected',
+        'moderation_reason': None if approve else reason
+    }
+    changed = {}
+    for content_type, model, ids in (('thread', ForumThread, thread_ids), ('post', ForumPost, post_ids)):
+        if not ids:
+            changed[content_type] = []
+            continue
+        returning = [model.id, model.approved, model.content]
+        if model is ForumPost:
+            returning += [ForumPost.thread_id, ForumPost.created_at]
+        else:
+            returning += [ForumThread.title]
+        rows = db.session.execute(
+            db.update(model).where(model.id.in_(ids), in_review(model)).values(values).returning(*returning)
+        ).all()
+        changed[content_type] = sorted(row.id for row in rows)
+        if not approve:
+            continue
+
+        for row in rows:
+            if model is ForumPost:
+                index_forum_post(row)
+            else:
+                index_forum_thread(row)
+        if model is ForumPost:
+            per_thread = {}
+            for row in rows:
+                count, newest = per_thread.get(row.thread_id, (0, row.created_at))
+                per_thread[row.thread_id] = (count + 1, max(newest, row.created_at))
+            for thread_id, (count, newest) in per_thread.items():
+                ForumThread.record_activity(thread_id, newest, posts=count)
+    return changed
+
+moderation = ModerationPipeline()
@@ -0,0 +1,152 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from src.models.user import db
+from src.services import rollups
+
+_MISSING = object()
+
+def hour_start(at):
+    return at.replace(minute=0, second=0, microsecond=0)
+
+class ReferralClickCounter:
+    """Resolves referral codes from an in-memory LRU and counts clicks without touching the database.
+
+    Click deltas accumulate in memory per (code, platform, hour) and a flusher
+    thread applies them every REFERRAL_FLUSH_INTERVAL seconds as atomic
+    `clicks = clicks + n` updates in one short transaction, so the redirect
+    path never waits on the SQLite write lock.
+    """
+
+    def __init__(self, referral_model, share_model, app=None):
+        self.referral_model = referral_model
+        self.share_model = share_model
+        self.app = None
+        self.capacity = 10000
+        self._codes = OrderedDict()
+        self._codes_lock = threading.Lock()
+        self._deltas = {}
+        self._deltas_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._flusher = None
+        self._flusher_pid = None
+        self._stats = {'cache_hits': 0, 'cache_misses': 0, 'clicks_flushed': 0, 'flushes': 0}
+        self._exit_hook = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('REFERRAL_CACHE_SIZE', int(os.getenv('REFERRAL_CACHE_SIZE', '10000')))
+        app.config.setdefault('REFERRAL_FLUSH_INTERVAL', float(os.getenv('REFERRAL_FLUSH_INTERVAL', '2.0')))
+        self.app = app
+        self.capacity = app.config['REFERRAL_CACHE_SIZE']
+        app.extensions['referral_clicks'] = self
+        if not self._exit_hook:
+            atexit.register(self.shutdown)
+            self._exit_hook = True
+
+    def lookup(self, referral_code):
+        """Return (original_url, platform, shared_at) for a code, or None if it does not exist"""
+        with self._codes_lock:
+            entry = self._codes.get(referral_code, _MISSING)
+            if entry is not _MISSING:
+                self._codes.move_to_end(referral_code)
+                self._stats['cache_hits'] += 1
+                return entry
+            self._stats['cache_misses'] += 1
+
+        entry = self._resolve(referral_code)
+        if entry is not None:
+            # Misses aren't cached, so a code created in another worker resolves on its first click
+            self.remember(referral_code, entry)
+        return entry
+
+    def _resolve(self, referral_code):
+        # One SELECT for both the redirect target and the share details used by the rollups
+        row = db.session.query(
+            self.referral_model.original_url, self.share_model.platform, self.share_model.timestamp
+        ).outerjoin(
+            self.share_model, self.share_model.referral_code == self.referral_model.referral_code
+        ).filter(self.referral_model.referral_code == referral_code).first()
+        return tuple(row) if row else None
+
+    def remember(self, referral_code, entry):
+        with self._codes_lock:
+            self._codes[referral_code] = entry
+            self._codes.move_to_end(referral_code)
+            while len(self._codes) > self.capacity:
+                self._codes.popitem(last=False)
+
+    def record_click(self, referral_code, platform, at, shared_at=None):
+        self._ensure_flusher()
+        key = (referral_code, platform, hour_start(at), shared_at and hour_start(shared_at))
+        with self._deltas_lock:
+            self._deltas[key] = self._deltas.get(key, 0) + 1
+
+    def flush(self):
+        """Apply pending click deltas; returns the number of clicks written"""
+        with self._flush_lock:
+            with self._deltas_lock:
+                deltas, self._deltas = self._deltas, {}
+            if not deltas:
+                return 0
+
+            with self.app.app_context():
+                try:
+                    per_code = {}
+                    for (code, platform, hour, shared_hour), count in deltas.items():
+                        per_code[code] = per_code.get(code, 0) + count
+                        rollups.record_clicks(code, platform, count, hour, shared_hour)
+                    for code, count in per_code.items():
+                        for model in (self.referral_model, self.share_model):
+                            model.query.filter_by(referral_code=code).update(
+                                {model.clicks: db.func.coalesce(model.clicks, 0) + count},
+                                synchronize_session=False
+                            )
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    # Put the deltas back so a later flush retries them
+                    with self._deltas_lock:
+                        for key, count in deltas.items():
+                            self._deltas[key] = self._deltas.get(key, 0) + count
+                    raise
+                finally:
+                    db.session.remove()
+
+            total = sum(deltas.values())
+            self._stats['clicks_flushed'] += total
+            self._stats['flushes'] += 1
+            return total
+
+    def shutdown(self):
+        self._stopping.set()
+        if self.app is not None:
+            self.flush()
+
+    def stats(self):
+        with self._deltas_lock:
+            pending = sum(self._deltas.values())
+        with self._codes_lock:
+            cached = len(self._codes)
+        return dict(self._stats, pending_clicks=pending, cached_codes=cached)
+
+    def _ensure_flusher(self):
+        if self._flusher_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher = threading.Thread(target=self._run, name='referral-click-flusher', daemon=True)
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.app.config['REFERRAL_FLUSH_INTERVAL']):
+            try:
+                self.flush()
+            except Exception as e:
+                self.app.logger.exception('Flushing referral clicks failed: %s', e)
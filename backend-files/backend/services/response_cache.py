@@ -0,0 +1,335 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+from flask import request, current_app
+
+# Response headers worth replaying on a hit
+CACHED_HEADERS = ('Content-Type', 'X-Next-Cursor', 'Access-Control-Expose-Headers')
+
+# Rough per-entry bookkeeping cost on top of the body, for the memory cap
+ENTRY_OVERHEAD = 512
+
+class MemoryBackend:
+    """In-process LRU capped by the total size of the cached bodies.
+
+    Invalidations only reach this process, so with several workers pair it
+    with short TTLs or use the disk backend.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._size = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['expires_at'] <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, generation):
+        """Store entry unless something was invalidated since generation; returns (stored, evicted)"""
+        size = len(entry['body']) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return False, 0
+        evicted = 0
+        with self._lock:
+            if generation != self._generation:
+                return False, 0
+            self._remove(key)
+            while self._entries and self._size + size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                evicted += 1
+            self._entries[key] = entry
+            self._size += size
+            for tag in entry['tags']:
+                self._tags.setdefault(tag, set()).add(key)
+        return True, evicted
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def invalidate(self, keys=(), tags=()):
+        with self._lock:
+            self._generation += 1
+            doomed = set(keys)
+            for tag in tags:
+                doomed |= self._tags.pop(tag, set())
+            for key in doomed:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._size = 0
+
+    def info(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes}
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= len(entry['body']) + ENTRY_OVERHEAD
+        for tag in entry['tags']:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+class DiskBackend:
+    """SQLite file shared by every worker on the host, capped by entry count.
+
+    Entries and their tags live in one transaction, so an invalidation from
+    any worker is seen by all of them on their next lookup.
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS cache_entry (
+                key TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL,
+                stored_at REAL NOT NULL,
+                value BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cache_tag (
+                tag TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (tag, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_cache_tag_key ON cache_tag (key);
+            CREATE TABLE IF NOT EXISTS cache_meta (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('generation', 0);
+        """)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def get(self, key):
+        row = self._connection().execute("SELECT expires_at, value FROM cache_entry WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] <= time.time():
+            return None
+        return json.loads(row[1])
+
+    def set(self, key, entry, generation):
+        evicted = 0
+        with self._transaction() as conn:
+            if conn.execute("SELECT value FROM cache_meta WHERE name = 'generation'").fetchone()[0] != generation:
+                return False, 0
+            self._delete_keys(conn, [key])
+            conn.execute(
+                "INSERT INTO cache_entry (key, expires_at, stored_at, value) VALUES (?, ?, ?, ?)",
+                (key, entry['expires_at'], time.time(), json.dumps(entry))
+            )
+            conn.executemany("INSERT OR IGNORE INTO cache_tag (tag, key) VALUES (?, ?)", [(tag, key) for tag in entry['tags']])
+
+            excess = conn.execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM cache_entry WHERE expires_at <= ?", (time.time(),))
+                excess = conn.execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    oldest = [row[0] for row in conn.execute(
+                        "SELECT key FROM cache_entry ORDER BY stored_at LIMIT ?", (excess,)
+                    )]
+                    self._delete_keys(conn, oldest)
+                    evicted = len(oldest)
+                conn.execute("DELETE FROM cache_tag WHERE key NOT IN (SELECT key FROM cache_entry)")
+        return True, evicted
+
+    def generation(self):
+        return self._connection().execute("SELECT value FROM cache_meta WHERE name = 'generation'").fetchone()[0]
+
+    def invalidate(self, keys=(), tags=()):
+        with self._transaction() as conn:
+            conn.execute("UPDATE cache_meta SET value = value + 1 WHERE name = 'generation'")
+            doomed = list(keys)
+            for tag in tags:
+                doomed += [row[0] for row in conn.execute("SELECT key FROM cache_tag WHERE tag = ?", (tag,))]
+            self._delete_keys(conn, doomed)
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute("UPDATE cache_meta SET value = value + 1 WHERE name = 'generation'")
+            conn.execute("DELETE FROM cache_entry")
+            conn.execute("DELETE FROM cache_tag")
+
+    def info(self):
+        entries, size = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache_entry").fetchone()
+        return {'entries': entries, 'bytes': size, 'max_entries': self.max_entries, 'path': self.path}
+
+    def _delete_keys(self, conn, keys):
+        if keys:
+            conn.executemany("DELETE FROM cache_entry WHERE key = ?", [(key,) for key in keys])
+            conn.executemany("DELETE FROM cache_tag WHERE key = ?", [(key,) for key in keys])
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT around a block on an autocommit connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+class ResponseCache:
+    """Read-through cache for public GET endpoints.
+
+    Views opt in with @response_cache.cached(ttl, tags); the key is the path
+    plus the sorted query string. Tags may reference view arguments, e.g.
+    'blog:post:{post_id}', and write handlers call invalidate() after their
+    commit. A response computed while an invalidation happened is served but
+    not stored, so a slow read can't put pre-write data back in the cache.
+
+    RESPONSE_CACHE_BACKEND picks 'memory' (per-process LRU capped at
+    RESPONSE_CACHE_MAX_BYTES), 'disk' (SQLite file at RESPONSE_CACHE_PATH
+    shared by the workers on a host) or 'none'.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = None
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'skipped_stale': 0, 'evictions': 0, 'invalidations': 0}
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', os.getenv('RESPONSE_CACHE_BACKEND', 'memory'))
+        app.config.setdefault('RESPONSE_CACHE_DEFAULT_TTL', float(os.getenv('RESPONSE_CACHE_DEFAULT_TTL', '60')))
+        app.config.setdefault('RESPONSE_CACHE_MAX_BYTES', int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024))))
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '5000')))
+        app.config.setdefault('RESPONSE_CACHE_PATH', os.getenv(
+            'RESPONSE_CACHE_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'response_cache.db')
+        ))
+
+        backend = app.config['RESPONSE_CACHE_BACKEND']
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config['RESPONSE_CACHE_MAX_BYTES'])
+        elif backend == 'disk':
+            self.backend = DiskBackend(app.config['RESPONSE_CACHE_PATH'], app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+        elif backend == 'none':
+            self.backend = None
+        else:
+            raise ValueError(f'Unknown RESPONSE_CACHE_BACKEND: {backend}')
+        self.app = app
+        app.extensions['response_cache'] = self
+
+    def cached(self, ttl=None, tags=()):
+        """Decorator caching a view's 200 responses for ttl seconds under tags"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                if self.backend is None or request.method != 'GET':
+                    return view(**kwargs)
+
+                key = self.cache_key()
+                try:
+                    entry = self.backend.get(key)
+                    generation = self.backend.generation() if entry is None else None
+                except sqlite3.Error as e:
+                    current_app.logger.warning('Response cache lookup failed: %s', e)
+                    return view(**kwargs)
+                if entry is not None:
+                    self._count('hits')
+                    response = current_app.response_class(entry['body'], status=entry['status'], headers=entry['headers'])
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._count('misses')
+                response = current_app.make_response(view(**kwargs))
+                response.headers['X-Cache'] = 'MISS'
+                if response.status_code == 200 and not response.direct_passthrough:
+                    self._store(key, response, ttl, [tag.format(**kwargs) for tag in tags], generation)
+                return response
+            return wrapper
+        return decorator
+
+    def cache_key(self):
+        query = urlencode(sorted(request.args.items(multi=True)))
+        return f'{request.path}?{query}' if query else request.path
+
+    def invalidate(self, keys=(), tags=()):
+        """Drop cached responses by exact key (path plus query) and/or tag"""
+        if self.backend is None:
+            return
+        try:
+            self.backend.invalidate(keys=keys, tags=tags)
+        except sqlite3.Error as e:
+            current_app.logger.warning('Response cache invalidation failed, clearing instead: %s', e)
+            self.backend.clear()
+        self._count('invalidations')
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['backend'] = self.app.config['RESPONSE_CACHE_BACKEND'] if self.app else None
+        stats['storage'] = self.backend.info() if self.backend else None
+        return stats
+
+    def _store(self, key, response, ttl, tags, generation):
+        ttl = self.app.config['RESPONSE_CACHE_DEFAULT_TTL'] if ttl is None else ttl
+        entry = {
+            'body': response.get_data(as_text=True),
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+            'tags': tags,
+            'expires_at': time.time() + ttl
+        }
+        try:
+            stored, evicted = self.backend.set(key, entry, generation)
+        except sqlite3.Error as e:
+            current_app.logger.warning('Response cache store failed: %s', e)
+            return
+        with self._stats_lock:
+            self._stats['evictions'] += evicted
+            self._stats['stores' if stored else 'skipped_stale'] += 1
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+response_cache = ResponseCache()
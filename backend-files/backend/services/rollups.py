@@ -0,0 +1,188 @@
+import atexit
+import os
+import threading
+from datetime import timedelta
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.user import db
+from src.models.analytics import PageViewRollup, ShareRollup, ReferralRollup, RollupWatermark
+
+# Bucket formats match how SQLAlchemy stores DateTime on SQLite, so rollup
+# buckets compare correctly against datetime parameters
+BUCKET_FORMATS = {
+    'hour': '%Y-%m-%d %H:00:00.000000',
+    'day': '%Y-%m-%d 00:00:00.000000'
+}
+
+# Raw event tables folded into rollups by id range; clicks are not rows of
+# their own, so they are added to the rollups directly by record_clicks()
+ROLLUP_STATEMENTS = {
+    'page_view': db.text("""
+        INSERT INTO page_view_rollup (granularity, bucket, page_url, views)
+        SELECT :granularity, strftime(:bucket_format, timestamp), page_url, count(*)
+        FROM page_view
+        WHERE id > :after AND id <= :upto AND timestamp IS NOT NULL
+        GROUP BY 2, 3
+        ON CONFLICT (granularity, bucket, page_url) DO UPDATE SET views = views + excluded.views
+    """),
+    'share_event': db.text("""
+        INSERT INTO share_rollup (granularity, bucket, platform, shares, clicks)
+        SELECT :granularity, strftime(:bucket_format, timestamp), platform, count(*), 0
+        FROM share_event
+        WHERE id > :after AND id <= :upto AND timestamp IS NOT NULL
+        GROUP BY 2, 3
+        ON CONFLICT (granularity, bucket, platform) DO UPDATE SET shares = shares + excluded.shares
+    """)
+}
+
+ROLLUP_CHUNK_SIZE = 50000
+
+def get_watermark(source):
+    watermark = db.session.get(RollupWatermark, source)
+    return watermark.last_id if watermark else 0
+
+def refresh_rollups(chunk_size=ROLLUP_CHUNK_SIZE):
+    """Fold raw events added since the last run into the hourly and daily rollups.
+
+    Each chunk is aggregated and its watermark advanced in one transaction; the
+    watermark update is conditional, so concurrent refreshes from several
+    workers can never count the same rows twice. Returns the rows folded.
+    """
+    rolled = 0
+    for source, statement in ROLLUP_STATEMENTS.items():
+        db.session.execute(
+            sqlite_insert(RollupWatermark).values(source=source, last_id=0).on_conflict_do_nothing()
+        )
+        db.session.commit()
+
+        while True:
+            after = get_watermark(source)
+            chunk = db.session.execute(db.text(
+                f"SELECT count(*), max(id) FROM (SELECT id FROM {source} WHERE id > :after ORDER BY id LIMIT :limit)"
+            ), {'after': after, 'limit': chunk_size}).one()
+            if not chunk[0]:
+                break
+
+            for granularity, bucket_format in BUCKET_FORMATS.items():
+                db.session.execute(statement, {
+                    'granularity': granularity,
+                    'bucket_format': bucket_format,
+                    'after': after,
+                    'upto': chunk[1]
+                })
+
+            claimed = RollupWatermark.query.filter_by(source=source, last_id=after).update(
+                {RollupWatermark.last_id: chunk[1]}, synchronize_session=False
+            )
+            if not claimed:
+                db.session.rollback()
+                break
+            db.session.commit()
+            rolled += chunk[0]
+    return rolled
+
+def record_clicks(referral_code, platform, count, at, shared_at=None):
+    """Add referral clicks to the hourly and daily rollups in the current transaction.
+
+    Per-code clicks go in the bucket of the click, at. Per-platform clicks go in
+    the bucket of the share, shared_at, so a window's platform clicks are those
+    of the shares made in it, as the dashboard has always reported them.
+    """
+    for granularity, bucket in bucket_starts(at):
+        db.session.execute(
+            sqlite_insert(ReferralRollup).values(
+                granularity=granularity, bucket=bucket, referral_code=referral_code, clicks=count
+            ).on_conflict_do_update(
+                index_elements=['granularity', 'bucket', 'referral_code'],
+                set_={'clicks': ReferralRollup.clicks + count}
+            )
+        )
+    if platform and shared_at is not None:
+        for granularity, bucket in bucket_starts(shared_at):
+            db.session.execute(
+                sqlite_insert(ShareRollup).values(
+                    granularity=granularity, bucket=bucket, platform=platform, shares=0, clicks=count
+                ).on_conflict_do_update(
+                    index_elements=['granularity', 'bucket', 'platform'],
+                    set_={'clicks': ShareRollup.clicks + count}
+                )
+            )
+
+def bucket_starts(at):
+    hour = at.replace(minute=0, second=0, microsecond=0)
+    return [('hour', hour), ('day', hour.replace(hour=0))]
+
+def rollup_window(start):
+    """Hour-aligned start of the window and the first day boundary at or after it"""
+    hour_start = start.replace(minute=0, second=0, microsecond=0)
+    day_start = hour_start.replace(hour=0)
+    if day_start < hour_start:
+        day_start += timedelta(days=1)
+    return hour_start, day_start
+
+def window_filter(model, start):
+    """Hourly buckets up to the first whole day, daily buckets from there on"""
+    hour_start, day_start = rollup_window(start)
+    return db.or_(
+        db.and_(model.granularity == 'hour', model.bucket >= hour_start, model.bucket < day_start),
+        db.and_(model.granularity == 'day', model.bucket >= day_start)
+    )
+
+def pageview_totals(start):
+    """Rolled-up views per page URL since start"""
+    rows = db.session.query(
+        PageViewRollup.page_url, db.func.sum(PageViewRollup.views)
+    ).filter(window_filter(PageViewRollup, start)).group_by(PageViewRollup.page_url).all()
+    return {url: views for url, views in rows}
+
+def share_totals(start):
+    """Rolled-up (shares, clicks) per platform for shares made since start"""
+    rows = db.session.query(
+        ShareRollup.platform, db.func.sum(ShareRollup.shares), db.func.sum(ShareRollup.clicks)
+    ).filter(window_filter(ShareRollup, start)).group_by(ShareRollup.platform).all()
+    return {platform: (shares, clicks) for platform, shares, clicks in rows}
+
+def top_referral_clicks(start, limit=10):
+    """Referral codes with the most clicks made since start, as (code, clicks) pairs"""
+    clicks = db.func.sum(ReferralRollup.clicks).label('clicks')
+    return db.session.query(ReferralRollup.referral_code, clicks).filter(
+        window_filter(ReferralRollup, start)
+    ).group_by(ReferralRollup.referral_code).order_by(clicks.desc()).limit(limit).all()
+
+class RollupRefresher:
+    """Background thread that keeps the analytics rollups current"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._stopping = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ANALYTICS_ROLLUP_INTERVAL', float(os.getenv('ANALYTICS_ROLLUP_INTERVAL', '60')))
+        self.app = app
+        app.extensions['analytics_rollups'] = self
+
+    def start(self):
+        if self._thread is not None or not self.app.config['ANALYTICS_ROLLUP_INTERVAL']:
+            return
+        self._thread = threading.Thread(target=self._run, name='analytics-rollups', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        interval = self.app.config['ANALYTICS_ROLLUP_INTERVAL']
+        while not self._stopping.wait(interval):
+            with self.app.app_context():
+                try:
+                    refresh_rollups()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.exception('Analytics rollup refresh failed: %s', e)
+                finally:
+                    db.session.remove()
+
+rollup_refresher = RollupRefresher()
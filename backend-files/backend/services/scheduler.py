@@ -0,0 +1,273 @@
+import atexit
+import heapq
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from src.models.user import db
+from src.models.social_media import ScheduledPost, ScheduledPostOutcome
+
+class PostScheduler:
+    """Publishes scheduled social media posts when they fall due.
+
+    Due times live in the database (indexed on status, due_at); the dispatcher
+    keeps an in-memory min-heap of upcoming (due_at, id) pairs and sleeps until
+    the earliest one instead of polling the table. Due posts are claimed in
+    batches with a conditional UPDATE, so several worker processes can run a
+    dispatcher without publishing anything twice, and are published on a
+    bounded pool through publish(content, platforms, media_url, executor=...).
+    Platform calls go to the scheduler's own pool, sized for every post in
+    flight to reach all max_platforms at once, so interactive posts can't
+    starve it.
+
+    A claimed post is marked 'publishing' in its own commit before any
+    platform is called. The heap is rebuilt from the table every
+    SCHEDULER_RESYNC_INTERVAL seconds to pick up posts scheduled by other
+    processes; claims whose worker died before publishing go back to
+    'scheduled', but a post left 'publishing' becomes 'unknown', never
+    published a second time. Platforms that were never started (the pool was
+    still busy at the deadline) are retried after SCHEDULER_RETRY_SECONDS.
+    """
+
+    def __init__(self, publish, max_platforms=1, app=None):
+        self.publish = publish
+        self.max_platforms = max_platforms
+        self.app = None
+        self._heap = []
+        self._heap_complete = True
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._executor = None
+        self._platform_executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SCHEDULER_ENABLED', os.getenv('SCHEDULER_ENABLED', '1') == '1')
+        app.config.setdefault('SCHEDULER_BATCH_SIZE', int(os.getenv('SCHEDULER_BATCH_SIZE', '50')))
+        app.config.setdefault('SCHEDULER_CONCURRENCY', int(os.getenv('SCHEDULER_CONCURRENCY', '4')))
+        app.config.setdefault('SCHEDULER_HEAP_LIMIT', int(os.getenv('SCHEDULER_HEAP_LIMIT', '10000')))
+        app.config.setdefault('SCHEDULER_RESYNC_INTERVAL', float(os.getenv('SCHEDULER_RESYNC_INTERVAL', '300')))
+        app.config.setdefault('SCHEDULER_CLAIM_LEASE', float(os.getenv('SCHEDULER_CLAIM_LEASE', '600')))
+        app.config.setdefault('SCHEDULER_RETRY_SECONDS', float(os.getenv('SCHEDULER_RETRY_SECONDS', '60')))
+        self.app = app
+        app.extensions['post_scheduler'] = self
+
+    def start(self):
+        if self._thread is not None or not self.app.config['SCHEDULER_ENABLED']:
+            return
+        self._stopping = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.app.config['SCHEDULER_CONCURRENCY'],
+            thread_name_prefix='scheduled-post'
+        )
+        self._platform_executor = ThreadPoolExecutor(
+            max_workers=self.app.config['SCHEDULER_CONCURRENCY'] * self.max_platforms,
+            thread_name_prefix='scheduled-post-platform'
+        )
+        self._thread = threading.Thread(target=self._run, name='post-scheduler', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._platform_executor is not None:
+            self._platform_executor.shutdown(wait=True, cancel_futures=True)
+
+    def schedule(self, post):
+        """Tell the dispatcher about a post committed to the table"""
+        with self._wakeup:
+            heapq.heappush(self._heap, (post.due_at, post.id))
+            # Only wake the dispatcher if this post is now the earliest
+            if self._heap[0][1] == post.id:
+                self._wakeup.notify()
+
+    def dispatch_due(self, now=None):
+        """Claim and publish every post due by now; returns the number published.
+
+        Runs in the caller's app context; used by the dispatcher thread and
+        handy for driving the scheduler synchronously.
+        """
+        now = now or datetime.utcnow()
+        published = 0
+        while True:
+            claim_token, batch = self._claim_batch(now)
+            if not batch:
+                return published
+            if self._executor is not None:
+                list(self._executor.map(lambda post_id: self._publish_claimed(post_id, claim_token), batch))
+            else:
+                for post_id in batch:
+                    self._publish_claimed(post_id, claim_token)
+            published += len(batch)
+
+    def _run(self):
+        resync_interval = self.app.config['SCHEDULER_RESYNC_INTERVAL']
+        next_resync = datetime.utcnow()
+        while True:
+            if datetime.utcnow() >= next_resync:
+                self._with_context(self._resync)
+                next_resync = datetime.utcnow() + timedelta(seconds=resync_interval)
+
+            with self._wakeup:
+                if self._stopping:
+                    return
+                now = datetime.utcnow()
+                timeout = (next_resync - now).total_seconds()
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0][0] - now).total_seconds())
+                if timeout > 0:
+                    self._wakeup.wait(timeout)
+                if self._stopping:
+                    return
+
+                now = datetime.utcnow()
+                due = False
+                while self._heap and self._heap[0][0] <= now:
+                    heapq.heappop(self._heap)
+                    due = True
+                if not self._heap and not self._heap_complete:
+                    next_resync = now
+
+            if due:
+                self._with_context(self.dispatch_due)
+
+    def _resync(self):
+        """Rebuild the heap from the table and settle claims whose worker died"""
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=self.app.config['SCHEDULER_CLAIM_LEASE'])
+        # Claimed but never marked publishing: no platform was called, so it can run again
+        ScheduledPost.query.filter(
+            ScheduledPost.status == 'claimed',
+            ScheduledPost.claimed_at < lease_expired
+        ).update({ScheduledPost.status: 'scheduled'}, synchronize_session=False)
+        # Publishing: the platforms may have posted it, so it must not run again
+        ScheduledPost.query.filter(
+            ScheduledPost.status == 'publishing',
+            ScheduledPost.claimed_at < lease_expired
+        ).update({ScheduledPost.status: 'unknown', ScheduledPost.completed_at: now}, synchronize_session=False)
+        db.session.commit()
+
+        limit = self.app.config['SCHEDULER_HEAP_LIMIT']
+        upcoming = db.session.query(ScheduledPost.due_at, ScheduledPost.id).filter(
+            ScheduledPost.status == 'scheduled'
+        ).order_by(ScheduledPost.due_at).limit(limit).all()
+
+        with self._wakeup:
+            self._heap = [(due_at, post_id) for due_at, post_id in upcoming]
+            heapq.heapify(self._heap)
+            self._heap_complete = len(upcoming) < limit
+
+    def _claim_batch(self, now):
+        due_ids = db.session.query(ScheduledPost.id).filter(
+            ScheduledPost.status == 'scheduled',
+            ScheduledPost.due_at <= now
+        ).order_by(ScheduledPost.due_at).limit(self.app.config['SCHEDULER_BATCH_SIZE']).all()
+        if not due_ids:
+            return None, []
+
+        due_ids = [row.id for row in due_ids]
+        claim_token = uuid.uuid4().hex
+        ScheduledPost.query.filter(
+            ScheduledPost.id.in_(due_ids),
+            ScheduledPost.status == 'scheduled'
+        ).update({
+            ScheduledPost.status: 'claimed',
+            ScheduledPost.claimed_at: datetime.utcnow(),
+            ScheduledPost.claim_token: claim_token
+        }, synchronize_session=False)
+        db.session.commit()
+
+        # Keep only the rows this dispatcher actually claimed
+        return claim_token, [row.id for row in db.session.query(ScheduledPost.id).filter(
+            ScheduledPost.id.in_(due_ids),
+            ScheduledPost.claim_token == claim_token
+        )]
+
+    def _publish_claimed(self, post_id, claim_token):
+        publishing = False
+        with self.app.app_context():
+            try:
+                started = ScheduledPost.query.filter_by(id=post_id, claim_token=claim_token, status='claimed').update(
+                    {ScheduledPost.status: 'publishing', ScheduledPost.claimed_at: datetime.utcnow()},
+                    synchronize_session=False
+                )
+                db.session.commit()
+                if not started:
+                    return
+                publishing = True
+
+                post = db.session.get(ScheduledPost, post_id)
+                done = {outcome.platform for outcome in post.outcomes}
+                platforms = [platform for platform in json.loads(post.platforms) if platform not in done]
+                results = self.publish(post.content, platforms, post.media_url, executor=self._platform_executor)
+
+                retry = False
+                for platform, result in results.items():
+                    if result.get('status') == 'not_attempted':
+                        retry = True
+                        continue
+                    post.outcomes.append(ScheduledPostOutcome(
+                        platform=platform,
+                        success=bool(result.get('success')),
+                        platform_post_id=result.get('post_id'),
+                        error=result.get('error')
+                    ))
+
+                if retry:
+                    post.status = 'scheduled'
+                    post.due_at = datetime.utcnow() + timedelta(seconds=self.app.config['SCHEDULER_RETRY_SECONDS'])
+                else:
+                    post.status = settled_status(post.outcomes, results)
+                    post.completed_at = datetime.utcnow()
+                db.session.commit()
+                if retry:
+                    self.schedule(post)
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception('Publishing scheduled post %s failed: %s', post_id, e)
+                if publishing:
+                    self._mark_unknown(post_id, claim_token)
+            finally:
+                db.session.remove()
+
+    def _mark_unknown(self, post_id, claim_token):
+        # The platforms were called but their outcomes were lost; record that
+        # in a fresh session so the post isn't left claimed or published again
+        db.session.remove()
+        try:
+            ScheduledPost.query.filter_by(id=post_id, claim_token=claim_token, status='publishing').update(
+                {ScheduledPost.status: 'unknown', ScheduledPost.completed_at: datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.exception('Marking scheduled post %s unknown failed: %s', post_id, e)
+
+    def _with_context(self, func):
+        with self.app.app_context():
+            try:
+                func()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception('Post scheduler error: %s', e)
+            finally:
+                db.session.remove()
+
+def settled_status(outcomes, results):
+    """Final status once every platform has been tried"""
+    if all(outcome.success for outcome in outcomes):
+        return 'published'
+    if any(result.get('status') == 'unknown' for result in results.values()):
+        return 'unknown'
+    if any(outcome.success for outcome in outcomes):
+        return 'partial'
+    return 'failed'
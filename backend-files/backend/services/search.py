@@ -0,0 +1,183 @@
+import re
+import time
+from markupsafe import escape
+from src.models.user import db
+
+# One FTS5 table for every searchable document. The rowid packs the document
+# type into its low bits so updates and deletes are primary-key lookups.
+DOC_TYPES = {
+    'blog': 1,
+    'thread': 2,
+    'post': 3
+}
+DOC_TYPE_NAMES = {code: name for name, code in DOC_TYPES.items()}
+TYPE_BITS = 2
+
+# bm25 column weights: title, body, tags
+RANK_WEIGHTS = (10.0, 1.0, 5.0)
+
+# Private-use markers survive HTML escaping and are swapped for <mark> afterwards
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+
+# None until ensure_search_index() or the first is_search_enabled() check;
+# False when SQLite was built without FTS5 or the index was not created yet.
+# Only True sticks: a miss is looked up again after SEARCH_RECHECK_SECONDS, so
+# a worker started before init-db picks the index up once it exists.
+search_enabled = None
+search_checked_at = 0.0
+SEARCH_RECHECK_SECONDS = 30.0
+
+CREATE_INDEX_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body, tags,
+        parent_id UNINDEXED,
+        tokenize = 'porter unicode61'
+    )
+"""
+
+def search_rowid(doc_type, doc_id):
+    return (doc_id << TYPE_BITS) | DOC_TYPES[doc_type]
+
+def is_search_enabled():
+    """Whether the FTS5 table exists; once it does, this no longer queries"""
+    global search_enabled, search_checked_at
+    if search_enabled or (search_enabled is False and time.monotonic() - search_checked_at < SEARCH_RECHECK_SECONDS):
+        return bool(search_enabled)
+    search_enabled = db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+    )).first() is not None
+    search_checked_at = time.monotonic()
+    return search_enabled
+
+def ensure_search_index():
+    """Create the FTS5 table if needed, backfilling it on first creation.
+
+    Returns False when this SQLite build lacks FTS5, in which case search is
+    disabled and the index helpers do nothing.
+    """
+    global search_enabled, search_checked_at
+    exists = db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+    )).first()
+    try:
+        db.session.execute(db.text(CREATE_INDEX_SQL))
+    except Exception:
+        db.session.rollback()
+        search_enabled = False
+        search_checked_at = time.monotonic()
+        return False
+    search_enabled = True
+    if not exists:
+        rebuild_search_index()
+    db.session.commit()
+    return True
+
+def rebuild_search_index():
+    """Re-index every searchable document from the source tables"""
+    from src.models.blog import BlogPost
+    from src.models.forum import ForumThread, ForumPost
+
+    db.session.execute(db.text("DELETE FROM search_index"))
+    for post in BlogPost.query.filter_by(published=True).yield_per(500):
+        index_blog_post(post)
+    for thread in ForumThread.query.filter_by(approved=True).yield_per(500):
+        _replace('thread', thread.id, thread.title, thread.content)
+    visible_posts = ForumPost.query.join(ForumThread, ForumPost.thread_id == ForumThread.id).filter(
+        ForumPost.approved == True, ForumThread.approved == True
+    )
+    for post in visible_posts.yield_per(500):
+        _replace('post', post.id, '', post.content, parent_id=post.thread_id)
+
+def _replace(doc_type, doc_id, title, body, tags='', parent_id=None):
+    if not is_search_enabled():
+        return
+    rowid = search_rowid(doc_type, doc_id)
+    db.session.execute(db.text("DELETE FROM search_index WHERE rowid = :rowid"), {'rowid': rowid})
+    db.session.execute(db.text(
+        "INSERT INTO search_index (rowid, title, body, tags, parent_id) VALUES (:rowid, :title, :body, :tags, :parent_id)"
+    ), {'rowid': rowid, 'title': title or '', 'body': body or '', 'tags': tags or '', 'parent_id': parent_id})
+
+def remove_document(doc_type, doc_id):
+    if not is_search_enabled():
+        return
+    db.session.execute(db.text("DELETE FROM search_index WHERE rowid = :rowid"), {'rowid': search_rowid(doc_type, doc_id)})
+
+def index_blog_post(post):
+    """Index a published post, or drop it from the index if unpublished"""
+    if not post.published:
+        remove_document('blog', post.id)
+        return
+    _replace('blog', post.id, post.title, post.content, ' '.join(tag.name for tag in post.tags))
+
+def index_forum_thread(thread):
+    """Index an approved thread and the approved posts that were waiting on it"""
+    from src.models.forum import ForumPost
+
+    if not thread.approved:
+        remove_document('thread', thread.id)
+        return
+    _replace('thread', thread.id, thread.title, thread.content)
+    if not is_search_enabled():
+        return
+    posts = db.session.query(ForumPost.id, ForumPost.content).filter_by(thread_id=thread.id, approved=True)
+    for post_id, content in posts:
+        _replace('post', post_id, '', content, parent_id=thread.id)
+
+def index_forum_post(post):
+    """Index an approved post, unless its thread is still hidden from readers"""
+    from src.models.forum import ForumThread
+
+    if not post.approved:
+        remove_document('post', post.id)
+        return
+    if not is_search_enabled():
+        return
+    if not db.session.query(ForumThread.approved).filter_by(id=post.thread_id).scalar():
+        remove_document('post', post.id)
+        return
+    _replace('post', post.id, '', post.content, parent_id=post.thread_id)
+
+def build_match_query(text):
+    """Turn free text into a safe FTS5 query: every word required, the last one as a prefix"""
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+def _highlighted(value):
+    return str(escape(value)).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+def search(text, doc_types=None, limit=20, offset=0):
+    """Ranked matches for text, with HTML-escaped snippets highlighting the hits"""
+    match = build_match_query(text)
+    if match is None or not is_search_enabled():
+        return []
+
+    type_filter = ''
+    params = {'match': match, 'limit': limit, 'offset': offset}
+    if doc_types:
+        codes = [DOC_TYPES[doc_type] for doc_type in doc_types]
+        type_filter = f"AND (rowid & {(1 << TYPE_BITS) - 1}) IN ({', '.join(str(code) for code in codes)})"
+
+    rows = db.session.execute(db.text(f"""
+        SELECT rowid, parent_id,
+               highlight(search_index, 0, :start, :end) AS title,
+               snippet(search_index, 1, :start, :end, '…', 16) AS snippet,
+               bm25(search_index, {', '.join(str(weight) for weight in RANK_WEIGHTS)}) AS score
+        FROM search_index
+        WHERE search_index MATCH :match {type_filter}
+        ORDER BY score
+        LIMIT :limit OFFSET :offset
+    """), dict(params, start=MATCH_START, end=MATCH_END)).all()
+
+    return [{
+        'type': DOC_TYPE_NAMES[row.rowid & ((1 << TYPE_BITS) - 1)],
+        'id': row.rowid >> TYPE_BITS,
+        'thread_id': row.parent_id,
+        'title': _highlighted(row.title),
+        'snippet': _highlighted(row.snippet),
+        'score': -row.score
+    } for row in rows]
@@ -0,0 +1,225 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import tempfile
+import click
+from flask import current_app, request, send_file
+from flask.cli import with_appcontext
+
+# Vite emits content-hashed names like assets/index-DuVd0bVs.js; those never
+# change in place, so browsers can keep them forever
+HASHED_NAME = re.compile(r'-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml', 'image/svg+xml', 'image/vnd.microsoft.icon', 'image/x-icon')
+
+# Preferred first; suffix of the precompressed file next to the original
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Written by `flask build-static` inside the static folder; never served
+MANIFEST_NAME = '.static-manifest.json'
+
+def _compress(encoding, data):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+def _write_atomic(path, data):
+    """Write to a temp file in the same directory, then swap it in, so a
+    reader never sees a half-written file"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+class StaticAsset:
+    __slots__ = ('path', 'mimetype', 'size', 'mtime', 'etag', 'hashed', 'variants')
+
+    def __init__(self, path, mimetype, size, mtime, etag, hashed):
+        self.path = path
+        self.mimetype = mimetype
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self.hashed = hashed
+        self.variants = {}
+
+    def to_dict(self, root):
+        return {
+            'mimetype': self.mimetype,
+            'size': self.size,
+            'mtime': self.mtime,
+            'etag': self.etag,
+            'hashed': self.hashed,
+            'variants': {encoding: os.path.relpath(path, root) for encoding, path in self.variants.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, root, relative, data):
+        asset = cls(os.path.join(root, relative), data['mimetype'], data['size'], data['mtime'], data['etag'], data['hashed'])
+        asset.variants = {encoding: os.path.join(root, path) for encoding, path in data['variants'].items()}
+        return asset
+
+class StaticAssets:
+    """Serves the built frontend from a manifest made at build time.
+
+    `flask build-static` fingerprints every file in the static folder, writes
+    gzip (and, if the brotli package is installed, brotli) variants of
+    compressible files next to them and saves the result as a manifest.
+    init_app only reads that manifest, so neither worker startup nor
+    requests compress, hash or probe the filesystem. Without a manifest the
+    folder is listed once with stat-based ETags and no variants.
+
+    Hashed bundles are sent with a year-long immutable Cache-Control,
+    index.html with an ETag and no-cache so a deploy is seen on the next
+    navigation, and any path not in the manifest gets index.html for the
+    SPA router.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STATIC_PRECOMPRESS', os.getenv('STATIC_PRECOMPRESS', '1') == '1')
+        app.config.setdefault('STATIC_COMPRESS_MIN_SIZE', int(os.getenv('STATIC_COMPRESS_MIN_SIZE', '1024')))
+        app.config.setdefault('STATIC_IMMUTABLE_MAX_AGE', int(os.getenv('STATIC_IMMUTABLE_MAX_AGE', '31536000')))
+        app.config.setdefault('STATIC_MAX_AGE', int(os.getenv('STATIC_MAX_AGE', '3600')))
+        self.app = app
+        self.refresh()
+        app.extensions['static_assets'] = self
+
+    def refresh(self):
+        """Reload the manifest, e.g. after the frontend was redeployed in place"""
+        root = self.app.static_folder
+        manifest = {}
+        manifest_path = os.path.join(root, MANIFEST_NAME) if root else None
+        if manifest_path and os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = {relative: StaticAsset.from_dict(root, relative, data) for relative, data in json.load(f).items()}
+        elif root and os.path.isdir(root):
+            self.app.logger.warning('No %s in %s; run `flask build-static` for content ETags and compressed variants', MANIFEST_NAME, root)
+            for relative, full_path in self._files(root):
+                stat = os.stat(full_path)
+                manifest[relative] = StaticAsset(
+                    path=full_path,
+                    mimetype=mimetypes.guess_type(relative)[0] or 'application/octet-stream',
+                    size=stat.st_size,
+                    mtime=stat.st_mtime,
+                    etag=f'{int(stat.st_mtime)}-{stat.st_size}',
+                    hashed=bool(HASHED_NAME.search(relative))
+                )
+        self.manifest = manifest
+
+    def build(self):
+        """Fingerprint and precompress the static folder, write the manifest
+        and load it. Returns the number of files in the manifest."""
+        root = self.app.static_folder
+        if not root or not os.path.isdir(root):
+            raise click.ClickException(f'No static folder at {root}')
+        manifest = {relative: self._build_asset(relative, full_path) for relative, full_path in self._files(root)}
+        data = {relative: asset.to_dict(root) for relative, asset in manifest.items()}
+        _write_atomic(os.path.join(root, MANIFEST_NAME), json.dumps(data, indent=1, sort_keys=True).encode())
+        self.manifest = manifest
+        return len(manifest)
+
+    def _files(self, root):
+        for directory, _, names in os.walk(root):
+            for name in names:
+                full_path = os.path.join(directory, name)
+                if name == MANIFEST_NAME or name.endswith('.tmp'):
+                    continue
+                if name.endswith(tuple(suffix for _, suffix in ENCODINGS)) and os.path.exists(full_path.rsplit('.', 1)[0]):
+                    continue  # a variant of another file
+                yield os.path.relpath(full_path, root).replace(os.sep, '/'), full_path
+
+    def _build_asset(self, relative, full_path):
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(relative)[0] or 'application/octet-stream'
+        asset = StaticAsset(
+            path=full_path,
+            mimetype=mimetype,
+            size=len(data),
+            mtime=os.path.getmtime(full_path),
+            etag=hashlib.sha256(data).hexdigest()[:20],
+            hashed=bool(HASHED_NAME.search(relative))
+        )
+
+        config = self.app.config
+        if not config['STATIC_PRECOMPRESS'] or len(data) < config['STATIC_COMPRESS_MIN_SIZE'] or not mimetype.startswith(COMPRESSIBLE_TYPES):
+            return asset
+        for encoding, suffix in ENCODINGS:
+            variant_path = full_path + suffix
+            if not os.path.exists(variant_path) or os.path.getmtime(variant_path) < asset.mtime:
+                compressed = _compress(encoding, data)
+                if compressed is None:
+                    continue
+                try:
+                    _write_atomic(variant_path, compressed)
+                except OSError as e:
+                    self.app.logger.warning('Could not write %s: %s', variant_path, e)
+                    continue
+            # Only worth sending if it is actually smaller
+            if os.path.getsize(variant_path) < asset.size:
+                asset.variants[encoding] = variant_path
+        return asset
+
+    def serve(self, path):
+        """Response for a frontend path, falling back to index.html"""
+        asset = self.manifest.get(path) or self.manifest.get('index.html')
+        if asset is None:
+            return "index.html not found", 404
+
+        encoding = None
+        if asset.variants:
+            accepted = request.accept_encodings
+            encoding = next((name for name, _ in ENCODINGS if name in asset.variants and accepted[name]), None)
+
+        response = send_file(
+            asset.variants[encoding] if encoding else asset.path,
+            mimetype=asset.mimetype,
+            conditional=True,
+            etag=f'{asset.etag}-{encoding}' if encoding else asset.etag,
+            last_modified=asset.mtime
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+
+        if asset.hashed:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = self.app.config['STATIC_IMMUTABLE_MAX_AGE']
+            response.cache_control.immutable = True
+        elif path in self.manifest and path != 'index.html':
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = self.app.config['STATIC_MAX_AGE']
+        else:
+            # index.html and SPA routes: always revalidate, cheap thanks to the ETag
+            response.cache_control.no_cache = True
+        return response
+
+static_assets = StaticAssets()
+
+@click.command('build-static')
+@with_appcontext
+def build_static_command():
+    """Fingerprint and precompress the frontend and write its manifest."""
+    assets = current_app.extensions['static_assets']
+    count = assets.build()
+    click.echo(f'Static manifest written for {count} files.')
@@ -0,0 +1,151 @@
+import hashlib
+import math
+import zlib
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.user import db
+from src.models.analytics import UniqueSketch
+
+# 2**12 one-byte registers: 4 KiB uncompressed, about 1.6% standard error
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+HASH_BITS = 64
+
+SITE_WIDE = ''
+METRICS = ('sessions', 'visitors')
+
+class HyperLogLog:
+    """Distinct-count sketch; merging two sketches gives the sketch of the union"""
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers is not None else bytearray(REGISTERS)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+        index = x >> (HASH_BITS - PRECISION)
+        rest = x & ((1 << (HASH_BITS - PRECISION)) - 1)
+        rank = HASH_BITS - PRECISION - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+        estimate = alpha * REGISTERS * REGISTERS / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Linear counting is more accurate while most registers are still empty
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(zlib.decompress(data))
+
+def day_start(at):
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def pageview_keys(row):
+    """(metric, value) pairs a page view contributes; visitors are IP plus user agent"""
+    keys = []
+    if row.get('session_id'):
+        keys.append(('sessions', row['session_id']))
+    if row.get('ip_address'):
+        keys.append(('visitors', f"{row['ip_address']}|{row.get('user_agent') or ''}"))
+    return keys
+
+def fold_pageviews(rows):
+    """Add page views to their day's site-wide and per-page sketches.
+
+    Runs inside the page view flush transaction, after its INSERT, so this
+    connection already holds SQLite's write lock and the read-merge-write of
+    each sketch can't interleave with another worker's flush. Adding a value
+    twice changes nothing, so replaying rows is harmless.
+    """
+    sketches = {}
+    for row in rows:
+        if row.get('timestamp') is None:
+            continue
+        day = day_start(row['timestamp'])
+        for metric, value in pageview_keys(row):
+            for page_url in (SITE_WIDE, row['page_url']):
+                key = (metric, day, page_url)
+                if key not in sketches:
+                    sketches[key] = HyperLogLog()
+                sketches[key].add(value)
+    if not sketches:
+        return 0
+
+    keys = list(sketches)
+    for start in range(0, len(keys), 300):
+        chunk = keys[start:start + 300]
+        stored = db.session.query(UniqueSketch).filter(
+            db.tuple_(UniqueSketch.metric, UniqueSketch.day, UniqueSketch.page_url).in_(chunk)
+        )
+        for row in stored:
+            sketches[(row.metric, row.day, row.page_url)].merge(HyperLogLog.from_bytes(row.registers))
+
+    for (metric, day, page_url), sketch in sketches.items():
+        registers = sketch.to_bytes()
+        db.session.execute(
+            sqlite_insert(UniqueSketch).values(
+                metric=metric, day=day, page_url=page_url, registers=registers
+            ).on_conflict_do_update(
+                index_elements=['metric', 'day', 'page_url'],
+                set_={'registers': registers}
+            )
+        )
+    return len(sketches)
+
+def unique_counts(start, end, page_urls=(SITE_WIDE,)):
+    """Estimated distinct sessions and visitors per page URL over the UTC days from start through end.
+
+    Reads one sketch per metric, page and day, whatever the traffic; '' is
+    the whole site. Returns {page_url: {'sessions': n, 'visitors': n}}.
+    """
+    merged = {(metric, page_url): HyperLogLog() for metric in METRICS for page_url in page_urls}
+    rows = db.session.query(UniqueSketch).filter(
+        UniqueSketch.day >= day_start(start),
+        UniqueSketch.day <= day_start(end),
+        UniqueSketch.page_url.in_(list(page_urls))
+    )
+    for row in rows:
+        merged[(row.metric, row.page_url)].merge(HyperLogLog.from_bytes(row.registers))
+    return {
+        page_url: {metric: merged[(metric, page_url)].count() for metric in METRICS}
+        for page_url in page_urls
+    }
+
+def backfill(since=None, batch_size=5000):
+    """Fold already-stored page views into the sketches; safe to repeat. Returns rows read."""
+    from src.routes.analytics import PageView
+
+    columns = [PageView.id, PageView.page_url, PageView.user_agent, PageView.ip_address, PageView.session_id, PageView.timestamp]
+    last_id = 0
+    total = 0
+    while True:
+        query = db.select(*columns).where(PageView.id > last_id).order_by(PageView.id).limit(batch_size)
+        if since is not None:
+            query = query.where(PageView.timestamp >= since)
+        rows = [row._asdict() for row in db.session.execute(query)]
+        if not rows:
+            return total
+        fold_pageviews(rows)
+        db.session.commit()
+        last_id = rows[-1]['id']
+        total += len(rows)
+
+@click.command('backfill-uniques')
+@click.option('--days', type=int, help='only page views from the last N days')
+@with_appcontext
+def backfill_uniques_command(days):
+    """Build unique session and visitor sketches from stored page views."""
+    since = day_start(datetime.utcnow() - timedelta(days=days)) if days else None
+    click.echo(f'Folded {backfill(since)} page views into unique sketches', err=True)
@@ -0,0 +1,288 @@
+import atexit
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.user import db
+from src.models.webhook import WebhookEvent
+
+# Headers providers use to identify a delivery; retries of one delivery repeat it
+IDEMPOTENCY_HEADERS = ('Idempotency-Key', 'X-Idempotency-Key', 'Webhook-Id', 'X-GitHub-Delivery')
+EVENT_TYPE_HEADERS = ('X-Event-Type', 'X-GitHub-Event', 'X-Webhook-Event')
+
+def delivery_key(headers, body, data):
+    """Idempotency key for a delivery: a provider header, the payload's own id, or a hash of the body"""
+    for header in IDEMPOTENCY_HEADERS:
+        if headers.get(header):
+            return headers[header][:200]
+    if isinstance(data, dict) and isinstance(data.get('id'), (str, int)):
+        return f"id:{data['id']}"[:200]
+    return 'sha256:' + hashlib.sha256(body).hexdigest()
+
+def delivery_type(headers, data):
+    for header in EVENT_TYPE_HEADERS:
+        if headers.get(header):
+            return headers[header][:100]
+    if isinstance(data, dict):
+        for field in ('type', 'event'):
+            if isinstance(data.get(field), str):
+                return data[field][:100]
+    return 'unknown'
+
+def log_handler(events):
+    """Fallback for event types nobody registered: log them and move on"""
+    for event in events:
+        current_app.logger.info('Webhook %s from %s (%s): %s', event.event_type, event.source, event.idempotency_key, event.payload)
+
+class WebhookQueue:
+    """Durable, deduplicated queue between webhook deliveries and their handlers.
+
+    The webhook route appends the raw body to the webhook_event table and
+    acknowledges straight away; a unique (source, idempotency_key) constraint
+    drops retried deliveries at insert time. A consumer thread claims pending
+    events in batches of WEBHOOK_BATCH_SIZE, groups them by event type and
+    hands each group to the handler registered for that type (or '*').
+    A handler that raises sends its group back to the queue with exponential
+    backoff until WEBHOOK_MAX_ATTEMPTS. Processed events are kept for
+    WEBHOOK_RETENTION_DAYS, which is also how long deduplication lasts.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._handlers = {'*': log_handler}
+        self._stats = {
+            'received': 0,
+            'duplicates': 0,
+            'processed': 0,
+            'retried': 0,
+            'failed': 0,
+            'batches': 0,
+            'lag_seconds_total': 0.0,
+            'max_lag_seconds': 0.0
+        }
+        self._stats_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._pending_signals = 0
+        self._stopping = False
+        self._thread = None
+        self._last_prune = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WEBHOOK_CONSUMER_ENABLED', os.getenv('WEBHOOK_CONSUMER_ENABLED', '1') == '1')
+        app.config.setdefault('WEBHOOK_BATCH_SIZE', int(os.getenv('WEBHOOK_BATCH_SIZE', '100')))
+        app.config.setdefault('WEBHOOK_MAX_ATTEMPTS', int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '5')))
+        app.config.setdefault('WEBHOOK_RETRY_SECONDS', float(os.getenv('WEBHOOK_RETRY_SECONDS', '30')))
+        app.config.setdefault('WEBHOOK_CLAIM_LEASE', float(os.getenv('WEBHOOK_CLAIM_LEASE', '300')))
+        app.config.setdefault('WEBHOOK_RETENTION_DAYS', float(os.getenv('WEBHOOK_RETENTION_DAYS', '7')))
+        app.config.setdefault('WEBHOOK_POLL_INTERVAL', 5.0)
+        self.app = app
+        app.extensions['webhook_queue'] = self
+
+    def handler(self, event_type):
+        """Decorator registering func(events) for an event type; '*' replaces the fallback"""
+        def register(func):
+            self._handlers[event_type] = func
+            return func
+        return register
+
+    def start(self):
+        """Start the consumer; events left over from a previous run are picked up"""
+        if self._thread is not None or not self.app.config['WEBHOOK_CONSUMER_ENABLED']:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='webhook-consumer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5.0):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def enqueue(self, source, idempotency_key, event_type, payload):
+        """Store a delivery and commit; returns (event id, whether it was a duplicate)"""
+        result = db.session.execute(
+            sqlite_insert(WebhookEvent).values(
+                source=source,
+                idempotency_key=idempotency_key,
+                event_type=event_type,
+                payload=payload,
+                received_at=datetime.utcnow(),
+                available_at=datetime.utcnow()
+            ).on_conflict_do_nothing(index_elements=['source', 'idempotency_key'])
+        )
+        db.session.commit()
+        duplicate = result.rowcount == 0
+        self._count('duplicates' if duplicate else 'received')
+
+        if duplicate:
+            event_id = db.session.query(WebhookEvent.id).filter_by(source=source, idempotency_key=idempotency_key).scalar()
+        else:
+            event_id = result.inserted_primary_key[0]
+            with self._wakeup:
+                self._pending_signals += 1
+                self._wakeup.notify()
+        return event_id, duplicate
+
+    def process_pending(self, limit=None):
+        """Claim and handle queued events in the current app context; returns the count handled"""
+        handled = 0
+        while limit is None or handled < limit:
+            batch_size = self.app.config['WEBHOOK_BATCH_SIZE']
+            if limit is not None:
+                batch_size = min(batch_size, limit - handled)
+            batch = self._claim_batch(batch_size)
+            if not batch:
+                break
+            self._process(batch)
+            handled += len(batch)
+        return handled
+
+    def prune(self):
+        """Delete processed events past WEBHOOK_RETENTION_DAYS; returns the count removed"""
+        cutoff = datetime.utcnow() - timedelta(days=self.app.config['WEBHOOK_RETENTION_DAYS'])
+        removed = WebhookEvent.query.filter(
+            WebhookEvent.status.in_(('done', 'failed')),
+            WebhookEvent.received_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return removed
+
+    def stats(self):
+        """Queue depth by status, age of the oldest waiting event, and consumer counters since startup"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        depth = dict(db.session.query(WebhookEvent.status, db.func.count()).group_by(WebhookEvent.status).all())
+        oldest = db.session.query(db.func.min(WebhookEvent.received_at)).filter(
+            WebhookEvent.status.in_(('pending', 'processing'))
+        ).scalar()
+
+        lag_total = stats.pop('lag_seconds_total')
+        stats.update({
+            'depth': depth.get('pending', 0) + depth.get('processing', 0),
+            'by_status': depth,
+            'oldest_pending_seconds': (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0,
+            'average_lag_seconds': lag_total / stats['processed'] if stats['processed'] else 0.0,
+            'handlers': sorted(self._handlers)
+        })
+        return stats
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        poll_interval = self.app.config['WEBHOOK_POLL_INTERVAL']
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+                if not self._pending_signals:
+                    # Timed wait also picks up retries, expired leases and other processes' events
+                    self._wakeup.wait(poll_interval)
+                if self._stopping:
+                    return
+                self._pending_signals = 0
+
+            with self.app.app_context():
+                try:
+                    self.process_pending()
+                    if time.monotonic() - self._last_prune > 3600:
+                        self._last_prune = time.monotonic()
+                        self.prune()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.exception('Webhook consumer failed: %s', e)
+                finally:
+                    db.session.remove()
+
+    def _claim_batch(self, batch_size):
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=self.app.config['WEBHOOK_CLAIM_LEASE'])
+        claimable = db.or_(
+            db.and_(WebhookEvent.status == 'pending', WebhookEvent.available_at <= now),
+            db.and_(WebhookEvent.status == 'processing', WebhookEvent.claimed_at < lease_expired)
+        )
+        candidate_ids = [row.id for row in db.session.query(WebhookEvent.id).filter(claimable).order_by(WebhookEvent.id).limit(batch_size)]
+        if not candidate_ids:
+            return []
+
+        # Conditional update so two consumers never take the same event
+        claim_token = uuid.uuid4().hex
+        WebhookEvent.query.filter(WebhookEvent.id.in_(candidate_ids), claimable).update({
+            WebhookEvent.status: 'processing',
+            WebhookEvent.claimed_at: now,
+            WebhookEvent.claim_token: claim_token,
+            WebhookEvent.attempts: WebhookEvent.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        return WebhookEvent.query.filter(
+            WebhookEvent.id.in_(candidate_ids),
+            WebhookEvent.claim_token == claim_token
+        ).order_by(WebhookEvent.id).all()
+
+    def _process(self, batch):
+        groups = {}
+        for event in batch:
+            groups.setdefault(event.event_type, []).append(event)
+        self._count('batches')
+
+        for event_type, events in groups.items():
+            handler = self._handlers.get(event_type, self._handlers['*'])
+            ids = [event.id for event in events]
+            received = [event.received_at for event in events]
+            claim_token = events[0].claim_token
+            try:
+                handler(events)
+                # Marked done in the handler's own transaction, so its writes and the ack land together.
+                # Only events still under this claim: one whose lease ran out belongs to its new consumer.
+                finished = datetime.utcnow()
+                acked = WebhookEvent.query.filter(
+                    WebhookEvent.id.in_(ids),
+                    WebhookEvent.claim_token == claim_token
+                ).update({
+                    WebhookEvent.status: 'done',
+                    WebhookEvent.processed_at: finished,
+                    WebhookEvent.error: None
+                }, synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception('Webhook handler for %s failed on %d events: %s', event_type, len(ids), e)
+                self._retry_or_fail(ids, claim_token, repr(e))
+                continue
+            if acked < len(ids):
+                self.app.logger.warning('%d %s events outlived their claim and were taken over', len(ids) - acked, event_type)
+
+            lags = [(finished - received_at).total_seconds() for received_at in received]
+            with self._stats_lock:
+                self._stats['processed'] += len(lags)
+                self._stats['lag_seconds_total'] += sum(lags)
+                self._stats['max_lag_seconds'] = max([self._stats['max_lag_seconds']] + lags)
+
+    def _retry_or_fail(self, ids, claim_token, error):
+        max_attempts = self.app.config['WEBHOOK_MAX_ATTEMPTS']
+        now = datetime.utcnow()
+        for event in WebhookEvent.query.filter(WebhookEvent.id.in_(ids), WebhookEvent.claim_token == claim_token):
+            event.error = error
+            if event.attempts >= max_attempts:
+                event.status = 'failed'
+                event.processed_at = now
+                self._count('failed')
+            else:
+                event.status = 'pending'
+                delay = self.app.config['WEBHOOK_RETRY_SECONDS'] * 2 ** (event.attempts - 1)
+                event.available_at = now + timedelta(seconds=delay)
+                self._count('retried')
+        db.session.commit()
+
+webhook_queue = WebhookQueue()
@@ -0,0 +1,62 @@
+"""Fixtures shared by the test modules: a fresh app and database per test.
+
+Run from a checkout where the backend directory is importable as `src`, like the app:
+
+    python -m pytest src/tests
+"""
+import os
+import sys
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(BACKEND))
+
+from src.main import create_app, init_database
+from src.models.user import User, db
+from src.models.forum import ForumCategory, ForumThread
+
+@pytest.fixture
+def app_config():
+    """Extra config for the app fixture; override it in a module or with parametrize"""
+    return {}
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    app = create_app({
+        'BACKGROUND_SERVICES': False,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'RESPONSE_CACHE_PATH': str(tmp_path / 'response_cache.db'),
+        'MODERATION_BACKEND': 'stub',
+        **app_config
+    })
+    init_database(app)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def user(app):
+    user = User(username='parent', email='parent@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def category(app):
+    category = ForumCategory(name='NICU stories')
+    db.session.add(category)
+    db.session.commit()
+    return category
+
+@pytest.fixture
+def make_thread(user, category):
+    def make_thread(title='Home at last', **fields):
+        thread = ForumThread(title=title, content=f'{title}, tell us more', author_id=user.id, category_id=category.id, **fields)
+        db.session.add(thread)
+        db.session.commit()
+        return thread
+    return make_thread
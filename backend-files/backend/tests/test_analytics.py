@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+import pytest
+from src.models.user import db
+from src.routes.analytics import PageView, ShareEvent, ReferralTracking, pageview_buffer, referral_clicks
+from src.services import ingest, rollups, uniques
+from src.services.uniques import HyperLogLog
+from src.services.referrals import ReferralClickCounter
+
+def pageview(n):
+    return {'page_url': f'/page/{n}', 'session_id': f's{n}', 'user_agent': 'test'}
+
+@pytest.mark.parametrize('app_config', [{'PAGEVIEW_BUFFER_SIZE': 2, 'PAGEVIEW_FLUSH_INTERVAL': 60}])
+def test_pageviews_are_buffered_then_written_in_bulk(client):
+    dropped = pageview_buffer.stats()['dropped']
+    for n in range(3):
+        assert client.post('/api/analytics/pageview', json=pageview(n)).status_code == 202
+    assert pageview_buffer.stats()['dropped'] == dropped + 1
+
+    pageview_buffer.flush()
+    assert sorted(url for (url,) in db.session.query(PageView.page_url)) == ['/page/0', '/page/1']
+
+@pytest.mark.parametrize('app_config', [{'PAGEVIEW_BUFFER_SIZE': 2, 'PAGEVIEW_FLUSH_INTERVAL': 60, 'PAGEVIEW_OVERFLOW': 'sync'}])
+def test_sync_overflow_flushes_instead_of_dropping(client):
+    for n in range(5):
+        assert client.post('/api/analytics/pageview', json=pageview(n)).get_json()['status'] == 'success'
+    pageview_buffer.flush()
+    assert db.session.query(PageView).count() == 5
+
+def test_exit_flush_is_registered_once(app, monkeypatch):
+    registered = []
+    monkeypatch.setattr(ingest.atexit, 'register', registered.append)
+    buffer = ingest.WriteBehindBuffer(PageView, 'PAGEVIEW')
+    buffer.init_app(app)
+    buffer.init_app(app)
+    assert registered == [buffer.shutdown]
+
+def test_rollups_fold_each_row_once(client):
+    now = datetime.utcnow()
+    db.session.add_all(PageView(page_url='/nicu', timestamp=now - timedelta(hours=n)) for n in range(3))
+    db.session.commit()
+
+    assert rollups.refresh_rollups() == 3
+    assert rollups.refresh_rollups() == 0
+    db.session.add(PageView(page_url='/nicu', timestamp=now))
+    db.session.commit()
+
+    # Three from the rollups, one from the raw tail above the watermark
+    dashboard = client.get('/api/analytics/dashboard?days=7').get_json()
+    assert dashboard['total_pageviews'] == 4
+    assert dashboard['top_pages'][0]['views'] == 4
+
+def share(code, shared_at):
+    db.session.add(ShareEvent(content_type='blog', platform='facebook', referral_code=code, timestamp=shared_at))
+    db.session.add(ReferralTracking(referral_code=code, original_url=f'https://example.com/{code}', created_at=shared_at))
+    db.session.commit()
+
+def test_dashboard_counts_platform_clicks_by_share_time(client):
+    now = datetime.utcnow()
+    share('oldshare', now - timedelta(days=10))
+    share('newshare', now - timedelta(days=1))
+    rollups.refresh_rollups()
+    for code in ('oldshare', 'oldshare', 'newshare'):
+        assert client.get(f'/api/share/{code}').status_code == 200
+    referral_clicks.flush()
+
+    week = client.get('/api/analytics/dashboard?days=7').get_json()
+    assert week['platform_breakdown'] == [{'platform': 'facebook', 'shares': 1, 'clicks': 1}]
+    assert [(r['code'], r['clicks']) for r in week['top_referrals']] == [('newshare', 1)]
+    assert [(r['code'], r['clicks_in_window']) for r in week['trending_referrals']] == [('oldshare', 2), ('newshare', 1)]
+
+    month = client.get('/api/analytics/dashboard?days=30').get_json()
+    assert month['platform_breakdown'] == [{'platform': 'facebook', 'shares': 2, 'clicks': 3}]
+    assert [r['code'] for r in month['top_referrals']] == ['oldshare', 'newshare']
+
+def test_referral_codes_resolve_from_the_lru(app):
+    counter = ReferralClickCounter(ReferralTracking, ShareEvent)
+    counter.init_app(app)
+    counter.capacity = 2
+    now = datetime.utcnow()
+    for code in ('code1', 'code2', 'code3'):
+        share(code, now)
+
+    assert counter.lookup('missing') is None
+    share('missing', now)
+    assert counter.lookup('missing')[0] == 'https://example.com/missing'
+
+    counter.lookup('code1')
+    counter.lookup('code1')
+    counter.lookup('code2')
+    stats = counter.stats()
+    assert (stats['cache_hits'], stats['cache_misses'], stats['cached_codes']) == (1, 4, 2)
+
+def test_clicks_are_counted_in_memory_and_flushed_together(client):
+    share('abc12345', datetime.utcnow())
+    for _ in range(3):
+        assert client.get('/api/share/abc12345').get_json()['redirect_url'] == 'https://example.com/abc12345'
+    assert client.get('/api/share/nope').status_code == 404
+
+    assert referral_clicks.flush() == 3
+    db.session.expire_all()
+    assert db.session.query(ReferralTracking.clicks).filter_by(referral_code='abc12345').scalar() == 3
+    assert db.session.query(ShareEvent.clicks).filter_by(referral_code='abc12345').scalar() == 3
+
+@pytest.mark.parametrize('true_count', [100, 5000, 60000])
+def test_hyperloglog_estimates_stay_within_a_few_standard_errors(true_count):
+    sketch = HyperLogLog()
+    for n in range(true_count):
+        sketch.add(f'session-{n}')
+    # 4096 registers give about 1.6% standard error
+    assert abs(sketch.count() - true_count) / true_count < 0.05
+
+    again = HyperLogLog.from_bytes(sketch.to_bytes())
+    for n in range(0, true_count, 7):
+        again.add(f'session-{n}')
+    assert again.registers == sketch.registers
+
+def test_merged_sketches_count_the_union():
+    mornings, evenings = HyperLogLog(), HyperLogLog()
+    for n in range(20000):
+        mornings.add(f'visitor-{n}')
+    for n in range(10000, 40000):
+        evenings.add(f'visitor-{n}')
+    mornings.merge(evenings)
+    assert abs(mornings.count() - 40000) / 40000 < 0.05
+
+def test_unique_counts_over_days_and_pages(client):
+    day = datetime(2026, 3, 1, 9)
+    db.session.add_all(
+        PageView(page_url='/nicu' if n % 3 else '/home', session_id=f's{n}', ip_address=f'10.0.{n // 250}.{n % 250}',
+                 user_agent='test', timestamp=day + timedelta(days=n % 2))
+        for n in range(3000)
+    )
+    # Returning sessions on the second day add page views but no new uniques
+    db.session.add_all(PageView(page_url='/home', session_id=f's{n}', timestamp=day + timedelta(days=1)) for n in range(0, 3000, 2))
+    db.session.commit()
+    uniques.backfill()
+    uniques.backfill()
+
+    def counts(**args):
+        response = client.get('/api/analytics/uniques', query_string={'start': '2026-03-01', 'end': '2026-03-02', **args})
+        return response.get_json()['pages']
+
+    site, = counts()
+    assert abs(site['sessions'] - 3000) / 3000 < 0.05
+    assert abs(site['visitors'] - 3000) / 3000 < 0.05
+    home, nicu = counts(page_url=['/home', '/nicu'])
+    assert abs(home['sessions'] - 2000) / 2000 < 0.05  # 1000 first visits plus 1000 others returning
+    assert abs(nicu['sessions'] - 2000) / 2000 < 0.05
+    first_day, = client.get('/api/analytics/uniques?start=2026-03-01&end=2026-03-01').get_json()['pages']
+    assert abs(first_day['sessions'] - 1500) / 1500 < 0.05
@@ -0,0 +1,36 @@
+import sqlite3
+from datetime import datetime
+from src.benchmarks.api import SCENARIOS, WRITE_SCENARIOS, Fixtures, QueryCounter, create_bench_app, run_client
+from src.benchmarks.seed import seed_file
+from src.models.user import db
+
+COUNTS = {'users': 5, 'threads': 12, 'posts': 60, 'blog_posts': 6, 'pageviews': 300, 'shares': 20}
+ANCHOR = datetime(2026, 3, 1)
+
+def seed(path):
+    seed_file(str(path), COUNTS, seed=7, anchor=ANCHOR, log=lambda message: None)
+
+def dump(path, tables=('forum_post', 'blog_post', 'page_view', 'share_event', 'share_rollup')):
+    with sqlite3.connect(path) as conn:
+        return {table: conn.execute(f'SELECT * FROM {table} ORDER BY 1, 2, 3').fetchall() for table in tables}
+
+def test_same_seed_and_anchor_give_the_same_rows(tmp_path):
+    seed(tmp_path / 'first.db')
+    seed(tmp_path / 'second.db')
+    first, second = dump(tmp_path / 'first.db'), dump(tmp_path / 'second.db')
+    assert len(first['forum_post']) == COUNTS['posts'] and len(first['page_view']) == COUNTS['pageviews']
+    assert first == second
+
+def test_every_read_scenario_runs_without_errors(tmp_path):
+    seed(tmp_path / 'bench.db')
+    app = create_bench_app(str(tmp_path / 'bench.db'), RESPONSE_CACHE_BACKEND='none')
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+    fixtures = Fixtures(app)
+
+    for name in SCENARIOS:
+        if name in WRITE_SCENARIOS:
+            continue
+        result = run_client(app, counter, fixtures, name, requests=3, warmup=0, seed=1)
+        assert result['errors'] == 0, name
+        assert result['queries_per_request'] > 0, name
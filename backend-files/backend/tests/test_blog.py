@@ -0,0 +1,106 @@
+import json
+import threading
+from datetime import datetime, timedelta
+import pytest
+from src.models.blog import BlogGenerationJob, BlogPost
+from src.models.user import db
+from src.routes import blog
+from src.services.blog_generation import blog_generator
+
+def words(topic):
+    yield f'# {topic}\n'
+    yield 'You are not alone.'
+
+def broken(topic):
+    yield 'Half a'
+    raise RuntimeError('model went away')
+
+def sse_events(response):
+    """(event, data) pairs of a text/event-stream body"""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+@pytest.mark.parametrize('app_config', [{'BLOG_LLM_BACKEND': words}])
+def test_generation_job_streams_tokens_then_done(client):
+    job = client.post('/api/blog/generate/jobs', json={'topic': 'Kangaroo care'}).get_json()
+
+    events = sse_events(client.get(job['stream_url']))
+    assert events == [('token', '# Kangaroo care\n'), ('token', 'You are not alone.'), ('done', {'status': 'done', 'error': None})]
+    assert client.get(job['status_url']).get_json()['content'] == '# Kangaroo care\nYou are not alone.'
+
+@pytest.mark.parametrize('app_config', [{'BLOG_LLM_BACKEND': broken}])
+def test_failure_releases_waiters_even_if_it_cannot_be_recorded(client, monkeypatch):
+    record = blog_generator._record
+    def record_unless_failed(job_id, **values):
+        if values.get('status') == 'failed':
+            raise RuntimeError('database is locked')
+        record(job_id, **values)
+    monkeypatch.setattr(blog_generator, '_record', record_unless_failed)
+
+    response = client.post('/api/blog/generate', json={'topic': 'Feeding tubes'})
+    assert response.status_code == 500
+    assert response.get_json() == {'error': 'model went away'}
+
+def test_stream_of_a_job_in_another_worker_waits_for_it_to_finish(app, client, monkeypatch):
+    monkeypatch.setattr(blog, 'JOB_POLL_SECONDS', 0.05)
+    db.session.add(BlogGenerationJob(id='elsewhere', topic='Going home', status='running'))
+    db.session.commit()
+
+    def finish():
+        with app.app_context():
+            BlogGenerationJob.query.filter_by(id='elsewhere').update({'status': 'done', 'content': 'The whole post'})
+            db.session.commit()
+    threading.Timer(0.3, finish).start()
+
+    events = sse_events(client.get('/api/blog/generate/jobs/elsewhere/stream'))
+    assert [event for event, _ in events] == ['token', 'done']
+    assert events[0][1] == 'The whole post'
+    assert events[1][1]['status'] == 'done'
+
+def publish(client, title, **fields):
+    return client.post('/api/blog/posts', json={'title': title, 'content': f'{title} in detail', 'published': True, **fields}).get_json()
+
+def test_tags_filter_listings_and_count_published_posts(client):
+    feeding = publish(client, 'Feeding', tags=['Feeding', ' NICU '])
+    publish(client, 'Sleep', tags=['sleep', 'nicu'])
+    publish(client, 'Draft', tags=['nicu'], published=False)
+
+    assert [post['id'] for post in client.get('/api/blog/posts?tag=feeding').get_json()] == [feeding['id']]
+    assert sorted(feeding['tags']) == ['feeding', 'nicu']
+    assert client.get('/api/blog/tags').get_json()[0] == {'name': 'nicu', 'count': 2}
+
+    client.put(f"/api/blog/posts/{feeding['id']}", json={'tags': ['feeding']})
+    counts = {tag['name']: tag['count'] for tag in client.get('/api/blog/tags').get_json()}
+    assert counts == {'feeding': 1, 'nicu': 1, 'sleep': 1}
+
+def test_full_listing_stays_whole_and_views_page_by_cursor(client):
+    at = datetime(2026, 3, 1)
+    db.session.add_all(
+        BlogPost(title=f'Week {n}', content=f'Week {n} in the NICU. ' * 50, author='Admin', published=True,
+                 created_at=at + timedelta(days=n // 2), summary=f'Week {n}')
+        for n in range(60)
+    )
+    db.session.commit()
+
+    full = client.get('/api/blog/posts')
+    assert len(full.get_json()) == 60 and 'X-Next-Cursor' not in full.headers
+    newest_first = [post['title'] for post in full.get_json()]
+
+    titles, cursor = [], None
+    while True:
+        page = client.get('/api/blog/posts?view=summary&limit=25' + (f'&cursor={cursor}' if cursor else ''))
+        assert all('content' not in post for post in page.get_json())
+        titles += [post['title'] for post in page.get_json()]
+        cursor = page.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert titles == newest_first
+
+    summary = client.get('/api/blog/posts?fields=id,title')
+    assert len(summary.get_json()) == 50 and 'X-Next-Cursor' in summary.headers
+    assert set(summary.get_json()[0]) == {'id', 'title'}
+    assert len(client.get('/api/blog/posts?limit=10').get_json()) == 10
@@ -0,0 +1,37 @@
+from src.models.user import db
+from src.models.forum import ForumPost
+
+def test_blog_post_revalidates_until_it_is_edited(client):
+    post = client.post('/api/blog/posts', json={'title': 'Going home', 'content': 'Packing the car seat', 'published': True}).get_json()
+    url = f"/api/blog/posts/{post['id']}"
+    first = client.get(url)
+    etag = first.headers['ETag']
+
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    # A compressing proxy may hand the client a weakened tag
+    assert client.get(url, headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+    assert client.get(url, headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+
+    client.put(url, json={'tags': ['discharge']})
+    changed = client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+def test_each_thread_page_has_its_own_etag(client, make_thread):
+    thread = make_thread()
+    db.session.add_all(ForumPost(content=f'Day {n}', author_id=thread.author_id, thread_id=thread.id) for n in range(3))
+    db.session.commit()
+    url = f'/api/forum/threads/{thread.id}?limit=2'
+
+    first = client.get(url)
+    second_url = f"{url}&cursor={first.headers['X-Next-Cursor']}"
+    second = client.get(second_url, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert [post['content'] for post in second.get_json()['posts']] == ['Day 2']
+    assert client.get(second_url, headers={'If-None-Match': second.headers['ETag']}).status_code == 304
+
+def test_categories_change_when_a_thread_is_started(client, category, user):
+    etag = client.get('/api/forum/categories').headers['ETag']
+    assert client.get('/api/forum/categories', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post('/api/forum/threads', json={'title': 'Hello', 'content': 'First week', 'author_id': user.id, 'category_id': category.id})
+    assert client.get('/api/forum/categories', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db, User
+from src.services import database
+
+pytestmark = pytest.mark.parametrize('app_config', [{'SQLITE_SINGLE_WRITER': True}])
+
+def holds_lock():
+    return database.write_coordinator._lock.locked()
+
+def test_write_lock_is_held_until_commit(app, client):
+    acquisitions = database.write_coordinator.stats()['acquisitions']
+    db.session.add(User(username='nurse', email='nurse@example.com'))
+    db.session.flush()
+    assert holds_lock()
+    db.session.commit()
+    assert not holds_lock()
+
+    status = client.get('/api/system/database').get_json()
+    assert status['single_writer'] and status['pragmas']['journal_mode'] == 'wal'
+    assert status['write_lock']['acquisitions'] > acquisitions
+
+def test_failed_write_releases_lock(app, user):
+    db.session.add(User(username=user.username, email=user.email))
+    with pytest.raises(IntegrityError):
+        db.session.flush()
+    db.session.rollback()
+    assert not holds_lock()
+
+def test_write_outside_a_transaction_releases_lock_on_error(app):
+    with db.engine.connect() as conn:
+        with pytest.raises(Exception):
+            conn.exec_driver_sql("INSERT INTO no_such_table VALUES (1)")
+        assert not holds_lock()
+        conn.rollback()
@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import pytest
+from src.models.user import db
+from src.routes.analytics import PageView
+
+START = datetime(2026, 3, 1)
+AUTH = {'Authorization': 'Bearer s3cret'}
+
+@pytest.fixture
+def pageviews(app):
+    db.session.add_all(PageView(page_url=f'/page/{n}', session_id=f's{n}', timestamp=START + timedelta(hours=n)) for n in range(5))
+    db.session.commit()
+
+@pytest.mark.parametrize('app_config', [{'ANALYTICS_EXPORT_TOKEN': 's3cret'}])
+def test_ndjson_export_filters_and_resumes(client, pageviews):
+    assert client.get('/api/analytics/export/pageviews').status_code == 401
+
+    response = client.get('/api/analytics/export/pageviews?since=2026-03-01T01:00:00Z&limit=2', headers=AUTH)
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['page_url'] for row in rows] == ['/page/1', '/page/2']
+    assert rows[0]['timestamp'] == '2026-03-01T01:00:00'
+
+    resumed = client.get(f"/api/analytics/export/pageviews?after_id={rows[-1]['id']}", headers=AUTH)
+    assert [json.loads(line)['page_url'] for line in resumed.get_data(as_text=True).splitlines()] == ['/page/3', '/page/4']
+
+def test_export_is_disabled_without_a_token(client, pageviews):
+    assert client.get('/api/analytics/export/pageviews', headers=AUTH).status_code == 403
+
+def test_csv_export_command_reads_in_batches(app, pageviews):
+    result = app.test_cli_runner().invoke(args=['export-analytics', 'pageviews', '--format', 'csv', '--batch-size', '2', '--until', '2026-03-01T04:00:00'])
+    assert result.exit_code == 0, result.output
+    rows = list(csv.DictReader(io.StringIO(result.stdout)))
+    assert [row['page_url'] for row in rows] == ['/page/0', '/page/1', '/page/2', '/page/3']
+    assert 'Exported 4 rows, resume with --after-id 4' in result.stderr
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from src.models.user import db, User
+from src.models.forum import ForumThread, ForumPost
+
+def test_thread_listing_pages_by_cursor(client, make_thread):
+    now = datetime.utcnow()
+    pinned = make_thread('Welcome', pinned=True, updated_at=now - timedelta(days=3))
+    older = make_thread('Older', updated_at=now - timedelta(hours=2))
+    newer = make_thread('Newer', updated_at=now - timedelta(hours=1))
+    make_thread('Held back', approved=False, moderation_status='pending')
+
+    first = client.get('/api/forum/threads?limit=2')
+    assert [t['id'] for t in first.get_json()] == [pinned.id, newer.id]
+    cursor = first.headers['X-Next-Cursor']
+
+    second = client.get(f'/api/forum/threads?limit=2&cursor={cursor}')
+    assert [t['id'] for t in second.get_json()] == [older.id]
+    assert 'X-Next-Cursor' not in second.headers
+
+    assert client.get('/api/forum/threads?cursor=not-a-cursor').status_code == 400
+
+def test_approving_a_post_updates_thread_counters(client, make_thread):
+    thread = make_thread()
+    post = ForumPost(content='Sending strength to your family', author_id=thread.author_id, thread_id=thread.id,
+                     approved=False, moderation_status='pending')
+    db.session.add(post)
+    db.session.commit()
+
+    assert client.post(f'/api/forum/moderation/approve/post/{post.id}').status_code == 200
+
+    db.session.expire_all()
+    thread = db.session.get(ForumThread, thread.id)
+    assert thread.post_count == 1
+    assert thread.last_post_at == post.created_at
+    assert client.get('/api/forum/threads').get_json()[0]['post_count'] == 1
+
+def test_thread_posts_page_oldest_first_in_a_fixed_number_of_queries(client, make_thread):
+    thread = make_thread()
+    at = datetime(2026, 3, 1)
+    authors = [User(username=f'parent{n}', email=f'parent{n}@example.com') for n in range(3)]
+    db.session.add_all(authors)
+    db.session.flush()
+    # Two posts share a timestamp so the id breaks the tie
+    times = [at, at + timedelta(minutes=1), at + timedelta(minutes=1), at + timedelta(minutes=2), at + timedelta(minutes=3)]
+    posts = [ForumPost(content=f'Update {n}', author_id=authors[n % 3].id, thread_id=thread.id, created_at=created_at)
+             for n, created_at in enumerate(times)]
+    posts.insert(2, ForumPost(content='Held back', author_id=authors[0].id, thread_id=thread.id, created_at=at,
+                              approved=False, moderation_status='pending'))
+    db.session.add_all(posts)
+    db.session.commit()
+    url = f'/api/forum/threads/{thread.id}?limit=2'
+
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    seen, queries, cursor = [], [], None
+    while True:
+        del statements[:]
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        queries.append(len(statements))
+        seen += [post['content'] for post in response.get_json()['posts']]
+        assert all(post['author_name'].startswith('parent') for post in response.get_json()['posts'])
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+
+    assert seen == [f'Update {n}' for n in range(5)]
+    assert queries == [3, 3, 3]  # ETag check, thread header, page of posts with authors
@@ -0,0 +1,49 @@
+import pytest
+from src.models.user import db
+from src.models.forum import ForumPost
+from src.services.forum_events import forum_events
+
+pytestmark = pytest.mark.parametrize('app_config', [{'LIVE_HEARTBEAT_SECONDS': 0.01, 'LIVE_CATCH_UP_SECONDS': 0, 'LIVE_MAX_SUBSCRIBERS': 1}])
+
+def field(chunk, name):
+    return next(line.split(': ', 1)[1] for line in chunk.splitlines() if line.startswith(f'{name}: '))
+
+def add_post(thread, content, **fields):
+    post = ForumPost(content=content, author_id=thread.author_id, thread_id=thread.id, **fields)
+    db.session.add(post)
+    db.session.commit()
+    return post.id
+
+def test_approved_posts_are_streamed_and_replayed_after_reconnect(client, make_thread):
+    thread = make_thread()
+    add_post(thread, 'Already here')
+    url = f'/api/forum/threads/{thread.id}/live'
+
+    response = client.get(url)
+    chunks = (chunk.decode() for chunk in response.response)
+    assert next(chunks) == 'retry: 2000\n\n'
+    assert next(chunks) == ': keep-alive\n\n'
+    # Over LIVE_MAX_SUBSCRIBERS, a second stream is turned away rather than queued
+    assert client.get(url).status_code == 503
+
+    post_id = add_post(thread, 'Extubated this morning!', approved=False, moderation_status='pending')
+    client.post(f'/api/forum/moderation/approve/post/{post_id}')
+    event = next(chunks)
+    assert field(event, 'event') == 'post'
+    assert 'Extubated this morning!' in field(event, 'data')
+    resume_from = field(event, 'id')
+    response.close()
+    assert forum_events.stats()['subscribers'] == 0
+
+    later_id = add_post(thread, 'Off CPAP too')
+    replayed = client.get(url, headers={'Last-Event-ID': resume_from})
+    first = next(chunk.decode() for chunk in replayed.response)
+    replayed.close()
+    assert 'Off CPAP too' in first and 'Extubated' not in first and 'Already here' not in first
+    assert f'"id": {later_id}' in first
+
+def test_unknown_thread_and_bad_resume_point_are_rejected(client, make_thread):
+    thread = make_thread()
+    assert client.get('/api/forum/threads/999/live').status_code == 404
+    assert client.get(f'/api/forum/threads/{thread.id}/live', headers={'Last-Event-ID': 'nope'}).status_code == 400
+    assert forum_events.stats()['subscribers'] == 0
@@ -0,0 +1,27 @@
+import json
+import os
+import subprocess
+import sys
+from conftest import BACKEND
+from src.models.blog import BlogPost
+from src.models.user import db
+
+def test_create_app_leaves_sdk_clients_unloaded(tmp_path):
+    script = (
+        "import json, sys\n"
+        "from src.main import create_app\n"
+        f"create_app({{'BACKGROUND_SERVICES': False, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///{tmp_path / 'app.db'}'}})\n"
+        "print(json.dumps([name for name in ('openai', 'requests', 'urllib3') if name in sys.modules]))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(BACKEND))
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=env, check=True)
+    assert json.loads(result.stdout.splitlines()[-1]) == []
+
+def test_init_db_can_run_again_on_a_live_database(app):
+    db.session.add(BlogPost(title='Discharge day', content='We are home', author='Staff', published=True))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+    assert 'Database initialised.' in result.output
+    assert db.session.query(BlogPost).count() == 1
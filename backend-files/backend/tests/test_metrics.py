@@ -0,0 +1,44 @@
+import logging
+import pytest
+from src.services.metrics import metrics
+
+ROUTE = {'blueprint': 'forum_bp', 'route': '/api/forum/categories', 'method': 'GET'}
+
+def sample(name, **labels):
+    """Value of one series in the current /api/metrics output, 0 if absent"""
+    prefix = name + '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '} '
+    for line in metrics.render().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return 0.0
+
+def test_requests_are_counted_per_route_with_their_queries(client):
+    requests = sample('http_requests_total', **ROUTE, status='200')
+    queries = sample('http_request_db_queries_total', **ROUTE)
+
+    for _ in range(2):
+        assert client.get('/api/forum/categories').status_code == 200
+
+    assert sample('http_requests_total', **ROUTE, status='200') == requests + 2
+    assert sample('http_request_db_queries_total', **ROUTE) > queries
+
+    response = client.get('/api/metrics')
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE http_request_duration_seconds histogram' in response.get_data(as_text=True)
+
+@pytest.mark.parametrize('app_config', [{'SLOW_REQUEST_MS': 0}])
+def test_slow_requests_are_logged_with_their_external_time(app, client, caplog):
+    @app.route('/api/test/external')
+    def call_platform():
+        with metrics.external_call('twitter'):
+            pass
+        return 'ok'
+
+    slow = sample('slow_events_total', kind='requests')
+    calls = sample('external_call_duration_seconds_count', service='twitter', outcome='ok')
+    with caplog.at_level(logging.WARNING, logger='src.metrics.slow'):
+        client.get('/api/test/external')
+
+    assert sample('slow_events_total', kind='requests') >= slow + 1
+    assert sample('external_call_duration_seconds_count', service='twitter', outcome='ok') == calls + 1
+    assert any('/api/test/external' in message and '1 external calls' in message for message in caplog.messages)
@@ -0,0 +1,134 @@
+"""AI verdicts racing with moderators acting on the same content"""
+import threading
+import pytest
+from src.models.user import db
+from src.models.forum import ForumThread, ForumPost
+from src.models.moderation import ModerationJob
+from src.services.moderation import moderation, bulk_review
+from src.services.search import search_rowid
+
+CONTENT = 'Our son came home from the NICU today after eleven long weeks on oxygen'
+
+@pytest.fixture
+def pending_post(make_thread):
+    thread = make_thread()
+    post = ForumPost(content=CONTENT, author_id=thread.author_id, thread_id=thread.id)
+    db.session.add(post)
+    db.session.flush()
+    moderation.enqueue('post', post)
+    db.session.commit()
+    return post.id, thread.id
+
+def moderate_after(app, action, post_id, approved):
+    """A moderator backend that lets a human bulk-review the post while it 'thinks'"""
+    def review():
+        with app.app_context():
+            bulk_review(action, post_ids=[post_id], reason='Shared medical advice')
+            db.session.commit()
+            db.session.remove()
+
+    def moderator(content):
+        reviewer = threading.Thread(target=review)
+        reviewer.start()
+        reviewer.join()
+        return approved, 'APPROVED' if approved else 'NEEDS_REVIEW: unsure'
+    return moderator
+
+def is_indexed(post_id):
+    return db.session.execute(
+        db.text("SELECT 1 FROM search_index WHERE rowid = :rowid"), {'rowid': search_rowid('post', post_id)}
+    ).first() is not None
+
+def test_bulk_approve_during_model_call_counts_post_once(app, pending_post):
+    post_id, thread_id = pending_post
+    moderation.moderator = moderate_after(app, 'approve', post_id, approved=True)
+
+    assert moderation.process_pending() == 1
+
+    db.session.expire_all()
+    assert db.session.get(ForumThread, thread_id).post_count == 1
+    assert db.session.get(ForumPost, post_id).moderation_status == 'approved'
+    assert db.session.query(ModerationJob.status).scalar() == 'done'
+
+def test_rejection_during_model_call_is_kept(app, pending_post):
+    post_id, thread_id = pending_post
+    moderation.moderator = moderate_after(app, 'reject', post_id, approved=True)
+
+    moderation.process_pending()
+
+    db.session.expire_all()
+    post = db.session.get(ForumPost, post_id)
+    assert not post.approved
+    assert post.moderation_status == 'rejected'
+    assert post.moderation_reason == 'Shared medical advice'
+    assert db.session.get(ForumThread, thread_id).post_count == 0
+    assert not is_indexed(post_id)
+
+def test_verdict_applies_when_nobody_intervened(app, pending_post):
+    post_id, thread_id = pending_post
+    moderation.moderator = lambda content: (True, 'APPROVED')
+
+    moderation.process_pending()
+
+    db.session.expire_all()
+    assert db.session.get(ForumPost, post_id).approved
+    assert db.session.get(ForumThread, thread_id).post_count == 1
+    assert is_indexed(post_id)
+
+def test_rule_stage_and_verdict_cache_spare_the_model(app):
+    calls = []
+    def moderator(content):
+        calls.append(content)
+        return False, 'NEEDS_REVIEW: mentions dosage'
+    moderation.moderator = moderator
+
+    assert moderation.moderate('Sending hugs and prayers!') == (True, 'APPROVED: local allow-list')
+    assert moderation.moderate('Try this MIRACLE cure')[0] is False
+    assert calls == []
+
+    first = moderation.moderate('How much caffeine did your baby get for apnea?')
+    db.session.commit()
+    again = moderation.moderate('how much caffeine did your baby get for apnea')
+    assert first == again == (False, 'NEEDS_REVIEW: mentions dosage')
+    assert len(calls) == 1
+
+def test_unavailable_verdicts_are_not_cached(app):
+    calls = []
+    def moderator(content):
+        calls.append(content)
+        return False, 'NEEDS_REVIEW: AI moderation unavailable - timeout'
+    moderation.moderator = moderator
+
+    moderation.moderate('Is anyone else waiting on an eye exam result?')
+    db.session.commit()
+    moderation.moderate('Is anyone else waiting on an eye exam result?')
+    assert len(calls) == 2
+
+def test_review_queue_pages_and_bulk_review(client, make_thread):
+    thread = make_thread()
+    statuses = ['pending', 'needs_review', 'pending', 'approved']
+    posts = [ForumPost(content=f'Question {n}', author_id=thread.author_id, thread_id=thread.id,
+                       approved=status == 'approved', moderation_status=status) for n, status in enumerate(statuses)]
+    db.session.add_all(posts)
+    db.session.commit()
+    waiting, flagged, later, published = [post.id for post in posts]
+
+    first = client.get('/api/forum/moderation/posts?limit=2')
+    assert [post['id'] for post in first.get_json()] == [waiting, flagged]
+    rest = client.get(f"/api/forum/moderation/posts?limit=2&cursor={first.headers['X-Next-Cursor']}")
+    assert [post['id'] for post in rest.get_json()] == [later]
+    assert [post['id'] for post in client.get('/api/forum/moderation/posts?status=needs_review').get_json()] == [flagged]
+
+    approved = client.post('/api/forum/moderation/bulk', json={'action': 'approve', 'posts': [waiting, later, published]}).get_json()
+    assert sorted(approved['posts']) == [waiting, later]
+    rejected = client.post('/api/forum/moderation/bulk', json={'action': 'reject', 'posts': [flagged, waiting], 'reason': 'Dosage advice'}).get_json()
+    assert rejected['posts'] == [flagged]
+
+    db.session.expire_all()
+    assert db.session.get(ForumThread, thread.id).post_count == 2
+    assert is_indexed(waiting) and is_indexed(later) and not is_indexed(flagged)
+    assert db.session.get(ForumPost, flagged).moderation_reason == 'Dosage advice'
+    assert client.get('/api/forum/moderation/posts').get_json() == []
+
+    too_many = client.post('/api/forum/moderation/bulk', json={'action': 'approve', 'posts': list(range(501))})
+    assert too_many.status_code == 400
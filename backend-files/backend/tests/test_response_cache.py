@@ -0,0 +1,43 @@
+import pytest
+from src.models.blog import BlogPost
+from src.services.response_cache import response_cache
+
+pytestmark = pytest.mark.parametrize('app_config', [{'RESPONSE_CACHE_BACKEND': 'memory'}, {'RESPONSE_CACHE_BACKEND': 'disk'}])
+
+@pytest.fixture
+def post_id(client):
+    post = {'title': 'First bath', 'content': 'Five weeks in, we finally gave her a bath.', 'published': True}
+    return client.post('/api/blog/posts', json=post).get_json()['id']
+
+def test_edits_invalidate_the_post_and_the_listing(client, post_id):
+    url = f'/api/blog/posts/{post_id}'
+    assert client.get(url).headers['X-Cache'] == 'MISS'
+    assert client.get(url).headers['X-Cache'] == 'HIT'
+    assert client.get('/api/blog/posts?view=summary').headers['X-Cache'] == 'MISS'
+    assert client.get('/api/blog/posts?view=summary').headers['X-Cache'] == 'HIT'
+
+    client.put(url, json={'title': 'First real bath'})
+
+    response = client.get(url)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['title'] == 'First real bath'
+    listing = client.get('/api/blog/posts?view=summary')
+    assert listing.headers['X-Cache'] == 'MISS'
+    assert [post['title'] for post in listing.get_json()] == ['First real bath']
+
+    client.delete(url)
+    assert client.get(url).status_code == 404
+    assert client.get('/api/blog/posts?view=summary').get_json() == []
+
+def test_response_read_during_an_invalidation_is_not_stored(client, post_id, monkeypatch):
+    to_dict = BlogPost.to_dict
+    def to_dict_racing_a_write(post):
+        data = to_dict(post)
+        response_cache.invalidate(tags=['forum:threads'])
+        return data
+    monkeypatch.setattr(BlogPost, 'to_dict', to_dict_racing_a_write)
+
+    skipped = response_cache.stats()['skipped_stale']
+    assert client.get(f'/api/blog/posts/{post_id}').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/api/blog/posts/{post_id}').headers['X-Cache'] == 'MISS'
+    assert response_cache.stats()['skipped_stale'] == skipped + 2
@@ -0,0 +1,41 @@
+import time
+from src.models.user import db
+from src.models.forum import ForumPost
+from src.services import search
+
+def found(client, text):
+    return {(hit['type'], hit['id']) for hit in client.get(f'/api/search?q={text}').get_json()['results']}
+
+def test_blog_posts_are_indexed_while_published(client):
+    draft = client.post('/api/blog/posts', json={'title': 'Draft on bradycardia', 'content': 'Not ready'}).get_json()
+    live = client.post('/api/blog/posts', json={'title': 'Understanding bradycardia', 'content': 'Heart rate dips', 'published': True}).get_json()
+    assert found(client, 'bradycardia') == {('blog', live['id'])}
+
+    client.put(f"/api/blog/posts/{live['id']}", json={'published': False})
+    client.put(f"/api/blog/posts/{draft['id']}", json={'published': True})
+    assert found(client, 'bradycardia') == {('blog', draft['id'])}
+
+    client.delete(f"/api/blog/posts/{draft['id']}")
+    assert found(client, 'bradycardia') == set()
+
+def test_posts_wait_for_their_thread_to_be_approved(client, make_thread):
+    thread = make_thread('Oxygen at home', approved=False, moderation_status='pending')
+    post = ForumPost(content='Our cannula tips for sleeping', author_id=thread.author_id, thread_id=thread.id,
+                     approved=False, moderation_status='pending')
+    db.session.add(post)
+    db.session.commit()
+
+    client.post(f'/api/forum/moderation/approve/post/{post.id}')
+    assert found(client, 'cannula') == set()
+
+    client.post(f'/api/forum/moderation/approve/thread/{thread.id}')
+    assert found(client, 'cannula') == {('post', post.id)}
+
+def test_a_missing_index_is_looked_up_again(app, monkeypatch):
+    monkeypatch.setattr(search, 'search_enabled', False)
+    monkeypatch.setattr(search, 'search_checked_at', time.monotonic())
+    assert not search.is_search_enabled()
+
+    monkeypatch.setattr(search, 'search_checked_at', time.monotonic() - search.SEARCH_RECHECK_SECONDS)
+    assert search.is_search_enabled()
+    assert search.search_enabled is True
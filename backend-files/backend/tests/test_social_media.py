@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from src.models.user import db
+from src.models.social_media import ScheduledPost
+from src.routes import social_media
+from src.services.scheduler import PostScheduler
+
+def test_platforms_are_published_in_parallel(app, monkeypatch):
+    def slow_publisher(platform):
+        def publish(content, media_url=None):
+            time.sleep(0.3)
+            return {'success': True, 'post_id': f'{platform}-1', 'platform': platform}
+        return publish
+    monkeypatch.setattr(social_media, 'post_to_facebook', slow_publisher('facebook'))
+    monkeypatch.setattr(social_media, 'post_to_instagram', slow_publisher('instagram'))
+
+    started = time.perf_counter()
+    results = social_media.publish_to_platforms('Hello', ['facebook', 'instagram', 'myspace'])
+    assert time.perf_counter() - started < 0.55
+    assert results['facebook']['post_id'] == 'facebook-1'
+    assert results['instagram']['success']
+    assert results['myspace'] == {'success': False, 'error': 'Unknown platform: myspace'}
+
+def test_deadline_separates_running_from_unstarted_platforms(app, monkeypatch):
+    release = threading.Event()
+    def stuck(content, media_url=None):
+        release.wait(5)
+        return {'success': True}
+    monkeypatch.setattr(social_media, 'post_to_facebook', stuck)
+    monkeypatch.setattr(social_media, 'post_to_instagram', stuck)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = social_media.publish_to_platforms('Hello', ['facebook', 'instagram'], deadline=0.2, executor=executor)
+        release.set()
+
+    assert results['facebook']['status'] == 'unknown'
+    assert results['instagram']['status'] == 'not_attempted'
+    assert not results['facebook']['success'] and not results['instagram']['success']
+
+def test_posts_are_not_retried_on_rate_limits():
+    adapter = social_media.get_session('facebook').get_adapter('https://graph.facebook.com')
+    assert isinstance(adapter, social_media.TimedAdapter)
+    retry = adapter.adapter.max_retries
+    assert 'POST' not in retry.allowed_methods
+    assert not retry.respect_retry_after_header
+    assert retry.backoff_max < social_media.POST_DEADLINE_SECONDS
+
+def make_scheduler(app, publish):
+    scheduler = PostScheduler(publish, max_platforms=3)
+    scheduler.init_app(app)
+    return scheduler
+
+def scheduled(platforms, due_at=None, **fields):
+    post = ScheduledPost(content='Hello NICU families', platforms=json.dumps(platforms),
+                         due_at=due_at or datetime.utcnow() - timedelta(minutes=1), **fields)
+    db.session.add(post)
+    db.session.commit()
+    return post.id
+
+def status(post_id):
+    db.session.expire_all()
+    return db.session.get(ScheduledPost, post_id).status
+
+def test_due_posts_are_published_once(app):
+    calls = []
+    def publish(content, platforms, media_url=None, executor=None):
+        calls.append(platforms)
+        return {platform: {'success': True, 'post_id': f'{platform}-1'} for platform in platforms}
+    scheduler = make_scheduler(app, publish)
+    due = scheduled(['facebook', 'instagram'])
+    later = scheduled(['facebook'], due_at=datetime.utcnow() + timedelta(hours=1))
+
+    assert scheduler.dispatch_due() == 1
+    assert scheduler.dispatch_due() == 0
+    assert calls == [['facebook', 'instagram']]
+    assert status(due) == 'published'
+    assert status(later) == 'scheduled'
+
+def test_lost_outcomes_mark_the_post_unknown_instead_of_republishing(app):
+    calls = []
+    def publish(content, platforms, media_url=None, executor=None):
+        calls.append(platforms)
+        # Can't be stored, so recording the outcome fails after the post went out
+        return {'facebook': {'success': True, 'post_id': object()}}
+    scheduler = make_scheduler(app, publish)
+    post_id = scheduled(['facebook'])
+
+    scheduler.dispatch_due()
+    assert status(post_id) == 'unknown'
+
+    ScheduledPost.query.filter_by(id=post_id).update({ScheduledPost.claimed_at: datetime.utcnow() - timedelta(days=1)})
+    db.session.commit()
+    scheduler._resync()
+    scheduler.dispatch_due()
+    assert status(post_id) == 'unknown'
+    assert len(calls) == 1
+
+def test_resync_only_reschedules_claims_that_never_started(app):
+    scheduler = make_scheduler(app, None)
+    stale = datetime.utcnow() - timedelta(days=1)
+    claimed = scheduled(['facebook'], status='claimed', claimed_at=stale)
+    publishing = scheduled(['facebook'], status='publishing', claimed_at=stale)
+
+    scheduler._resync()
+    assert status(claimed) == 'scheduled'
+    assert status(publishing) == 'unknown'
+
+def test_platforms_never_started_are_retried_alone(app):
+    calls = []
+    def publish(content, platforms, media_url=None, executor=None):
+        calls.append(platforms)
+        results = {'facebook': {'success': True, 'post_id': 'fb-1'}}
+        results['instagram'] = {'success': True, 'post_id': 'ig-1'} if len(calls) > 1 else {'success': False, 'status': 'not_attempted'}
+        return {platform: results[platform] for platform in platforms}
+    scheduler = make_scheduler(app, publish)
+    post_id = scheduled(['facebook', 'instagram'])
+
+    scheduler.dispatch_due()
+    assert status(post_id) == 'scheduled'
+    scheduler.dispatch_due(now=datetime.utcnow() + timedelta(seconds=app.config['SCHEDULER_RETRY_SECONDS'] + 1))
+
+    assert calls == [['facebook', 'instagram'], ['instagram']]
+    assert status(post_id) == 'published'
+    assert sorted(db.session.get(ScheduledPost, post_id).to_dict()['outcomes']) == ['facebook', 'instagram']
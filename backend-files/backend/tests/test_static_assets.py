@@ -0,0 +1,46 @@
+import gzip
+import os
+import pytest
+from src.services import static_assets as assets_module
+from src.services.static_assets import static_assets, MANIFEST_NAME
+
+BUNDLE = 'assets/index-DuVd0bVs.js'
+SCRIPT = b'console.log("welcome home");\n' * 100
+
+@pytest.fixture
+def static_root(app, tmp_path):
+    root = tmp_path / 'static'
+    (root / 'assets').mkdir(parents=True)
+    (root / 'index.html').write_bytes(b'<!doctype html><div id="root"></div>')
+    (root / BUNDLE).write_bytes(SCRIPT)
+    app.static_folder = str(root)
+    static_assets.refresh()
+    return root
+
+def test_startup_without_a_manifest_writes_nothing(client, static_root):
+    response = client.get('/forum/threads/1', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert b'id="root"' in response.data
+    assert 'Content-Encoding' not in response.headers
+    assert sorted(os.listdir(static_root / 'assets')) == ['index-DuVd0bVs.js']
+
+def test_build_static_writes_variants_and_manifest_for_startup(app, client, static_root, monkeypatch):
+    result = app.test_cli_runner().invoke(args=['build-static'])
+    assert result.exit_code == 0, result.output
+    assert sorted(os.listdir(static_root / 'assets')) == ['index-DuVd0bVs.js', 'index-DuVd0bVs.js.gz']
+    assert (static_root / MANIFEST_NAME).exists()
+    assert not [name for name in os.listdir(static_root) if name.endswith('.tmp')]
+
+    # A worker starting after the build only reads the manifest
+    monkeypatch.setattr(assets_module, '_compress', pytest.fail)
+    monkeypatch.setattr(assets_module.hashlib, 'sha256', pytest.fail)
+    static_assets.refresh()
+
+    response = client.get(f'/{BUNDLE}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert gzip.decompress(response.data) == SCRIPT
+    assert client.get(f'/{MANIFEST_NAME}').data.startswith(b'<!doctype html>')
+
+    etag = client.get('/').headers['ETag']
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
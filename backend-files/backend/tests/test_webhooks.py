@@ -0,0 +1,57 @@
+import json
+import threading
+import pytest
+from src.models.user import db
+from src.models.webhook import WebhookEvent
+from src.services.webhooks import webhook_queue
+
+def deliver(client, payload, encoding='utf-8', **headers):
+    return client.post('/api/webhook/stripe', data=json.dumps(payload).encode(encoding), content_type='application/json', headers=headers).get_json()
+
+def test_retried_deliveries_are_stored_once(client):
+    first = deliver(client, {'type': 'charge'}, **{'Idempotency-Key': 'evt_1'})
+    retry = deliver(client, {'type': 'charge', 'retry': 1}, **{'Idempotency-Key': 'evt_1'})
+    assert (first['duplicate'], retry['duplicate']) == (False, True)
+    assert retry['id'] == first['id']
+
+    by_id = deliver(client, {'id': 42, 'type': 'refund'})
+    assert deliver(client, {'id': 42, 'type': 'refund'})['duplicate']
+    assert by_id['id'] != first['id']
+
+def test_request_ids_do_not_deduplicate(client):
+    # Proxies stamp X-Request-Id per hop, so two different events can share one
+    first = deliver(client, {'type': 'charge', 'amount': 1}, **{'X-Request-Id': 'abc'})
+    second = deliver(client, {'type': 'charge', 'amount': 2}, **{'X-Request-Id': 'abc'})
+    assert not second['duplicate'] and second['id'] != first['id']
+
+def test_utf16_payloads_are_stored_as_text(client):
+    event_id = deliver(client, {'type': 'note', 'text': 'Bébé'}, encoding='utf-16')['id']
+    assert json.loads(db.session.get(WebhookEvent, event_id).payload) == {'type': 'note', 'text': 'Bébé'}
+
+@pytest.mark.parametrize('app_config', [{'WEBHOOK_CLAIM_LEASE': 0}])
+@pytest.mark.parametrize('fails', [False, True])
+def test_events_taken_over_after_their_lease_are_left_to_the_new_consumer(app, client, fails):
+    event_id = deliver(client, {'type': 'slow'})['id']
+    db.session.commit()
+
+    def take_over():
+        with app.app_context():
+            webhook_queue._claim_batch(10)
+            db.session.remove()
+
+    @webhook_queue.handler('slow')
+    def slow_handler(events):
+        reclaimer = threading.Thread(target=take_over)
+        reclaimer.start()
+        reclaimer.join()
+        if fails:
+            raise RuntimeError('downstream timeout')
+
+    try:
+        assert webhook_queue.process_pending(limit=1) == 1
+    finally:
+        webhook_queue._handlers.pop('slow')
+
+    db.session.expire_all()
+    event = db.session.get(WebhookEvent, event_id)
+    assert (event.status, event.attempts, event.error) == ('processing', 2, None)
@@ -0,0 +1,47 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import request, make_response, current_app
+
+def make_etag(*parts):
+    """Strong ETag value from the values that identify a representation's version"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+def is_not_modified(etag, last_modified):
+    """Whether the request's If-None-Match / If-Modified-Since match these validators"""
+    if request.if_none_match:
+        # If-None-Match wins when both are sent; it uses weak comparison, so a
+        # W/ tag from a compressing proxy still matches
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= request.if_modified_since
+    return False
+
+def conditional(validators):
+    """Answer conditional GETs from cheap validators before the view runs.
+
+    validators(**view_args) returns (etag, last_modified) from a narrow
+    query, or None to let the view handle a missing resource. A matching
+    request gets a 304 without the view (or the response cache behind it)
+    being called; other responses get ETag and Last-Modified headers.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            found = validators(**kwargs)
+            if found is None:
+                return view(*args, **kwargs)
+
+            etag, last_modified = found
+            if is_not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+            return response
+        return wrapper
+    return decorator